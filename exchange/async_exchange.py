@@ -0,0 +1,200 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Dict, List
+
+from exchange.exchange import Exchange
+from exchange.binance import Binance
+from exchange.coinbasepro import CoinbasePro
+from exchange.memo import MemoizedExchange
+from exchange.pool import ThreadLocalSession
+from internals.order import Order
+
+
+ASYNC_EXCHANGE_WORKERS = 8
+
+
+def share_session(client, max_workers: int):
+    """
+    give each worker own session of client, which reuse keep-alive
+    connections, session of pooled exchange is already thread local
+    """
+    if not isinstance(client.session, ThreadLocalSession):
+        client.session = ThreadLocalSession(client.session,
+                                            pool_maxsize=max_workers)
+
+
+class AsyncExchange:
+    """
+    asyncio counterpart of Exchange
+
+    exchange clients are blocking, so calls of wrapped exchange run in
+    a thread pool, threads have own sessions of the client sharing
+    connection pools.
+    independent calls (balances and books, several orders) can be awaited
+    together with asyncio.gather or batch methods below
+    """
+
+    def __init__(self, exchange: Exchange,
+                 max_workers: int=ASYNC_EXCHANGE_WORKERS):
+        self.exchange = exchange
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        if hasattr(exchange, 'client'):
+            share_session(exchange.client, max_workers)
+
+    async def _run(self, function, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self.executor, lambda: function(*args, **kwargs))
+
+    async def get_resources(self):
+        return await self._run(self.exchange.get_resources)
+
+    async def get_orderbooks(self, products=None, depth: int=1):
+        return await self._run(self.exchange.get_orderbooks,
+                               products, depth=depth)
+
+    async def get_resources_and_orderbooks(self, products=None,
+                                           depth: int=1):
+        return await asyncio.gather(self.get_resources(),
+                                    self.get_orderbooks(products, depth))
+
+    async def place_market_order(self, order: Order,
+                                 price_estimates: Dict[str, Decimal]):
+        return await self._run(self.exchange.place_market_order,
+                               order, price_estimates)
+
+    async def place_market_orders(self, orders: List[Order],
+                                  price_estimates: Dict[str, Decimal]):
+        return await asyncio.gather(*[
+            self.place_market_order(order, price_estimates)
+            for order in orders])
+
+    async def place_limit_order(self, order: Order):
+        return await self._run(self.exchange.place_limit_order, order)
+
+    async def place_limit_orders(self, orders: List[Order]):
+        return await asyncio.gather(*[self.place_limit_order(order)
+                                      for order in orders])
+
+    async def cancel_limit_order(self, params):
+        return await self._run(self.exchange.cancel_limit_order, params)
+
+    async def get_order(self, params):
+        return await self._run(self.exchange.get_order, params)
+
+    async def cancel_and_get_orders(self, order_responses):
+        """
+        cancel orders, then get their final state, all orders concurrently
+        """
+        async def cancel_and_get(order_response):
+            await self.cancel_limit_order(order_response)
+            return await self.get_order(order_response)
+        return await asyncio.gather(*[cancel_and_get(order_response)
+                                      for order_response in order_responses])
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class AsyncBinance(AsyncExchange):
+    async def get_orderbooks(self, products=None, depth: int=1):
+        if depth == 1 or products is None:
+            return await super().get_orderbooks(products, depth)
+        # one request per product, so products are fetched concurrently
+        orderbooks = await asyncio.gather(*[
+            self._run(self.exchange.get_orderbooks_of_depth, [product], depth)
+            for product in products])
+        return [orderbook for books in orderbooks for orderbook in books]
+
+
+class AsyncCoinbasePro(AsyncExchange):
+    async def get_orderbooks(self, products=None, depth: int=1):
+        if products is None or (depth == 1 and
+                                self.exchange.snapshot is not None):
+            return await super().get_orderbooks(products, depth)
+        # one request per product, so products are fetched concurrently
+        products = list(products)
+        level = 1 if depth == 1 else 2
+        raw_orderbooks = await asyncio.gather(*[
+            self._run(self.exchange._get_product_order_book, product, level)
+            for product in products])
+        return self.exchange.parse_orderbooks(products, raw_orderbooks,
+                                              depth)
+
+
+def get_async_exchange(exchange: Exchange, **kwargs) -> AsyncExchange:
+    # memoized exchange is kept, class is chosen by wrapped exchange
+    wrapped = exchange
+    if isinstance(exchange, MemoizedExchange):
+        wrapped = exchange.exchange
+    if isinstance(wrapped, Binance):
+        return AsyncBinance(exchange, **kwargs)
+    if isinstance(wrapped, CoinbasePro):
+        return AsyncCoinbasePro(exchange, **kwargs)
+    return AsyncExchange(exchange, **kwargs)
+
+
+class SyncExchangeAdapter:
+    """
+    synchronous Exchange interface over AsyncExchange
+
+    coroutines run on the adapter's own event loop thread, so existing
+    rebalancers and celery tasks can use async exchange as is.
+    attributes, which are not overridden (filters, ledger, fees ...)
+    are taken from the wrapped exchange
+    """
+
+    def __init__(self, async_exchange: AsyncExchange):
+        self.async_exchange = async_exchange
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever,
+                                        daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        return getattr(self.async_exchange.exchange, name)
+
+    def _wait(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def get_resources(self):
+        return self._wait(self.async_exchange.get_resources())
+
+    def get_orderbooks(self, products=None, depth: int=1):
+        return self._wait(self.async_exchange.get_orderbooks(products, depth))
+
+    def get_resources_and_orderbooks(self, products=None, depth: int=1):
+        return self._wait(self.async_exchange.get_resources_and_orderbooks(
+            products, depth))
+
+    def place_market_order(self, order, price_estimates):
+        return self._wait(self.async_exchange.place_market_order(
+            order, price_estimates))
+
+    def place_market_orders(self, orders, price_estimates):
+        return self._wait(self.async_exchange.place_market_orders(
+            orders, price_estimates))
+
+    def place_limit_order(self, order):
+        return self._wait(self.async_exchange.place_limit_order(order))
+
+    def place_limit_orders(self, orders):
+        return self._wait(self.async_exchange.place_limit_orders(orders))
+
+    def cancel_limit_order(self, params):
+        return self._wait(self.async_exchange.cancel_limit_order(params))
+
+    def get_order(self, params):
+        return self._wait(self.async_exchange.get_order(params))
+
+    def cancel_and_get_orders(self, order_responses):
+        return self._wait(self.async_exchange.cancel_and_get_orders(
+            order_responses))
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self.async_exchange.close()
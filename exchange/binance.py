@@ -1,21 +1,128 @@
+import os
 from decimal import Decimal
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 
 from logger import logger
 from exchange.exchange import Exchange
-from internals.utils import binance_product_to_currencies
+from exchange.filters_cache import FiltersCache
+from exchange.binance_stream import BookTickerStream
+from exchange.snapshot import MarketSnapshot, MARKET_SNAPSHOT_ENABLED
+from exchange.single_flight import SINGLE_FLIGHT
+from exchange.hedge import HEDGER, HEDGING_ENABLED
+from exchange import shared_books
+from internals.symbol_index import SymbolIndex, get_symbol_index
 from internals.utils import quantize
-from internals.orderbook import OrderBook
+from internals.orderbook import OrderBook, L2OrderBook
+from internals.rate_limiter import WeightGovernor
+
+
+FILTERS_CACHE = FiltersCache('binance')
+BOOK_TICKER_STREAM_ENABLED = os.environ.get(
+    'BINANCE_BOOK_TICKER_STREAM', '0') == '1'
+# request weight shared by processes, see WeightGovernor
+WEIGHT_GOVERNOR_ENABLED = os.environ.get(
+    'EXCHANGE_WEIGHT_GOVERNOR', '0') == '1'
+# binance allows 1200 per minute, some is left for calls before sync
+BINANCE_WEIGHT_LIMIT = int(os.environ.get('BINANCE_WEIGHT_LIMIT', 1100))
+
+
+def order_book_weight(limit: int) -> int:
+    if limit <= 100:
+        return 1
+    if limit <= 500:
+        return 5
+    return 10
 
 
 class Binance(Exchange):
-    def __init__(self, api_key: str=None, secret_key: str=None):
+    # top of book cache, see BookTickerStream
+    stream = None
+    # request weight budget, see WeightGovernor
+    governor = None
+    # hedged requests of idempotent reads, see Hedger
+    hedger = None
+    # request weights of client methods
+    WEIGHTS = {
+        'get_exchange_info': 1,
+        'get_all_tickers': 2,
+        'get_orderbook_tickers': 2,
+        'get_account': 5,
+        'create_order': 1,
+        'order_market': 1,
+        'get_order': 1,
+        'cancel_order': 1,
+    }
+    # client methods of public data, concurrent identical calls are
+    # coalesced, see SingleFlight
+    PUBLIC_METHODS = {'get_exchange_info', 'get_all_tickers',
+                      'get_orderbook_tickers', 'get_order_book'}
+    # idempotent client methods, which may be hedged, orders are never
+    HEDGED_METHODS = PUBLIC_METHODS | {'get_account', 'get_order'}
+
+    def __init__(self, api_key: str=None, secret_key: str=None,
+                 stream: BookTickerStream=None,
+                 snapshot: MarketSnapshot=None):
         super().__init__()
         self.client = Client(api_key, secret_key)
-        filters = self.client.get_exchange_info()['symbols']
+        if WEIGHT_GOVERNOR_ENABLED:
+            self.governor = WeightGovernor.shared(
+                'binance', BINANCE_WEIGHT_LIMIT, 60)
+            self.client.session.hooks['response'].append(self._on_response)
+        if HEDGING_ENABLED:
+            self.hedger = HEDGER
+        self.filters = FILTERS_CACHE.get(self._fetch_filters)
+        if stream is None and BOOK_TICKER_STREAM_ENABLED:
+            stream = BookTickerStream.shared()
+        self.stream = stream
+        if self.stream is not None:
+            self.stream.symbols = self.symbols
+        if snapshot is None and MARKET_SNAPSHOT_ENABLED:
+            snapshot = MarketSnapshot.shared()
+        self.snapshot = snapshot
+
+    def _request(self, method: str, weight: int=None, **params):
+        """
+        call client method, when its weight is available
+        """
+        if method in self.PUBLIC_METHODS:
+            key = ('binance.' + method, tuple(sorted(params.items())))
+            return SINGLE_FLIGHT.do(
+                key, lambda: self._call(method, weight, params))
+        return self._call(method, weight, params)
+
+    def _call(self, method, weight, params):
+        def fetch():
+            # hedge is a request of its own, so it takes weight too
+            if self.governor is not None:
+                self.governor.acquire(weight or self.WEIGHTS.get(method, 1))
+            return getattr(self.client, method)(**params)
+
+        if self.hedger is not None and method in self.HEDGED_METHODS:
+            return self.hedger.call('binance.' + method, fetch)
+        return fetch()
+
+    def _on_response(self, response, *args, **kwargs):
+        """
+        sync governor with weight used by all clients of ip
+        """
+        if self.governor is None:
+            return
+        used = response.headers.get('X-MBX-USED-WEIGHT-1M',
+                                    response.headers.get('X-MBX-USED-WEIGHT'))
+        if used is not None:
+            self.governor.sync(int(used))
+        if response.status_code in (418, 429):
+            self.governor.block(float(response.headers.get('Retry-After',
+                                                           60)))
+
+    @property
+    def symbols(self) -> SymbolIndex:
+        return get_symbol_index(self.filters)
 
-        self.filters = {
+    def _fetch_filters(self):
+        filters = self._request('get_exchange_info')['symbols']
+        return {
             filt['symbol']: {
                 'min_order_size': Decimal(filt['filters'][2]['minQty']),
                 'max_order_size': Decimal(filt['filters'][2]['maxQty']),
@@ -30,13 +137,17 @@ class Binance(Exchange):
             for filt in filters if 'minQty' in filt['filters'][2]
         }
 
+    def listed_products(self):
+        return self.symbols.products()
+
     def get_mid_price_orderbooks(self, products=None):
-        prices_list = self.client.get_all_tickers()
+        prices_list = self._request('get_all_tickers')
         orderbooks = []
+        symbols = self.symbols
         for price_symbol in prices_list:
-            currency_pair = binance_product_to_currencies(
-                price_symbol['symbol'])
-            product = '_'.join(currency_pair)
+            product = symbols.to_product(price_symbol['symbol'])
+            if product is None:
+                continue
             if products is not None and product not in products:
                 continue
             orderbook = OrderBook(
@@ -48,24 +159,57 @@ class Binance(Exchange):
 
     def get_orderbooks(self, products=None, depth: int=1):
         if depth != 1:
-            raise NotImplementedError
+            if products is None:
+                raise ValueError('products are required for depth > 1')
+            return self.get_orderbooks_of_depth(products, depth)
         if products is not None:
             products = set(products)
         return self.get_orderbooks_of_depth1(products)
 
+    def get_orderbooks_of_depth(self, products, depth: int):
+        """
+        get L2 orderbooks of specified products, one request per product
+        """
+        orderbooks = []
+        symbols = self.symbols
+        for product in products:
+            symbol = symbols.to_symbol(product)
+            if symbol is None:
+                continue
+            book = self._request('get_order_book', order_book_weight(depth),
+                                 symbol=symbol, limit=depth)
+            if not book['bids'] or not book['asks']:
+                continue
+            orderbooks.append(L2OrderBook(product, book['bids'][:depth],
+                                          book['asks'][:depth]))
+        return orderbooks
+
     def get_orderbooks_of_depth1(self, products):
         """
         get all orderbooks with depth equal to 1, then filter out those,
         which symbol is not in specified products
+        answers from book ticker stream, shared memory table of worker
+        host or shared market snapshot, when they are enabled and fresh
         """
-        books_list = self.client.get_orderbook_tickers()
+        if self.stream is not None:
+            orderbooks = self.stream.get_orderbooks(products)
+            if orderbooks is not None:
+                return orderbooks
+        if shared_books.READER is not None:
+            orderbooks = shared_books.READER.get_orderbooks(products)
+            if orderbooks is not None:
+                return orderbooks
+        if self.snapshot is not None:
+            orderbooks = self.snapshot.get_orderbooks('binance', products)
+            if orderbooks is not None:
+                return orderbooks
+        books_list = self._request('get_orderbook_tickers')
         orderbooks = []
+        symbols = self.symbols
         for book in books_list:
-            currency_pair = binance_product_to_currencies(
-                book['symbol'])
-            if not currency_pair:
+            product = symbols.to_product(book['symbol'])
+            if product is None:
                 continue
-            product = '_'.join(currency_pair)
             if products is not None and product not in products:
                 continue
             orderbook = OrderBook(
@@ -74,6 +218,8 @@ class Binance(Exchange):
             if orderbook.get_wall_ask() <= Decimal('1e-8'):
                 continue
             orderbooks.append(orderbook)
+        if self.stream is not None:
+            self.stream.seed(orderbooks, complete=products is None)
         return orderbooks
 
     def get_taker_fee(self, product):
@@ -87,7 +233,7 @@ class Binance(Exchange):
 
     def get_resources(self):
         return {asset_balance['asset']: Decimal(asset_balance['free'])
-                for asset_balance in self.client.get_account()['balances']
+                for asset_balance in self._request('get_account')['balances']
                 if Decimal(asset_balance['free']) > Decimal(0)}
 
     def place_limit_order(self, order):
@@ -96,20 +242,24 @@ class Binance(Exchange):
         logger.info("validated order - {}".format(str(order)))
         if order is None:
             return
-        symbol = ''.join(order.product.split('_'))
+        symbol = self.symbols.to_symbol(order.product)
         side = order._action.name
         quantity = order._quantity
         new_order_resp_type = 'FULL'
         price = order._price
         try:
-            resp = self.client.create_order(
-                side=side, symbol=symbol,
+            resp = self._request(
+                'create_order', side=side, symbol=symbol,
                 quantity=quantity,
                 newOrderRespType=new_order_resp_type,
                 price=price.to_eng_string(),
                 type=self.client.ORDER_TYPE_LIMIT_MAKER)
         except BinanceAPIException as e:
+            if self.ledger is not None:
+                self.ledger.invalidate()
             return e
+        if self.ledger is not None:
+            self.ledger.reserve(order)
 
         order_id = resp['orderId']
         client_order_id = resp['clientOrderId']
@@ -143,21 +293,25 @@ class Binance(Exchange):
         logger.info("validated order - {}".format(str(order)))
         if order is None:
             return
-        symbol = ''.join(order.product.split('_'))
+        symbol = self.symbols.to_symbol(order.product)
         side = order._action.name
         quantity = order._quantity
         newOrderRespType = 'FULL'
         try:
-            resp = self.client.order_market(side=side, symbol=symbol,
-                                            quantity=quantity,
-                                            newOrderRespType=newOrderRespType)
+            resp = self._request('order_market', side=side, symbol=symbol,
+                                 quantity=quantity,
+                                 newOrderRespType=newOrderRespType)
         except BinanceAPIException as e:
+            if self.ledger is not None:
+                self.ledger.invalidate()
             return e
 
         parsed_response = self.parse_market_order_response(resp)
         parsed_response['price_estimates'] = price_estimates
-        parsed_response['product'] = '_'.join(binance_product_to_currencies(
-            parsed_response['symbol']))
+        parsed_response['product'] = self.symbols.to_product(
+            parsed_response['symbol'])
+        if self.ledger is not None:
+            self.ledger.apply_market_order_response(parsed_response)
         logger.info("parsed order response - {}".format(str(parsed_response)))
         return parsed_response
 
@@ -189,9 +343,10 @@ class Binance(Exchange):
 
         return ret
 
-    def _validate_order(self, order, price_estimates=None):
-        resources = self.get_resources()
-        symbol = ''.join(order.product.split('_'))
+    def _validate_order(self, order, price_estimates=None, resources=None):
+        if resources is None:
+            resources = self.get_validation_resources()
+        symbol = self.symbols.to_symbol(order.product)
         filt = self.filters[symbol]
 
         if order._quantity < filt['min_order_size']:
@@ -220,7 +375,8 @@ class Binance(Exchange):
         if order._action.name == 'SELL':
             if resources[filt['commodity']] < order._quantity:
                 order._quantity = resources[filt['commodity']]
-                order = self._validate_order(order, price_estimates)
+                order = self._validate_order(order, price_estimates,
+                                             resources)
         else:
             if order._price is None:
                 price_commodity = price_estimates[filt['commodity']]
@@ -232,7 +388,8 @@ class Binance(Exchange):
                 order._quantity = resources[filt['base']] / (
                     price * Decimal('1.0001'))
                 # any number
-                order = self._validate_order(order, price_estimates)
+                order = self._validate_order(order, price_estimates,
+                                             resources)
         return order
 
     def get_order(self, params):
@@ -261,7 +418,7 @@ class Binance(Exchange):
         """
         logger.info("get order = {}".format(str(params)))
         d = self._parse_params(params)
-        resp = self.client.get_order(**d)
+        resp = self._request('get_order', **d)
         resp.update({'orig_quantity': resp['origQty'],
                      'executed_quantity': resp['executedQty']})
         logger.info("get order response - {}".format(str(resp)))
@@ -282,8 +439,11 @@ class Binance(Exchange):
         """
         logger.info("canceled order - {}".format(str(params)))
         d = self._parse_params(params)
+        if self.ledger is not None:
+            # order might be partially filled before cancel
+            self.ledger.invalidate()
         try:
-            resp = self.client.cancel_order(**d)
+            resp = self._request('cancel_order', **d)
         except BinanceAPIException as e:
             if e.message != "UNKNOWN_ORDER":
                 raise e
@@ -296,7 +456,7 @@ class Binance(Exchange):
         d = {}
         assert 'product' in params or 'symbol' in params
         if 'product' in params:
-            d['symbol'] = ''.join(params['product'].split('_'))
+            d['symbol'] = self.symbols.to_symbol(params['product'])
         else:
             d['symbol'] = params['symbol']
 
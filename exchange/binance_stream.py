@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import threading
+from decimal import Decimal
+from typing import List
+from websocket import WebSocketApp
+
+from logger import logger
+from internals.orderbook import OrderBook
+from internals.utils import binance_product_to_currencies
+
+
+BOOK_TICKER_STREAM_URL = os.environ.get(
+    'BINANCE_BOOK_TICKER_STREAM_URL',
+    'wss://stream.binance.com:9443/ws/!bookTicker')
+
+
+class BookTickerStream:
+    """
+    in-process top of book of all binance symbols
+
+    a background thread subscribes to bookTicker stream and keeps
+    OrderBook objects up to date. the stream only pushes changes, so
+    books of quiet symbols are seeded from REST snapshots (see seed),
+    and the whole cache is considered stale if no message arrived
+    for `max_staleness` seconds
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, url: str=BOOK_TICKER_STREAM_URL,
+                 max_staleness: float=5., reconnect_delay: float=1.):
+        self.url = url
+        self.max_staleness = max_staleness
+        self.reconnect_delay = reconnect_delay
+        self.orderbooks = {}
+        # SymbolIndex, set by Binance exchange
+        self.symbols = None
+        self.last_message_time = 0
+        self.seeded = False
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._ws = None
+
+    @classmethod
+    def shared(cls):
+        """
+        process-wide stream, started on first use
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+                cls._shared.start()
+            return cls._shared
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._ws is not None:
+            self._ws.close()
+        if self._thread is not None:
+            # socket read loop may only notice closing on its next select
+            # timeout, thread is a daemon, so it's not waited for longer
+            self._thread.join(self.reconnect_delay)
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.last_message_time < self.max_staleness
+
+    def seed(self, orderbooks: List[OrderBook], complete: bool=True):
+        """
+        add REST snapshot, books received from stream are kept
+        :param complete: True if snapshot has all symbols
+        """
+        with self._lock:
+            for orderbook in orderbooks:
+                self.orderbooks.setdefault(orderbook.product, orderbook)
+            self.seeded = self.seeded or complete
+
+    def get_orderbooks(self, products=None):
+        """
+        :param products: products in 'commodity_base' format, None for all
+        :return: list of orderbooks, or None if cache can't answer,
+                 because it's stale or some products are missing
+        """
+        if not self.is_fresh():
+            return None
+        with self._lock:
+            if products is None:
+                if not self.seeded:
+                    return None
+                return list(self.orderbooks.values())
+            if any(product not in self.orderbooks for product in products):
+                return None
+            return [self.orderbooks[product] for product in products]
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._ws = WebSocketApp(self.url, on_message=self._on_message,
+                                    on_error=self._on_error)
+            self._ws.run_forever()
+            if self._stopped.wait(self.reconnect_delay):
+                break
+
+    def _on_error(self, ws, error):
+        logger.warning('book ticker stream error: {}'.format(error))
+
+    def _on_message(self, ws, message):
+        self.last_message_time = time.time()
+        data = json.loads(message)
+        if 'data' in data:
+            # combined stream payload
+            data = data['data']
+        if self.symbols is not None:
+            product = self.symbols.to_product(data['s'])
+        else:
+            currency_pair = binance_product_to_currencies(data['s'])
+            product = '_'.join(currency_pair) if currency_pair else None
+        if product is None:
+            return
+        bid, ask = Decimal(data['b']), Decimal(data['a'])
+        if ask <= Decimal('1e-8'):
+            return
+        orderbook = OrderBook(product, {'bid': bid, 'ask': ask})
+        with self._lock:
+            self.orderbooks[orderbook.product] = orderbook
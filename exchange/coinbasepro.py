@@ -1,3 +1,4 @@
+import os
 from decimal import Decimal
 from typing import List, Dict
 from cbpro import PublicClient, AuthenticatedClient
@@ -5,23 +6,62 @@ from cbpro import PublicClient, AuthenticatedClient
 from logger import logger
 from exchange.exchange import Exchange
 from internals.order import Order
-from internals.orderbook import OrderBook
+from internals.orderbook import OrderBook, L2OrderBook
 from internals.utils import quantize
+from internals.rate_limiter import TokenBucket, WeightGovernor
+from exchange.snapshot import MarketSnapshot, MARKET_SNAPSHOT_ENABLED
+from exchange.single_flight import SINGLE_FLIGHT
+from exchange.hedge import HEDGER, HEDGING_ENABLED
 
-import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# public endpoints allow 3 requests per second with bursts up to 6,
+# process limit, when requests aren't governed by WeightGovernor
+PUBLIC_RATE_LIMITER = TokenBucket(rate=3, capacity=6)
+ORDERBOOK_WORKERS = 6
+# request rate shared by processes, see WeightGovernor
+WEIGHT_GOVERNOR_ENABLED = os.environ.get(
+    'EXCHANGE_WEIGHT_GOVERNOR', '0') == '1'
+# requests per second per ip
+PUBLIC_REQUEST_LIMIT = 3
+PRIVATE_REQUEST_LIMIT = 5
 
 
 class CoinbasePro(Exchange):
+    # request budgets of public and private endpoints, see WeightGovernor
+    public_governor = None
+    private_governor = None
+    # client methods of public endpoints, others are private. concurrent
+    # identical calls of public endpoints are coalesced, see SingleFlight
+    PUBLIC_METHODS = {'get_products', 'get_product_order_book'}
+    # hedged requests of idempotent reads, see Hedger. orders are never
+    # hedged, neither are fills, which are paginated lazily
+    hedger = None
+    HEDGED_METHODS = PUBLIC_METHODS | {'get_accounts', 'get_order'}
+
     def __init__(self, api_key: str=None,
                  secret_key: str=None,
-                 passphrase: str=None):
+                 passphrase: str=None,
+                 snapshot: MarketSnapshot=None):
         super().__init__()
         if any(i is None for i in [api_key, secret_key, passphrase]):
             self.client = PublicClient()
         else:
             self.client = AuthenticatedClient(api_key, secret_key, passphrase)
+        if WEIGHT_GOVERNOR_ENABLED:
+            self.public_governor = WeightGovernor.shared(
+                'coinbasepro_public', PUBLIC_REQUEST_LIMIT, 1)
+            self.private_governor = WeightGovernor.shared(
+                'coinbasepro_private', PRIVATE_REQUEST_LIMIT, 1)
+            self.client.session.hooks['response'].append(self._on_response)
+        if HEDGING_ENABLED:
+            self.hedger = HEDGER
+        if snapshot is None and MARKET_SNAPSHOT_ENABLED:
+            snapshot = MarketSnapshot.shared()
+        self.snapshot = snapshot
 
-        self.products = self.client.get_products()
+        self.products = self._request('get_products')
         self.filters = {product['id']: {
             'min_order_size': Decimal(product['base_min_size']),
             'max_order_size': Decimal(product['base_max_size']),
@@ -31,6 +71,48 @@ class CoinbasePro(Exchange):
             'commodity': product['base_currency']
         } for product in self.products}
 
+    def _governor(self, method):
+        if method in self.PUBLIC_METHODS:
+            return self.public_governor
+        return self.private_governor
+
+    def _request(self, method: str, *args, **kwargs):
+        """
+        call client method, when request budget of its endpoint is available
+        """
+        if method in self.PUBLIC_METHODS:
+            key = ('coinbasepro.' + method, args,
+                   tuple(sorted(kwargs.items())))
+            return SINGLE_FLIGHT.do(
+                key, lambda: self._call(method, args, kwargs))
+        return self._call(method, args, kwargs)
+
+    def _call(self, method, args, kwargs):
+        def fetch():
+            # one token per request sent, coalesced callers don't take it
+            governor = self._governor(method)
+            if governor is not None:
+                governor.acquire()
+            elif method in self.PUBLIC_METHODS:
+                PUBLIC_RATE_LIMITER.acquire()
+            return getattr(self.client, method)(*args, **kwargs)
+
+        if self.hedger is not None and method in self.HEDGED_METHODS:
+            return self.hedger.call('coinbasepro.' + method, fetch)
+        return fetch()
+
+    def _on_response(self, response, *args, **kwargs):
+        if response.status_code == 429:
+            # path tells, which budget is exceeded
+            public = '/products' in response.url
+            governor = (self.public_governor if public
+                        else self.private_governor)
+            if governor is not None:
+                governor.block(1)
+
+    def listed_products(self):
+        return {product['id'].replace('-', '_') for product in self.products}
+
     def through_trade_currencies(self):
         return {'BTC', 'USD'}
 
@@ -42,39 +124,56 @@ class CoinbasePro(Exchange):
 
     def get_resources(self):
         return {account['currency']: Decimal(account['available'])
-                for account in self.client.get_accounts()}
+                for account in self._request('get_accounts')}
 
     def place_market_order(self, order: Order,
                            price_estimates: Dict[str, Decimal]):
 
         logger.info("creating market order - {}".format(str(order)))
-        order = self.validate_order(order, price_estimates)
-        symbol = order.product.replace('_', '-')
+        order = self._validate_order(order, price_estimates)
         logger.info("validated order - {}".format(str(order)))
-        resp = self.client.place_market_order(
-            symbol, order._action.name.lower(), size=order._quantity)
+        if order is None:
+            return
+        symbol = order.product.replace('_', '-')
+        resp = self._request('place_market_order', symbol,
+                             order._action.name.lower(), size=order._quantity)
+        if 'id' not in resp:
+            if self.ledger is not None:
+                self.ledger.invalidate()
+            return Exception(resp.get('message', str(resp)))
 
         parsed_response = self.parse_market_order_response(resp)
         parsed_response['price_estimates'] = price_estimates
         parsed_response['product'] = parsed_response['symbol'].replace(
             '-', '_')
+        if self.ledger is not None:
+            self.ledger.apply_market_order_response(parsed_response)
         logger.info("parsed order response - {}".format(str(parsed_response)))
         return parsed_response
 
     def place_limit_order(self, order: Order):
         logger.info("creating limit order - {}".format(str(order)))
-        order = self.validate_order(order)
+        order = self._validate_order(order)
         logger.info("validated order - {}".format(str(order)))
+        if order is None:
+            return
         symbol = order.product.replace('_', '-')
-        resp = self.client.place_market_order(symbol,
-                                              order._action.name.lower(),
-                                              order._price, order._quantity,
-                                              post_only=True)
+        resp = self._request('place_limit_order', symbol,
+                             order._action.name.lower(),
+                             order._price, order._quantity,
+                             post_only=True)
         logger.info("order response - {}".format(str(resp)))
+        if 'id' not in resp:
+            if self.ledger is not None:
+                self.ledger.invalidate()
+            return Exception(resp.get('message', str(resp)))
+        if self.ledger is not None:
+            self.ledger.reserve(order)
         return {'order_id': resp['id']}
 
-    def _validate_order(self, order, price_estimates=None):
-        resources = self.get_resources()
+    def _validate_order(self, order, price_estimates=None, resources=None):
+        if resources is None:
+            resources = self.get_validation_resources()
         symbol = order.product.replace('_', '-')
         filt = self.filters[symbol]
         base, commodity = filt['base'], filt['commodity']
@@ -98,7 +197,8 @@ class CoinbasePro(Exchange):
         if order._action.name == 'SELL':
             if order._quantity > resources[commodity]:
                 order._quantity = resources[commodity]
-                order = self._validate_order(order, price_estimates)
+                order = self._validate_order(order, price_estimates,
+                                             resources)
         else:
             epsilon = Decimal('1.0001')
             if order._price is not None:
@@ -106,39 +206,45 @@ class CoinbasePro(Exchange):
                 if price * order._quantity > resources[base]:
                     order._quantity = resources[base] / (
                         price * epsilon)
-                    order = self._validate_order(order, price_estimates)
+                    order = self._validate_order(order, price_estimates,
+                                                 resources)
             else:
                 price = price_estimates[commodity] / price_estimates[base]
                 fee = self.get_taker_fee(order.product) + 1
                 if price * order._quantity * fee > resources[base]:
                     order._quantity = resources[base] / (price * fee * epsilon)
-                    order = self._validate_order(order, price_estimates)
+                    order = self._validate_order(order, price_estimates,
+                                                 resources)
         return order
 
     def parse_market_order_response(self, response):
-        fills = self.client.get_fills(response['id'])
-        total_size = [Decimal(fill['size']) for fill in fills]
-        total_money = [Decimal(fill['size']) * Decimal(fill['price'])
-                       for fill in fills]
+        fills = list(self._request('get_fills', order_id=response['id']))
+        total_size = sum(Decimal(fill['size']) for fill in fills)
+        total_money = sum(Decimal(fill['size']) * Decimal(fill['price'])
+                          for fill in fills)
         fee_asset = response['product_id'].split('-')[-1]
-        product = response['product_id'].replace('-', '_')
-        fee = self.get_taker_fee(product) * total_money
+        fee = sum(Decimal(fill['fee']) for fill in fills)
+        # unfilled or cancelled order has no fills
+        mean_price = total_money / total_size if total_size else None
         return {'symbol': response['product_id'],
                 'orderId': response['id'],
-                'executed_quantity': Decimal(response['executed_value']),
-                'mean_price': total_money / total_size,
+                'executed_quantity': Decimal(total_size),
+                'mean_price': mean_price,
                 'commission_' + fee_asset: fee,
                 'side': response['side']}
 
     def cancel_limit_order(self, response):
         logger.info("canceled order - {}".format(response))
         order_id = response['order_id']
-        return self.client.cancel_order(order_id)
+        if self.ledger is not None:
+            # order might be partially filled before cancel
+            self.ledger.invalidate()
+        return self._request('cancel_order', order_id)
 
     def get_order(self, response):
         logger.info("get order = {}".format(str(response)))
         order_id = response['order_id']
-        resp = self.client.get_order(order_id)
+        resp = self._request('get_order', order_id)
         # TODO: executed quantity and orig_quantity
         resp.update({'executed_quantity': Decimal(resp['executed_value']),
                      'orig_quantity': Decimal(resp['size'])})
@@ -146,22 +252,46 @@ class CoinbasePro(Exchange):
         return resp
 
     def get_orderbooks(self, products: List[str]=None, depth: int=1):
-        if not isinstance(self.client, AuthenticatedClient):
-            raise Exception('Client not authenticated')
         if products is None:
+            # books of owned currencies
+            if not isinstance(self.client, AuthenticatedClient):
+                raise Exception('Client not authenticated')
             owned = list(self.get_resources().keys())
             products = [product['id'].replace('-', '_') for product in self.products
                         if product['id'].split('-')[0] in owned]
+        products = list(products)
+        if depth == 1 and self.snapshot is not None:
+            orderbooks = self.snapshot.get_orderbooks('coinbasepro', products)
+            if orderbooks is not None:
+                return orderbooks
+        level = 1 if depth == 1 else 2
+        with ThreadPoolExecutor(max_workers=ORDERBOOK_WORKERS) as executor:
+            raw_orderbooks = executor.map(
+                lambda product: self._get_product_order_book(product, level),
+                products)
+            raw_orderbooks = list(raw_orderbooks)
+        return self.parse_orderbooks(products, raw_orderbooks, depth)
+
+    def parse_orderbooks(self, products, raw_orderbooks, depth: int=1):
         orderbooks = []
-        for product in products:
-            symbol = product.replace('_', '-')
-            raw_orderbook = self.client.get_product_order_book(symbol)
-            logger.info(f'Parsing orderbook data: {str(raw_orderbook)} for symbol {str(symbol)} (client is {str(self.client)})')
+        for product, raw_orderbook in zip(products, raw_orderbooks):
             if len(raw_orderbook['bids']) == 0 or len(raw_orderbook['asks']) == 0:
                 continue
+            if depth != 1:
+                orderbooks.append(L2OrderBook(product,
+                                              raw_orderbook['bids'][:depth],
+                                              raw_orderbook['asks'][:depth]))
+                continue
             orderbook = OrderBook(product,
                                   {'bid': Decimal(raw_orderbook['bids'][0][0]),
                                    'ask': Decimal(raw_orderbook['asks'][0][0])})
             orderbooks.append(orderbook)
-            time.sleep(1.0/3)    # TODO figure out how to do this more efficiently
         return orderbooks
+
+    def _get_product_order_book(self, product, level=1):
+        symbol = product.replace('_', '-')
+        raw_orderbook = self._request('get_product_order_book', symbol, level)
+        logger.info('Parsing orderbook data: {} for symbol {} '
+                    '(client is {})'.format(raw_orderbook, symbol,
+                                            self.client))
+        return raw_orderbook
@@ -1,7 +1,13 @@
 from internals.order import Order
+from internals.ledger import BalanceLedger
 
 
 class Exchange:
+    # balance ledger of running rebalance, see open_ledger
+    ledger = None
+    # shared top of book, see exchange.snapshot
+    snapshot = None
+
     def __init__(self):
         pass
 
@@ -9,9 +15,33 @@ class Exchange:
         # products in 'commodity_base' format
         raise NotImplementedError
 
+    def listed_products(self):
+        # products in 'commodity_base' format, None if listing is unknown
+        return None
+
     def get_resources(self):
         raise NotImplementedError
 
+    def open_ledger(self, resources=None) -> BalanceLedger:
+        """
+        start tracking balances locally, orders are validated against
+        ledger instead of get_resources until close_ledger is called
+        """
+        if resources is None:
+            resources = self.get_resources()
+        self.ledger = BalanceLedger(resources)
+        return self.ledger
+
+    def close_ledger(self):
+        self.ledger = None
+
+    def get_validation_resources(self):
+        if self.ledger is None:
+            return self.get_resources()
+        if self.ledger.drifted:
+            self.ledger.reset(self.get_resources())
+        return self.ledger.get_balances()
+
     def place_market_order(self, order: Order):
         raise NotImplementedError
 
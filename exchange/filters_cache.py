@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from decimal import Decimal
+
+from logger import logger
+
+
+FILTERS_CACHE_TTL = int(os.environ.get('EXCHANGE_FILTERS_CACHE_TTL', 3600))
+FILTERS_CACHE_DIR = os.environ.get('EXCHANGE_FILTERS_CACHE_DIR',
+                                   tempfile.gettempdir())
+
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    raise TypeError('{} is not serializable'.format(type(value)))
+
+
+def _decode(dct):
+    if '__decimal__' in dct:
+        return Decimal(dct['__decimal__'])
+    return dct
+
+
+class FiltersCache:
+    """
+    process-wide cache of parsed exchange filters
+
+    filters are kept in memory and mirrored to a json file, so other
+    processes (gunicorn workers, celery children) on the same host
+    don't have to download exchange info again.
+    entries older than `refresh_after` seconds are still served, but are
+    refreshed in a background thread, entries older than `ttl` seconds
+    are fetched synchronously.
+    """
+
+    def __init__(self, name: str, ttl: int=FILTERS_CACHE_TTL,
+                 refresh_after: int=None, path: str=None):
+        self.name = name
+        self.ttl = ttl
+        self.refresh_after = (refresh_after if refresh_after is not None
+                              else ttl // 2)
+        self.path = path or os.path.join(
+            FILTERS_CACHE_DIR, '{}_filters.json'.format(name))
+        self.filters = None
+        self.timestamp = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self, fetch):
+        """
+        :param fetch: function without arguments, which downloads filters
+        :return: filters, from memory, file or `fetch`
+        """
+        with self._lock:
+            if self._age() >= self.ttl:
+                self._load()
+            if self._age() < self.ttl:
+                self.hits += 1
+                if self._age() >= self.refresh_after:
+                    self._refresh_in_background(fetch)
+                return self.filters
+            self.misses += 1
+        filters = fetch()
+        self._store(filters)
+        return filters
+
+    def invalidate(self):
+        with self._lock:
+            self.filters = None
+            self.timestamp = 0
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def _age(self):
+        if self.filters is None:
+            return float('inf')
+        return time.time() - self.timestamp
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as rfile:
+                data = json.load(rfile, object_hook=_decode)
+        except (OSError, ValueError):
+            return
+        if data['timestamp'] > self.timestamp:
+            self.filters = data['filters']
+            self.timestamp = data['timestamp']
+
+    def _store(self, filters):
+        timestamp = time.time()
+        with self._lock:
+            self.filters = filters
+            self.timestamp = timestamp
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            with open(tmp_path, 'w') as wfile:
+                json.dump({'timestamp': timestamp, 'filters': filters},
+                          wfile, default=_encode)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning('could not write {} filters cache: {}'.format(
+                self.name, e))
+
+    def _refresh_in_background(self, fetch):
+        if self._refreshing:
+            return
+        self._refreshing = True
+
+        def refresh():
+            try:
+                self._store(fetch())
+            except Exception as e:
+                logger.warning('could not refresh {} filters: {}'.format(
+                    self.name, e))
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
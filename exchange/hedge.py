@@ -0,0 +1,138 @@
+import os
+import math
+import time
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait, \
+    FIRST_COMPLETED
+
+
+HEDGING_ENABLED = os.environ.get('EXCHANGE_HEDGING', '0') == '1'
+# hedge is sent, when request is slower than this percentile of endpoint
+HEDGE_PERCENTILE = float(os.environ.get('EXCHANGE_HEDGE_PERCENTILE', 95))
+# hedges are at most this fraction of requests
+HEDGE_BUDGET = float(os.environ.get('EXCHANGE_HEDGE_BUDGET', 0.05))
+HEDGE_WORKERS = 16
+
+
+class Hedger:
+    """
+    hedged requests of idempotent reads
+
+    request, which isn't answered within `percentile` of recent latencies
+    of its endpoint, is sent once more and the first successful answer is
+    taken. hedges earn `budget` credit per request, so they can't exceed
+    that fraction of requests (beyond `max_credit` burst). endpoint isn't
+    hedged until it has `min_samples` latencies
+    """
+
+    def __init__(self, percentile: float=HEDGE_PERCENTILE,
+                 budget: float=HEDGE_BUDGET, max_credit: float=5.,
+                 min_samples: int=20, window: int=200,
+                 workers: int=HEDGE_WORKERS):
+        self.percentile = percentile
+        self.budget = budget
+        self.max_credit = max_credit
+        self.min_samples = min_samples
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._metrics = defaultdict(lambda: {'calls': 0, 'hedged': 0,
+                                             'hedge_won': 0})
+        self._credit = 0.
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        # idle workers, requests aren't queued behind busy ones
+        self._slots = threading.Semaphore(workers)
+
+    def delay(self, endpoint: str):
+        """
+        :return: seconds to wait before hedge, None if it isn't known yet
+        """
+        with self._lock:
+            latencies = sorted(self._latencies[endpoint])
+        if len(latencies) < self.min_samples:
+            return None
+        rank = math.ceil(self.percentile / 100 * len(latencies))
+        return latencies[max(rank, 1) - 1]
+
+    def _record(self, endpoint, latency):
+        with self._lock:
+            self._latencies[endpoint].append(latency)
+
+    def _run(self, endpoint, fetch):
+        start = time.time()
+        result = fetch()
+        self._record(endpoint, time.time() - start)
+        return result
+
+    def _submit(self, endpoint, fetch):
+        start = time.time()
+
+        def record(future):
+            self._slots.release()
+            if future.exception() is None:
+                self._record(endpoint, time.time() - start)
+
+        future = self._executor.submit(fetch)
+        future.add_done_callback(record)
+        return future
+
+    def _has_credit(self):
+        with self._lock:
+            return self._credit >= 1
+
+    def _take_credit(self):
+        with self._lock:
+            if self._credit < 1:
+                return False
+            self._credit -= 1
+            return True
+
+    def call(self, endpoint: str, fetch):
+        """
+        request, which can't be hedged, runs in caller thread. so does
+        request, which finds all workers busy, it isn't hedged then
+        :param fetch: idempotent request, it may run twice concurrently
+        """
+        with self._lock:
+            self._metrics[endpoint]['calls'] += 1
+            self._credit = min(self._credit + self.budget, self.max_credit)
+        delay = self.delay(endpoint)
+        if delay is None or not self._has_credit() or \
+                not self._slots.acquire(blocking=False):
+            return self._run(endpoint, fetch)
+        primary = self._submit(endpoint, fetch)
+        try:
+            return primary.result(timeout=delay)
+        except TimeoutError:
+            pass
+        if not self._slots.acquire(blocking=False):
+            return primary.result()
+        if not self._take_credit():
+            self._slots.release()
+            return primary.result()
+        hedge = self._submit(endpoint, fetch)
+        with self._lock:
+            self._metrics[endpoint]['hedged'] += 1
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self._metrics[endpoint]['hedge_won'] += 1
+                    return future.result()
+        # both failed
+        return primary.result()
+
+    def metrics(self):
+        """
+        :return: {endpoint: {'calls': n, 'hedged': m, 'hedge_won': k}}
+        """
+        with self._lock:
+            return {endpoint: dict(metrics)
+                    for endpoint, metrics in self._metrics.items()}
+
+
+# process-wide, so latencies and budget are shared by exchange instances
+HEDGER = Hedger()
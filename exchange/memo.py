@@ -0,0 +1,104 @@
+import time
+import threading
+from copy import copy
+
+from exchange.exchange import Exchange
+
+
+MEMO_MAX_AGE = 5.
+
+
+class MemoizedExchange:
+    """
+    request (or task) scoped memo around exchange read methods
+
+    results of get_resources, get_orderbooks, fee lookups etc are shared
+    within one logical operation, any order placement or cancellation
+    clears the memo. entries are also dropped after `max_age` seconds,
+    so long running rebalances still see fresh market data.
+    other attributes are taken from the wrapped exchange
+    """
+
+    def __init__(self, exchange: Exchange, max_age: float=MEMO_MAX_AGE):
+        self.exchange = exchange
+        self.max_age = max_age
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.exchange, name)
+
+    def _get(self, key, fetch):
+        with self._lock:
+            if key in self._memo:
+                value, timestamp = self._memo[key]
+                if time.time() - timestamp < self.max_age:
+                    return value
+        value = fetch()
+        with self._lock:
+            self._memo[key] = (value, time.time())
+        return value
+
+    def _peek(self, key):
+        with self._lock:
+            if key in self._memo:
+                value, timestamp = self._memo[key]
+                if time.time() - timestamp < self.max_age:
+                    return value
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+
+    def get_resources(self):
+        return copy(self._get('resources', self.exchange.get_resources))
+
+    def get_orderbooks(self, products=None, depth: int=1):
+        if products is not None:
+            products = list(products)
+            # filtered books are served from snapshot of all books,
+            # if it has all of them
+            snapshot = self._peek(('orderbooks', None, depth))
+            if snapshot is not None:
+                orderbooks = {orderbook.product: orderbook
+                              for orderbook in snapshot}
+                if all(product in orderbooks for product in products):
+                    return [orderbooks[product] for product in products]
+            key = ('orderbooks', tuple(sorted(products)), depth)
+        else:
+            key = ('orderbooks', None, depth)
+        return list(self._get(key, lambda: self.exchange.get_orderbooks(
+            products, depth=depth)))
+
+    def listed_products(self):
+        return self._get('listed_products', self.exchange.listed_products)
+
+    def through_trade_currencies(self):
+        return copy(self._get('through_trade_currencies',
+                              self.exchange.through_trade_currencies))
+
+    def get_taker_fee(self, product):
+        return self._get(('taker_fee', product),
+                         lambda: self.exchange.get_taker_fee(product))
+
+    def get_maker_fee(self, product):
+        return self._get(('maker_fee', product),
+                         lambda: self.exchange.get_maker_fee(product))
+
+    def _write(self, function, *args):
+        # reads of other threads during write mustn't stay memoized
+        self.clear()
+        try:
+            return function(*args)
+        finally:
+            self.clear()
+
+    def place_market_order(self, order, price_estimates):
+        return self._write(self.exchange.place_market_order,
+                           order, price_estimates)
+
+    def place_limit_order(self, order):
+        return self._write(self.exchange.place_limit_order, order)
+
+    def cancel_limit_order(self, params):
+        return self._write(self.exchange.cancel_limit_order, params)
@@ -0,0 +1,129 @@
+import os
+import hashlib
+import threading
+import weakref
+import requests
+from copy import copy
+from requests.adapters import HTTPAdapter
+
+from logger import logger
+from internals.cache import LRUCache
+
+
+EXCHANGE_POOL_SIZE = int(os.environ.get('EXCHANGE_POOL_SIZE', 256))
+EXCHANGE_POOL_IDLE_TIMEOUT = float(
+    os.environ.get('EXCHANGE_POOL_IDLE_TIMEOUT', 600))
+# keep-alive connections per host, shared by threads
+HTTP_POOL_MAXSIZE = 16
+
+
+class ThreadLocalSession:
+    """
+    requests session, which is separate for each thread
+
+    requests.Session isn't thread safe, so each thread gets own session
+    with headers and hooks of original one, while connection pools (adapters)
+    are shared, so keep-alive connections are reused by all threads
+    """
+
+    def __init__(self, session: requests.Session,
+                 pool_maxsize: int=HTTP_POOL_MAXSIZE):
+        self._headers = dict(session.headers)
+        self._hooks = {event: list(hooks)
+                       for event, hooks in session.hooks.items()}
+        self._adapters = {
+            'https://': HTTPAdapter(pool_maxsize=pool_maxsize),
+            'http://': HTTPAdapter(pool_maxsize=pool_maxsize)}
+        self._sessions = weakref.WeakSet()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self._headers)
+            for event, hooks in self._hooks.items():
+                session.hooks[event].extend(hooks)
+            with self._lock:
+                for prefix, adapter in self._adapters.items():
+                    session.mount(prefix, adapter)
+                self._sessions.add(session)
+            self._local.session = session
+        return session
+
+    def mount(self, prefix, adapter):
+        """
+        mount adapter in sessions of all threads
+        """
+        with self._lock:
+            self._adapters[prefix] = adapter
+            for session in self._sessions:
+                session.mount(prefix, adapter)
+
+    def __getattr__(self, name):
+        return getattr(self._session(), name)
+
+
+def credentials_key(exchange_class, *credentials) -> str:
+    """
+    pool key, credentials themselves are never stored
+    """
+    digest = hashlib.sha256(exchange_class.__name__.encode())
+    for credential in credentials:
+        digest.update(b'\0')
+        digest.update(str(credential).encode())
+    return digest.hexdigest()
+
+
+class ExchangePool:
+    """
+    bounded LRU pool of authenticated exchanges keyed by credentials hash,
+    exchanges idle for `idle_timeout` seconds are dropped
+
+    each get returns shallow copy of pooled exchange, so client, sessions
+    and filters are shared, while per-operation state, like ledger of
+    rebalance, is kept by the copy
+    """
+
+    def __init__(self, maxsize: int=EXCHANGE_POOL_SIZE,
+                 idle_timeout: float=EXCHANGE_POOL_IDLE_TIMEOUT):
+        self.exchanges = LRUCache(maxsize, idle_timeout)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, key):
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, exchange_class, *credentials):
+        return copy(self._get(exchange_class, *credentials))
+
+    def _get(self, exchange_class, *credentials):
+        key = credentials_key(exchange_class, *credentials)
+        exchange = self.exchanges.get(key)
+        if exchange is not None:
+            return exchange
+        # one exchange is created for same credentials at a time
+        with self._lock(key):
+            exchange = self.exchanges.get(key)
+            if exchange is None:
+                exchange = exchange_class(*credentials)
+                if hasattr(exchange, 'client'):
+                    exchange.client.session = ThreadLocalSession(
+                        exchange.client.session)
+                self.exchanges.set(key, exchange)
+                logger.info('exchange pool size {}'.format(
+                    len(self.exchanges)))
+        with self._locks_lock:
+            self._locks.pop(key, None)
+        return exchange
+
+    def discard(self, exchange_class, *credentials):
+        """
+        drop exchange, for example if credentials were rejected
+        """
+        self.exchanges.pop(credentials_key(exchange_class, *credentials))
+
+
+EXCHANGE_POOL = ExchangePool()
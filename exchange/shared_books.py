@@ -0,0 +1,261 @@
+import os
+import time
+import json
+import multiprocessing
+from decimal import Decimal
+from typing import List
+import numpy as np
+
+from logger import logger
+from internals.orderbook import OrderBook
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+
+def is_available() -> bool:
+    """
+    shared memory needs python 3.8, the table is disabled on older ones
+    """
+    return shared_memory is not None
+
+
+SHARED_ORDERBOOKS_ENABLED = (
+    os.environ.get('SHARED_ORDERBOOKS', '0') == '1' and is_available())
+SHARED_ORDERBOOKS_NAME = os.environ.get('SHARED_ORDERBOOKS_NAME',
+                                        'binance_orderbooks')
+SHARED_ORDERBOOKS_MAX_AGE = float(
+    os.environ.get('SHARED_ORDERBOOKS_MAX_AGE', 5))
+SHARED_ORDERBOOKS_INTERVAL = float(
+    os.environ.get('SHARED_ORDERBOOKS_INTERVAL', 1))
+# seconds to wait for product list from updater
+SHARED_ORDERBOOKS_START_TIMEOUT = 30
+
+# int64 header: sequence number, number of products
+_HEADER_SIZE = 2
+
+
+def _attach_memory(name):
+    try:
+        # attached segment mustn't be unlinked by resource tracker
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # python < 3.13
+        return shared_memory.SharedMemory(name=name)
+
+
+def _create_memory(name, size):
+    # existing segment isn't replaced, another worker on the same host
+    # might use it
+    return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+
+class SharedOrderBooks:
+    """
+    top of book table in shared memory
+
+    rows of (bid, ask, timestamp) are indexed by product table, which is
+    fixed, when table is created, and kept in second segment. one process
+    writes the table, sequence number is odd during write, so readers
+    retry instead of reading half written rows
+    """
+
+    def __init__(self, memory, products_memory, products: List[str],
+                 owner: bool=False):
+        self._memory = memory
+        self._products_memory = products_memory
+        self.products = products
+        self.index = {product: i for i, product in enumerate(products)}
+        self.owner = owner
+        self.header = np.ndarray((_HEADER_SIZE,), dtype=np.int64,
+                                 buffer=memory.buf)
+        self.rows = np.ndarray((len(products), 3), dtype=np.float64,
+                               buffer=memory.buf, offset=_HEADER_SIZE * 8)
+
+    @classmethod
+    def create(cls, name: str, products: List[str]):
+        products = sorted(products)
+        table = json.dumps(products).encode()
+        products_memory = _create_memory(name + '_products', len(table) + 8)
+        products_memory.buf[:8] = len(table).to_bytes(8, 'little')
+        products_memory.buf[8:8 + len(table)] = table
+        try:
+            memory = _create_memory(
+                name, (_HEADER_SIZE + 3 * max(len(products), 1)) * 8)
+        except FileExistsError:
+            products_memory.close()
+            products_memory.unlink()
+            raise
+        books = cls(memory, products_memory, products, owner=True)
+        books.header[:] = [0, len(products)]
+        books.rows[:] = 0
+        return books
+
+    @classmethod
+    def attach(cls, name: str):
+        products_memory = _attach_memory(name + '_products')
+        size = int.from_bytes(bytes(products_memory.buf[:8]), 'little')
+        products = json.loads(bytes(products_memory.buf[8:8 + size]))
+        return cls(_attach_memory(name), products_memory, products)
+
+    def write(self, orderbooks: List[OrderBook], timestamp: float=None):
+        if timestamp is None:
+            timestamp = time.time()
+        indices, values = [], []
+        for orderbook in orderbooks:
+            i = self.index.get(orderbook.product)
+            if i is None:
+                continue
+            indices.append(i)
+            values.append((orderbook.get_wall_bid(),
+                           orderbook.get_wall_ask(), timestamp))
+        self.header[0] += 1
+        if indices:
+            self.rows[indices] = np.array(values, dtype=np.float64)
+        self.header[0] += 1
+
+    def _read(self, indices, retries: int=100):
+        for _ in range(retries):
+            sequence = int(self.header[0])
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            rows = self.rows[indices]
+            if int(self.header[0]) == sequence:
+                return rows
+        return None
+
+    def get_orderbooks(self, products=None,
+                       max_age: float=SHARED_ORDERBOOKS_MAX_AGE):
+        """
+        :param products: products in 'commodity_base' format, None for all
+        :return: list of orderbooks, or None if table can't answer,
+                 because it's stale or some products are missing
+        """
+        all_products = products is None
+        if all_products:
+            products = self.products
+        indices = [self.index.get(product) for product in products]
+        if any(i is None for i in indices):
+            return None
+        rows = self._read(indices)
+        if rows is None:
+            return None
+        now = time.time()
+        if all_products:
+            # products, which were never written, aren't listed
+            written = rows[:, 2] > 0
+            products = [product for product, w in zip(products, written)
+                        if w]
+            rows = rows[written]
+            if not len(rows):
+                return None
+        elif (rows[:, 2] <= 0).any():
+            return None
+        if (now - rows[:, 2] >= max_age).any():
+            return None
+        # repr is the shortest string, which gives the same float
+        return [OrderBook(product, {'bid': Decimal(repr(bid)),
+                                    'ask': Decimal(repr(ask))})
+                for product, (bid, ask, _) in zip(products, rows.tolist())]
+
+    def close(self):
+        self.header = self.rows = None
+        self._memory.close()
+        self._products_memory.close()
+        if self.owner:
+            self._memory.unlink()
+            self._products_memory.unlink()
+
+
+# table attached by this process, see attach_reader
+READER = None
+_UPDATER = None
+# name of table created by start_updater, inherited by forked children
+_NAME = None
+
+
+def _update_loop(name: str, interval: float, connection):
+    """
+    sends product list to parent, which creates the table, then writes it
+    """
+    from exchange.binance import Binance
+    try:
+        exchange = Binance()
+        connection.send(exchange.listed_products())
+    except Exception as e:
+        connection.send(e)
+        return
+    # table is created by parent meanwhile
+    connection.recv()
+    connection.close()
+    books = SharedOrderBooks.attach(name)
+    while True:
+        start = time.time()
+        try:
+            books.write(exchange.get_orderbooks())
+        except Exception as e:
+            logger.warning('shared orderbooks update failed: {}'.format(e))
+        time.sleep(max(0., interval - (time.time() - start)))
+
+
+def start_updater(name: str=SHARED_ORDERBOOKS_NAME,
+                  interval: float=SHARED_ORDERBOOKS_INTERVAL):
+    """
+    create table and start its updater, it's called once in the parent of
+    worker processes, before they are forked. updater is a process, which
+    builds exchange client and fetches product list of the table,
+    so parent doesn't have threads of client, when children are forked.
+    table name is suffixed with pid of parent, so tables of workers
+    running on the same host are separate
+    """
+    global _UPDATER, _NAME
+    if not is_available():
+        raise RuntimeError('shared orderbooks need python 3.8')
+    name = '{}_{}'.format(name, os.getpid())
+    connection, updater_connection = multiprocessing.Pipe()
+    updater = multiprocessing.get_context('fork').Process(
+        target=_update_loop, args=(name, interval, updater_connection),
+        daemon=True)
+    updater.start()
+    updater_connection.close()
+    try:
+        if not connection.poll(SHARED_ORDERBOOKS_START_TIMEOUT):
+            raise TimeoutError('product list of shared orderbooks')
+        products = connection.recv()
+        if isinstance(products, Exception):
+            raise products
+        books = SharedOrderBooks.create(name, products)
+    except BaseException:
+        updater.terminate()
+        raise
+    connection.send(True)
+    connection.close()
+    _NAME = name
+    _UPDATER = (books, updater)
+
+
+def stop_updater():
+    global _UPDATER, _NAME
+    if _UPDATER is None:
+        return
+    books, updater = _UPDATER
+    updater.terminate()
+    books.close()
+    _UPDATER = _NAME = None
+
+
+def attach_reader(name: str=None):
+    """
+    attach table created by parent, reader isn't attached, if it's missing
+    """
+    global READER
+    name = name or _NAME
+    if name is None or not is_available():
+        logger.warning('shared orderbooks are not available')
+        return
+    try:
+        READER = SharedOrderBooks.attach(name)
+    except FileNotFoundError:
+        logger.warning('shared orderbooks {} not found'.format(name))
@@ -0,0 +1,69 @@
+import threading
+from collections import defaultdict
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    coalesces concurrent identical requests, first caller of key fetches,
+    callers of the same key arriving meanwhile wait for its result or error.
+    nothing is cached, key is fetched again once its call is finished.
+    results are shared by callers, so they mustn't be modified
+
+    keys are tuples, which first item is endpoint name, metrics are
+    counted per endpoint
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._metrics = defaultdict(lambda: {'calls': 0, 'deduplicated': 0})
+
+    def do(self, key: tuple, fetch):
+        with self._lock:
+            metrics = self._metrics[key[0]]
+            metrics['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                metrics['deduplicated'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fetch()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def metrics(self):
+        """
+        :return: {endpoint: {'calls': n, 'deduplicated': m}}, deduplicated
+                 calls didn't make a request
+        """
+        with self._lock:
+            return {endpoint: dict(metrics)
+                    for endpoint, metrics in self._metrics.items()}
+
+    def reset_metrics(self):
+        with self._lock:
+            self._metrics.clear()
+
+
+# process-wide, so requests of all exchange instances are coalesced
+SINGLE_FLIGHT = SingleFlight()
@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import threading
+from decimal import Decimal
+from typing import List
+
+from internals.orderbook import OrderBook
+
+
+MARKET_SNAPSHOT_ENABLED = os.environ.get('MARKET_SNAPSHOT', '0') == '1'
+MARKET_SNAPSHOT_MAX_AGE = float(os.environ.get('MARKET_SNAPSHOT_MAX_AGE', 5))
+
+
+class MarketSnapshot:
+    """
+    top of book of exchanges shared by processes through redis
+
+    snapshots are written by marketdata daemon and read by exchanges
+    instead of fetching public books themselves. snapshot older than
+    `max_age` seconds isn't used, so exchanges fall back to direct fetches
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, client, max_age: float=MARKET_SNAPSHOT_MAX_AGE):
+        self.client = client
+        self.max_age = max_age
+
+    @classmethod
+    def shared(cls):
+        """
+        process-wide reader of snapshots in REDIS_URL
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                import redis
+                cls._shared = cls(
+                    redis.StrictRedis.from_url(os.environ['REDIS_URL']))
+            return cls._shared
+
+    @staticmethod
+    def _key(exchange_name):
+        return 'market_snapshot:{}'.format(exchange_name.lower())
+
+    def write(self, exchange_name: str, orderbooks: List[OrderBook],
+              timestamp: float=None):
+        if timestamp is None:
+            timestamp = time.time()
+        snapshot = {
+            'timestamp': timestamp,
+            'books': {orderbook.product: [str(orderbook.get_wall_bid()),
+                                          str(orderbook.get_wall_ask())]
+                      for orderbook in orderbooks}}
+        # snapshot, which isn't refreshed, expires by itself
+        self.client.set(self._key(exchange_name), json.dumps(snapshot),
+                        ex=max(1, int(self.max_age * 10)))
+
+    def get_orderbooks(self, exchange_name: str, products=None):
+        """
+        :param products: products in 'commodity_base' format, None for all
+        :return: list of orderbooks, or None if snapshot can't answer,
+                 because it's missing, stale or some products are missing
+        """
+        snapshot = self.client.get(self._key(exchange_name))
+        if snapshot is None:
+            return None
+        snapshot = json.loads(snapshot)
+        if time.time() - snapshot['timestamp'] >= self.max_age:
+            return None
+        books = snapshot['books']
+        if products is None:
+            products = books.keys()
+        elif any(product not in books for product in products):
+            return None
+        return [OrderBook(product, {'bid': Decimal(books[product][0]),
+                                    'ask': Decimal(books[product][1])})
+                for product in products]
@@ -0,0 +1,85 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    thread safe bounded mapping, least recently used entries are evicted
+    first, entries not accessed for `idle_timeout` seconds are dropped
+    """
+
+    def __init__(self, maxsize: int, idle_timeout: float=None,
+                 on_evict=None):
+        """
+        :param on_evict: called with (key, value) of dropped entries
+        """
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, timestamp, now):
+        return (self.idle_timeout is not None and
+                now - timestamp >= self.idle_timeout)
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, timestamp = self._entries[key]
+            if self._expired(timestamp, now):
+                del self._entries[key]
+                evicted = [(key, value)]
+                value = default
+            else:
+                self._entries[key] = (value, now)
+                self._entries.move_to_end(key)
+                return value
+        self._evicted(evicted)
+        return value
+
+    def set(self, key, value):
+        now = time.time()
+        evicted = []
+        with self._lock:
+            self._entries[key] = (value, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._entries.popitem(last=False))
+            evicted = [(k, v) for k, (v, _) in evicted]
+        self._evicted(evicted)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._entries.pop(key)[0]
+
+    def evict_idle(self):
+        """
+        drop entries, which weren't accessed for idle_timeout
+        """
+        now = time.time()
+        with self._lock:
+            keys = [key for key, (_, timestamp) in self._entries.items()
+                    if self._expired(timestamp, now)]
+            evicted = [(key, self._entries.pop(key)[0]) for key in keys]
+        self._evicted(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evicted(self, entries):
+        if self.on_evict is not None:
+            for key, value in entries:
+                self.on_evict(key, value)
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __len__(self):
+        return len(self._entries)
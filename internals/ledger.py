@@ -0,0 +1,79 @@
+import threading
+from decimal import Decimal
+from collections import defaultdict
+from typing import Dict
+from internals.order import Order
+from internals.enums import OrderAction
+
+
+class BalanceLedger:
+    """
+    local copy of account balances for the time of one rebalance
+
+    balances are updated from fill responses, so orders can be validated
+    without signed account requests. ledger is marked as drifted when
+    local state can't be trusted (failed orders, cancelled limit orders),
+    then balances have to be reset from exchange
+    """
+
+    def __init__(self, balances: Dict[str, Decimal]):
+        self._lock = threading.RLock()
+        self.reset(balances)
+
+    def reset(self, balances: Dict[str, Decimal]):
+        with self._lock:
+            self.balances = defaultdict(Decimal, balances)
+            self.drifted = False
+
+    def invalidate(self):
+        with self._lock:
+            self.drifted = True
+
+    def get_balances(self) -> Dict[str, Decimal]:
+        with self._lock:
+            return defaultdict(Decimal, self.balances)
+
+    def apply_fill(self, product: str, side: str,
+                   executed_quantity: Decimal, mean_price: Decimal,
+                   commissions: Dict[str, Decimal]):
+        commodity, base = product.split('_')
+        if not executed_quantity:
+            # unfilled order has no mean price
+            mean_price = Decimal()
+        value = executed_quantity * mean_price
+        with self._lock:
+            if side.upper() == OrderAction.BUY.name:
+                self.balances[commodity] += executed_quantity
+                self.balances[base] -= value
+            else:
+                self.balances[commodity] -= executed_quantity
+                self.balances[base] += value
+            for asset, fee in commissions.items():
+                self.balances[asset] -= fee
+
+    def apply_market_order_response(self, response):
+        """
+        :param response: parsed market order response, with keys
+            'product', 'side', 'executed_quantity', 'mean_price'
+            and 'commission_' + asset for every commission asset
+        """
+        try:
+            commissions = {k[len('commission_'):]: v
+                           for k, v in response.items()
+                           if k.startswith('commission_')}
+            self.apply_fill(response['product'], response['side'],
+                            response['executed_quantity'],
+                            response['mean_price'], commissions)
+        except (KeyError, TypeError):
+            self.invalidate()
+
+    def reserve(self, order: Order):
+        """
+        subtract resources locked by open limit order
+        """
+        commodity, base = order.product.split('_')
+        with self._lock:
+            if order._action == OrderAction.SELL:
+                self.balances[commodity] -= order._quantity
+            else:
+                self.balances[base] -= order._quantity * order._price
@@ -21,3 +21,17 @@ class Order:
                  action=self._action, quantity=self._quantity,
                  price=(self._price if self._price is not None else "None")))
         return s
+
+    def to_dict(self):
+        return {'product': self.product,
+                'type': self._type.name,
+                'action': self._action.name,
+                'quantity': str(self._quantity),
+                'price': (str(self._price) if self._price is not None
+                          else None)}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['product'], OrderType[d['type']],
+                   OrderAction[d['action']], Decimal(d['quantity']),
+                   Decimal(d['price']) if d['price'] is not None else None)
@@ -1,4 +1,6 @@
+import numpy as np
 from decimal import Decimal
+from internals.enums import OrderAction
 
 
 class OrderBook:
@@ -29,3 +31,82 @@ class OrderBook:
     def get_wall_ask(self) -> Decimal:
         assert self.wall_ask is not None
         return self.wall_ask
+
+
+class L2OrderBook(OrderBook):
+    """
+    order book with price levels
+
+    prices and quantities are kept in float64 arrays, bids in descending
+    and asks in ascending price order, so size dependent queries are
+    vectorized. wall prices stay Decimal, as in OrderBook
+    """
+
+    def __init__(self, product: str, bids, asks):
+        """
+        :param bids: list of levels, each level starts with price, quantity
+        :param asks: list of levels, each level starts with price, quantity
+        """
+        super().__init__(product, {'bid': Decimal(bids[0][0]),
+                                   'ask': Decimal(asks[0][0])})
+        self.bids = np.array([level[:2] for level in bids], dtype=np.float64)
+        self.asks = np.array([level[:2] for level in asks], dtype=np.float64)
+
+    def _levels(self, action: OrderAction) -> np.ndarray:
+        # buy order takes asks, sell order takes bids
+        return self.asks if action == OrderAction.BUY else self.bids
+
+    def cumulative_depth(self, action: OrderAction):
+        """
+        :return: prices, cumulative quantities and cumulative notionals,
+                 available for order with given action
+        """
+        levels = self._levels(action)
+        return (levels[:, 0], np.cumsum(levels[:, 1]),
+                np.cumsum(levels[:, 0] * levels[:, 1]))
+
+    def _fill(self, action: OrderAction, amount: float, notional: bool):
+        """
+        :return: quantity and notional of market order, which takes
+                 `amount` of quantity (or notional), None if book is too thin
+        """
+        prices, quantities, notionals = self.cumulative_depth(action)
+        cumulative = notionals if notional else quantities
+        i = int(np.searchsorted(cumulative, amount))
+        if i >= len(prices):
+            return None
+        filled = cumulative[i - 1] if i > 0 else 0.
+        rest = amount - filled
+        quantity = (quantities[i - 1] if i > 0 else 0.) + (
+            rest / prices[i] if notional else rest)
+        value = (notionals[i - 1] if i > 0 else 0.) + (
+            rest if notional else rest * prices[i])
+        return quantity, value
+
+    def vwap(self, action: OrderAction, quantity) -> float:
+        """
+        mean execution price of market order of given quantity
+        """
+        if quantity <= 0:
+            return float(self._levels(action)[0, 0])
+        fill = self._fill(action, float(quantity), notional=False)
+        if fill is None:
+            return None
+        return fill[1] / fill[0]
+
+    def slippage(self, action: OrderAction, notional) -> float:
+        """
+        relative difference between mean execution price of market order
+        of given notional (in base currency) and mid market price
+        """
+        mid_price = float(self.get_mid_market_price())
+        if notional <= 0:
+            price = float(self._levels(action)[0, 0])
+        else:
+            fill = self._fill(action, float(notional), notional=True)
+            if fill is None:
+                return None
+            price = fill[1] / fill[0]
+        if action == OrderAction.BUY:
+            return price / mid_price - 1
+        return 1 - price / mid_price
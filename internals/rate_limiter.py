@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+
+from logger import logger
+
+
+class TokenBucket:
+    """
+    thread-safe token bucket
+    `rate` tokens are added every second, up to `capacity` tokens.
+    callers reserve tokens in order of arrival, so waiting callers
+    don't starve each other and the budget is used without idle gaps
+    """
+
+    def __init__(self, rate: float, capacity: float=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.timestamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float=1) -> float:
+        """
+        blocks until `tokens` are available
+        :return: time in seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens +
+                              (now - self.timestamp) * self.rate)
+            self.timestamp = now
+            self.tokens -= tokens
+            wait = max(0., -self.tokens / self.rate)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# reserves ARGV[1] weight in window KEYS[1], unless KEYS[2] blocks calls,
+# returns 0 if reserved, -1 if window is full, else ms of block left
+_ACQUIRE_SCRIPT = """
+local blocked = redis.call('pttl', KEYS[2])
+if blocked > 0 then
+    return blocked
+end
+local used = tonumber(redis.call('get', KEYS[1]) or '0')
+if used > 0 and used + tonumber(ARGV[1]) > tonumber(ARGV[2]) then
+    return -1
+end
+redis.call('incrby', KEYS[1], ARGV[1])
+redis.call('pexpire', KEYS[1], ARGV[3])
+return 0
+"""
+
+# raises used weight of window KEYS[1] to ARGV[1], as reported by server
+_SYNC_SCRIPT = """
+local used = tonumber(redis.call('get', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > used then
+    redis.call('set', KEYS[1], ARGV[1], 'PX', ARGV[2])
+end
+return 0
+"""
+
+
+class WeightGovernor:
+    """
+    request weight budget shared by processes through redis
+
+    exchanges limit used weight per ip in fixed windows of `window`
+    seconds, callers reserve weight of endpoint before request and wait
+    for next window, when budget is used. used weight reported by server
+    is synced, so calls not seen by governor are counted too.
+    if redis fails, requests aren't held back
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, client, name: str, limit: int, window: float=60):
+        self.client = client
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+        self._sync = client.register_script(_SYNC_SCRIPT)
+
+    @classmethod
+    def shared(cls, name: str, limit: int, window: float=60):
+        """
+        process-wide governor in REDIS_URL
+        """
+        with cls._shared_lock:
+            if name not in cls._shared:
+                import redis
+                cls._shared[name] = cls(
+                    redis.StrictRedis.from_url(os.environ['REDIS_URL']),
+                    name, limit, window)
+            return cls._shared[name]
+
+    def _window_key(self, now):
+        return 'weight:{}:{}'.format(self.name, int(now // self.window))
+
+    def _blocked_key(self):
+        return 'weight:{}:blocked'.format(self.name)
+
+    def acquire(self, weight: int=1) -> float:
+        """
+        blocks until `weight` is reserved
+        :return: time in seconds spent waiting
+        """
+        waited = 0.
+        while True:
+            now = time.time()
+            try:
+                result = self._acquire(
+                    keys=[self._window_key(now), self._blocked_key()],
+                    args=[weight, self.limit, int(self.window * 1000)])
+            except Exception as e:
+                logger.warning('weight governor {} failed: {}'.format(
+                    self.name, e))
+                return waited
+            if result == 0:
+                return waited
+            if result < 0:
+                wait = (int(now // self.window) + 1) * self.window - now
+            else:
+                wait = result / 1000
+            time.sleep(wait)
+            waited += wait
+
+    def sync(self, used: int):
+        """
+        :param used: weight used in current window, reported by server
+        """
+        try:
+            self._sync(keys=[self._window_key(time.time())],
+                       args=[used, int(self.window * 1000)])
+        except Exception as e:
+            logger.warning('weight governor {} failed: {}'.format(
+                self.name, e))
+
+    def block(self, seconds: float):
+        """
+        hold back all requests, for example after 429 response
+        """
+        try:
+            self.client.set(self._blocked_key(), 1,
+                            px=max(1, int(seconds * 1000)))
+        except Exception as e:
+            logger.warning('weight governor {} failed: {}'.format(
+                self.name, e))
@@ -0,0 +1,54 @@
+import threading
+from typing import Dict
+
+
+class SymbolIndex:
+    """
+    two way mapping between exchange symbols and products
+    in 'commodity_base' format
+    """
+
+    def __init__(self, pairs):
+        """
+        :param pairs: iterable of (symbol, commodity, base)
+        """
+        self.symbol_to_product = {}
+        self.product_to_symbol = {}
+        for symbol, commodity, base in pairs:
+            product = '_'.join([commodity, base])
+            self.symbol_to_product[symbol] = product
+            self.product_to_symbol[product] = symbol
+
+    @classmethod
+    def from_filters(cls, filters: Dict[str, dict]):
+        return cls((symbol, filt['commodity'], filt['base'])
+                   for symbol, filt in filters.items())
+
+    def to_product(self, symbol: str) -> str:
+        return self.symbol_to_product.get(symbol)
+
+    def to_symbol(self, product: str) -> str:
+        return self.product_to_symbol.get(product)
+
+    def products(self):
+        return self.product_to_symbol.keys()
+
+    def __len__(self):
+        return len(self.symbol_to_product)
+
+
+_last_index = (None, None)
+_last_index_lock = threading.Lock()
+
+
+def get_symbol_index(filters: Dict[str, dict]) -> SymbolIndex:
+    """
+    index of filters, rebuilt only when filters object changes
+    """
+    global _last_index
+    with _last_index_lock:
+        last_filters, index = _last_index
+        if last_filters is not filters:
+            index = SymbolIndex.from_filters(filters)
+            _last_index = (filters, index)
+        return index
@@ -0,0 +1,50 @@
+"""
+market data daemon, keeps top of book of exchanges in redis,
+so web and worker processes don't download public books themselves,
+see exchange.snapshot
+"""
+import os
+import time
+import redis
+
+from logger import logger
+from exchange import get_exchange_by_name
+from exchange.snapshot import MarketSnapshot
+
+
+MARKET_SNAPSHOT_EXCHANGES = os.environ.get(
+    'MARKET_SNAPSHOT_EXCHANGES', 'binance').split(',')
+MARKET_SNAPSHOT_INTERVAL = float(
+    os.environ.get('MARKET_SNAPSHOT_INTERVAL', 1))
+
+
+def refresh(snapshot: MarketSnapshot, name: str, exchange):
+    # all listed products, so snapshot answers any request
+    orderbooks = exchange.get_orderbooks(sorted(exchange.listed_products()))
+    snapshot.write(name, orderbooks)
+    return orderbooks
+
+
+def run(snapshot: MarketSnapshot, names=MARKET_SNAPSHOT_EXCHANGES,
+        interval: float=MARKET_SNAPSHOT_INTERVAL):
+    exchanges = {}
+    while True:
+        start = time.time()
+        for name in names:
+            try:
+                if name not in exchanges:
+                    exchange = get_exchange_by_name(name)()
+                    # daemon is the source of snapshots
+                    exchange.snapshot = None
+                    exchanges[name] = exchange
+                orderbooks = refresh(snapshot, name, exchanges[name])
+                logger.debug('market snapshot of {}: {} books'.format(
+                    name, len(orderbooks)))
+            except Exception as e:
+                logger.warning('market snapshot of {} failed: {}'.format(
+                    name, e))
+        time.sleep(max(0., interval - (time.time() - start)))
+
+
+if __name__ == '__main__':
+    run(MarketSnapshot(redis.StrictRedis.from_url(os.environ['REDIS_URL'])))
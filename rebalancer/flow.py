@@ -0,0 +1,244 @@
+import os
+import numpy as np
+from typing import Dict, List, Tuple
+from networkx import digraph
+from networkx import flow
+from networkx.exception import NetworkXUnfeasible, NetworkXUnbounded
+
+
+# (node from, node to, capacity, weight), capacity might be float('inf')
+Edge = Tuple[str, str, float, int]
+
+
+class FlowUnfeasible(Exception):
+    pass
+
+
+class MinCostFlowSolver:
+    """
+    finds min cost flow in network given by node demands and edges,
+    negative demand is supply, as in networkx
+    :return: dict of dicts, flow[u][v] is flow through edge (u, v),
+             all edges are present, in order of nodes and edges
+    """
+
+    def min_cost_flow(self, demands: Dict[str, int],
+                      edges: List[Edge]) -> Dict[str, Dict[str, int]]:
+        raise NotImplementedError
+
+
+class NetworkxSolver(MinCostFlowSolver):
+    """
+    reference solver, networkx network simplex
+    """
+
+    def min_cost_flow(self, demands, edges):
+        try:
+            return flow.min_cost_flow(to_digraph(demands, edges))
+        except (NetworkXUnfeasible, NetworkXUnbounded) as error:
+            raise FlowUnfeasible(str(error))
+
+
+class NetworkSimplexSolver(MinCostFlowSolver):
+    """
+    primal network simplex on arrays, weights and capacities are integers
+
+    follows networkx implementation (artificial root, strongly feasible
+    spanning tree, same leaving edge rule), but reduced costs of all edges
+    are computed at once with numpy and entering edge is the one with
+    the lowest reduced cost, so rebalance networks of a few dozens of
+    currencies need much fewer python operations
+    """
+
+    def min_cost_flow(self, demands, edges):
+        demands = dict(demands)
+        nodes = list(demands)
+        for u, v, _, _ in edges:
+            for node in (u, v):
+                if node not in demands:
+                    demands[node] = 0
+                    nodes.append(node)
+        index = {node: i for i, node in enumerate(nodes)}
+        n = len(nodes)
+        root = n
+        # edges used by simplex, self loops and edges without capacity
+        # never carry flow
+        used = [i for i, (u, v, capacity, _) in enumerate(edges)
+                if u != v and capacity != 0]
+        sources = [index[edges[i][0]] for i in used]
+        targets = [index[edges[i][1]] for i in used]
+        weights = [int(edges[i][3]) for i in used]
+        capacities = [edges[i][2] for i in used]
+        node_demands = [int(demands[node]) for node in nodes]
+        faux_inf = 3 * max(
+            sum(c for c in capacities if c != float('inf')),
+            sum(abs(w) for w in weights),
+            sum(abs(d) for d in node_demands)) or 1
+        capacities = [faux_inf if c == float('inf') else int(c)
+                      for c in capacities]
+        m = len(used)
+        # artificial edges between root and each node form initial tree
+        for i, demand in enumerate(node_demands):
+            if demand > 0:
+                sources.append(root)
+                targets.append(i)
+            else:
+                sources.append(i)
+                targets.append(root)
+        weights += [faux_inf] * n
+        capacities += [faux_inf] * n
+        flows = [0] * m + [abs(demand) for demand in node_demands]
+
+        tree = [set() for _ in range(n + 1)]
+        for i in range(m, m + n):
+            tree[sources[i]].add(i)
+            tree[targets[i]].add(i)
+
+        source_array = np.array(sources)
+        target_array = np.array(targets)
+        weight_array = np.array(weights, dtype=np.int64)
+        flow_array = np.array(flows, dtype=np.int64)
+
+        parent = [None] * (n + 1)
+        parent_edge = [None] * (n + 1)
+        depth = [0] * (n + 1)
+        potentials = [0] * (n + 1)
+        self._hang(root, tree, sources, targets, weights,
+                   parent, parent_edge, depth, potentials)
+        while True:
+            potential_array = np.array(potentials, dtype=np.int64)
+            reduced = (weight_array - potential_array[source_array] +
+                       potential_array[target_array])
+            reduced = np.where(flow_array == 0, reduced, -reduced)
+            i = int(np.argmin(reduced))
+            if reduced[i] >= 0:
+                break
+            if flows[i] == 0:
+                p, q = sources[i], targets[i]
+            else:
+                p, q = targets[i], sources[i]
+            # cycle through entering edge, oriented from p to q
+            a, b = p, q
+            while depth[a] > depth[b]:
+                a = parent[a]
+            while depth[b] > depth[a]:
+                b = parent[b]
+            while a != b:
+                a, b = parent[a], parent[b]
+            cycle_nodes, cycle_edges = self._path(p, a, parent, parent_edge)
+            cycle_nodes.reverse()
+            cycle_edges.reverse()
+            if cycle_edges != [i]:
+                cycle_edges.append(i)
+            nodes_q, edges_q = self._path(q, a, parent, parent_edge)
+            cycle_nodes += nodes_q[:-1]
+            cycle_edges += edges_q
+
+            # last blocking edge keeps tree strongly feasible
+            def residual(edge, node):
+                if sources[edge] == node:
+                    return capacities[edge] - flows[edge]
+                return flows[edge]
+            j, s = min(zip(reversed(cycle_edges), reversed(cycle_nodes)),
+                       key=lambda edge_node: residual(*edge_node))
+            amount = residual(j, s)
+            if amount:
+                for edge, node in zip(cycle_edges, cycle_nodes):
+                    if sources[edge] == node:
+                        flows[edge] += amount
+                    else:
+                        flows[edge] -= amount
+                    flow_array[edge] = flows[edge]
+            if i != j:
+                # subtree under leaving edge is hung on entering edge
+                child = (targets[j] if parent[targets[j]] == sources[j]
+                         else sources[j])
+                node = p
+                while node != child and node != root:
+                    node = parent[node]
+                inner = p if node == child else q
+                tree[sources[j]].discard(j)
+                tree[targets[j]].discard(j)
+                tree[sources[i]].add(i)
+                tree[targets[i]].add(i)
+                parent_edge[inner] = i
+                self._hang(inner, tree, sources, targets, weights,
+                           parent, parent_edge, depth, potentials)
+
+        if any(flows[m:]):
+            raise FlowUnfeasible('no flow satisfies all node demands')
+        if any(flow * 2 >= faux_inf for flow in flows[:m]):
+            raise FlowUnfeasible('negative cycle with infinite capacity found')
+
+        flow_dict = {node: {} for node in nodes}
+        used_flows = dict(zip(used, flows))
+        for i, (u, v, _, _) in enumerate(edges):
+            flow_dict[u][v] = used_flows.get(i, 0)
+        return flow_dict
+
+    @staticmethod
+    def _hang(top, tree, sources, targets, weights,
+              parent, parent_edge, depth, potentials):
+        """
+        set parents, depths and potentials of subtree of `top`,
+        which is connected to its parent by parent_edge[top]
+        """
+        edge = parent_edge[top]
+        if edge is not None:
+            if targets[edge] == top:
+                parent[top] = sources[edge]
+                potentials[top] = potentials[parent[top]] - weights[edge]
+            else:
+                parent[top] = targets[edge]
+                potentials[top] = potentials[parent[top]] + weights[edge]
+            depth[top] = depth[parent[top]] + 1
+        queue = [top]
+        for node in queue:
+            for edge in tree[node]:
+                if edge == parent_edge[node]:
+                    continue
+                if sources[edge] == node:
+                    child = targets[edge]
+                    potentials[child] = potentials[node] - weights[edge]
+                else:
+                    child = sources[edge]
+                    potentials[child] = potentials[node] + weights[edge]
+                parent[child] = node
+                parent_edge[child] = edge
+                depth[child] = depth[node] + 1
+                queue.append(child)
+
+    @staticmethod
+    def _path(node, ancestor, parent, parent_edge):
+        nodes, edges = [node], []
+        while node != ancestor:
+            edges.append(parent_edge[node])
+            node = parent[node]
+            nodes.append(node)
+        return nodes, edges
+
+
+def to_digraph(demands: Dict[str, int],
+               edges: List[Edge]) -> digraph.DiGraph:
+    graph = digraph.DiGraph()
+    for node, demand in demands.items():
+        graph.add_node(node, demand=demand)
+    for u, v, capacity, weight in edges:
+        graph.add_edge(u, v, capacity=capacity, weight=weight)
+    return graph
+
+
+SOLVERS = {
+    'networkx': NetworkxSolver,
+    'simplex': NetworkSimplexSolver
+}
+
+
+def get_solver(name: str=None) -> MinCostFlowSolver:
+    """
+    :param name: one of SOLVERS, by default REBALANCE_FLOW_SOLVER
+                 environment variable or 'simplex'
+    """
+    if name is None:
+        name = os.environ.get('REBALANCE_FLOW_SOLVER', 'simplex')
+    return SOLVERS[name]()
@@ -1,6 +1,7 @@
 from decimal import Decimal
 from typing import Dict, List
 import time
+from collections import defaultdict
 from internals.order import Order
 from internals.enums import OrderType, OrderAction
 from exchange.exchange import Exchange
@@ -28,12 +29,13 @@ def place_limit_or_market_order(exchange, order, threshold,
     return exchange.place_limit_order(order)
 
 
-def limit_order_rebalance(exchange: Exchange,
-                          weights: Dict[str, Decimal],
-                          user, update_function, *,
-                          max_retries: int = 10,
-                          time_delta: int = 30,
-                          base: str='USDT'):
+def prepare_limit_order_rebalance(exchange: Exchange,
+                                  weights: Dict[str, Decimal],
+                                  base: str='USDT'):
+    """
+    :return: (resources, products, orders) of rebalance, or list of
+             unknown currencies or exception as pre_rebalance
+    """
     pre_rebalance_results = pre_rebalance(exchange, weights, base)
     if isinstance(pre_rebalance_results, list):
         return pre_rebalance_results
@@ -62,10 +64,30 @@ def limit_order_rebalance(exchange: Exchange,
                           price_estimates, base,
                           OrderType.LIMIT, Decimal())
               for order in orders]
+    return resources, products, orders
+
+
+def limit_order_rebalance(exchange: Exchange,
+                          weights: Dict[str, Decimal],
+                          user, update_function, *,
+                          max_retries: int = 10,
+                          time_delta: int = 30,
+                          base: str='USDT',
+                          poll_interval: float = 1.):
+    """
+    :param time_delta: time for limit order to be filled, in seconds
+    :param poll_interval: initial interval of order status polling,
+                          None to wait `time_delta` for all placed orders
+    """
+    prepared = prepare_limit_order_rebalance(exchange, weights, base)
+    if not isinstance(prepared, tuple):
+        return prepared
+    resources, products, orders = prepared
     return limit_order_rebalance_with_orders(update_function, exchange,
                                              resources, products,
                                              orders, max_retries,
-                                             time_delta, base)
+                                             time_delta, base,
+                                             poll_interval=poll_interval)
 
 
 def limit_order_rebalance_with_orders(update_function,
@@ -75,7 +97,29 @@ def limit_order_rebalance_with_orders(update_function,
                                       orders: List[Order],
                                       max_retries: int,
                                       time_delta: int,
-                                      base: str):
+                                      base: str,
+                                      poll_interval: float = None):
+    exchange.open_ledger(resources)
+    try:
+        if poll_interval is not None:
+            return _limit_order_rebalance_polling(
+                update_function, exchange, resources, products, orders,
+                max_retries, time_delta, base, poll_interval)
+        return _limit_order_rebalance_with_orders(
+            update_function, exchange, resources, products, orders,
+            max_retries, time_delta, base)
+    finally:
+        exchange.close_ledger()
+
+
+def _limit_order_rebalance_with_orders(update_function,
+                                       exchange: Exchange,
+                                       resources: Dict[str, Decimal],
+                                       products: List[str],
+                                       orders: List[Order],
+                                       max_retries: int,
+                                       time_delta: int,
+                                       base: str):
     number_of_trials = {order.product: 0 for order in orders}
     rets = []
     while len(orders) and (all(
@@ -145,3 +189,235 @@ def limit_order_rebalance_with_orders(update_function,
                 orders.remove(order)
 
     return rets
+
+
+MAX_POLL_INTERVAL = 5.
+
+
+def is_filled(order_response) -> bool:
+    return (Decimal(order_response['orig_quantity']) -
+            Decimal(order_response['executed_quantity'])) <= Decimal('1e-3')
+
+
+class LimitOrderRebalanceState:
+    """
+    resumable state of limit order rebalance, which is advanced by
+    limit_order_rebalance_step and can be persisted between steps
+    with to_dict / from_dict
+    """
+
+    def __init__(self, resources: Dict[str, Decimal], products: List[str],
+                 orders: List[Order], max_retries: int, time_delta: float,
+                 poll_interval: float = 1.):
+        self.resources = resources
+        self.products = list(products)
+        self.orders = orders
+        self.max_retries = max_retries
+        self.time_delta = time_delta
+        self.poll_interval = poll_interval
+        # current polling interval, it grows while nothing happens
+        self.interval = poll_interval
+        self.number_of_trials = {order.product: 0 for order in orders}
+        # placed orders: {'order', 'response', 'deadline'}
+        self.open_orders = []
+        self.rets = []
+
+    def finished(self) -> bool:
+        return not self.orders or any(
+            self.number_of_trials[order.product] > self.max_retries
+            for order in self.orders)
+
+    def to_dict(self):
+        return {
+            'resources': {currency: str(amount)
+                          for currency, amount in self.resources.items()},
+            'products': self.products,
+            'orders': [order.to_dict() for order in self.orders],
+            'max_retries': self.max_retries,
+            'time_delta': self.time_delta,
+            'poll_interval': self.poll_interval,
+            'interval': self.interval,
+            'number_of_trials': self.number_of_trials,
+            # orders are referenced by their index in orders
+            'open_orders': [{'order': self.orders.index(open_order['order']),
+                             'response': open_order['response'],
+                             'deadline': open_order['deadline']}
+                            for open_order in self.open_orders],
+            'rets': self.rets
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        orders = [Order.from_dict(order) for order in d['orders']]
+        state = cls({currency: Decimal(amount)
+                     for currency, amount in d['resources'].items()},
+                    d['products'], orders, d['max_retries'],
+                    d['time_delta'], d['poll_interval'])
+        state.interval = d['interval']
+        state.number_of_trials = dict(d['number_of_trials'])
+        state.open_orders = [{'order': orders[open_order['order']],
+                              'response': open_order['response'],
+                              'deadline': open_order['deadline']}
+                             for open_order in d['open_orders']]
+        state.rets = list(d['rets'])
+        return state
+
+
+def _place_limit_orders(exchange: Exchange, state: LimitOrderRebalanceState):
+    """
+    place orders, which aren't open yet and can be made with resources,
+    which are available or won't be produced by other orders
+    :return: True if any order was placed
+    """
+    currencies_from = set()
+    currencies_to = set()
+    for order in state.orders:
+        currency_commodity, currency_base = order.product.split('_')
+        if order._action == OrderAction.SELL:
+            currencies_from.add(currency_commodity)
+            currencies_to.add(currency_base)
+        else:
+            currencies_to.add(currency_commodity)
+            currencies_from.add(currency_base)
+
+    currencies_free = currencies_from - currencies_to
+
+    def produced_by_others(currency, order):
+        for other in state.orders:
+            if other is order:
+                continue
+            commodity, base = other.product.split('_')
+            if currency == (base if other._action == OrderAction.SELL
+                            else commodity):
+                return True
+        return False
+
+    open_orders = [open_order['order'] for open_order in state.open_orders]
+    pending = [order for order in state.orders
+               if all(order is not open_order for open_order in open_orders)]
+    if not pending:
+        return False
+    orderbooks = exchange.get_orderbooks(state.products)
+    orderbooks = {ob.product: ob for ob in orderbooks}
+    # intermediate currencies of chained orders might not be owned yet
+    resources = defaultdict(Decimal, state.resources)
+    placed = False
+    orders_to_remove = []
+    for order in pending:
+        currency_commodity, currency_base = order.product.split('_')
+        orderbook = orderbooks[order.product]
+        order._price = orderbook.get_mid_market_price()
+        if order._action == OrderAction.SELL:
+            if (currency_commodity not in currencies_free and
+                    resources[currency_commodity] < order._quantity):
+                continue
+        else:
+            if (currency_base not in currencies_free and
+                    resources[currency_base] <
+                    order._quantity * order._price):
+                continue
+        order_response = exchange.place_limit_order(order)
+        if order_response is None:
+            source = (currency_commodity if order._action == OrderAction.SELL
+                      else currency_base)
+            if produced_by_others(source, order):
+                # resources might still arrive from other orders
+                state.number_of_trials[order.product] += 1
+            else:
+                orders_to_remove.append(order)
+        elif not isinstance(order_response, Exception):
+            state.open_orders.append({
+                'order': order, 'response': order_response,
+                'deadline': time.time() + state.time_delta})
+            placed = True
+        else:
+            state.number_of_trials[order.product] += 1
+    for order in orders_to_remove:
+        state.number_of_trials[order.product] = state.max_retries
+        state.orders.remove(order)
+    return placed
+
+
+def limit_order_rebalance_step(exchange: Exchange,
+                               state: LimitOrderRebalanceState,
+                               update_function=None):
+    """
+    one non blocking cycle of limit order rebalance: open orders, which
+    are filled or whose `time_delta` has passed, are handled and orders,
+    which can be placed now, are placed
+    :return: seconds to wait before next step, None if rebalance is finished
+    """
+    now = time.time()
+    finished = []
+    for open_order in state.open_orders:
+        resp = exchange.get_order(open_order['response'])
+        if is_filled(resp):
+            finished.append((open_order, resp))
+        elif now >= open_order['deadline']:
+            exchange.cancel_limit_order(open_order['response'])
+            finished.append((open_order,
+                             exchange.get_order(open_order['response'])))
+
+    if finished and exchange.ledger is not None:
+        # filled orders aren't canceled, so their fills (and fees, which
+        # aren't known from order status) are taken from exchange
+        exchange.ledger.invalidate()
+    for open_order, resp in finished:
+        state.open_orders.remove(open_order)
+        state.rets.append(resp)
+        order = open_order['order']
+        if not is_filled(resp):
+            order._quantity = Decimal(
+                resp['orig_quantity']) - Decimal(resp['executed_quantity'])
+            state.number_of_trials[order.product] += 1
+        else:
+            state.number_of_trials[order.product] = state.max_retries
+            state.orders.remove(order)
+
+    if state.finished():
+        for open_order in state.open_orders:
+            exchange.cancel_limit_order(open_order['response'])
+            state.rets.append(exchange.get_order(open_order['response']))
+        state.open_orders = []
+        return None
+
+    placed = _place_limit_orders(exchange, state)
+    if not state.open_orders:
+        # nothing could be placed, wait before retrying
+        return state.poll_interval
+
+    if finished or placed:
+        state.interval = state.poll_interval
+        if update_function is not None:
+            update_function(limit_order_rebalance_retry_after_time_estimate(
+                state.number_of_trials, state.max_retries,
+                state.time_delta))
+    next_deadline = min(open_order['deadline']
+                        for open_order in state.open_orders)
+    delay = max(0, min(state.interval, next_deadline - time.time()))
+    state.interval = min(state.interval * 2, MAX_POLL_INTERVAL)
+    return delay
+
+
+def _limit_order_rebalance_polling(update_function,
+                                   exchange: Exchange,
+                                   resources: Dict[str, Decimal],
+                                   products: List[str],
+                                   orders: List[Order],
+                                   max_retries: int,
+                                   time_delta: int,
+                                   base: str,
+                                   poll_interval: float):
+    """
+    same as _limit_order_rebalance_with_orders, but status of placed orders
+    is polled, with growing interval, and each order is handled as soon as
+    it is filled or its `time_delta` has passed, so orders depending on it
+    are placed without waiting for other orders
+    """
+    state = LimitOrderRebalanceState(resources, products, orders,
+                                     max_retries, time_delta, poll_interval)
+    while True:
+        delay = limit_order_rebalance_step(exchange, state, update_function)
+        if delay is None:
+            return state.rets
+        time.sleep(delay)
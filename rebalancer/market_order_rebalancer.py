@@ -1,30 +1,49 @@
 from decimal import Decimal
 from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
 from rebalancer.utils import rebalance_orders, topological_sort, \
-    get_total_fee, parse_order, pre_rebalance
+    get_total_fee, parse_order, pre_rebalance, dependency_waves
 from exchange.exchange import Exchange
-from webserver.models import Statistics
+from internals.order import Order
+from internals.orderbook import OrderBook
+from django.db import transaction
+from webserver.models import Statistics, StatisticsSummary
+
+
+MARKET_ORDER_WORKERS = 4
 
 
 def market_order_rebalance_and_save(exchange: Exchange,
                                     weights: Dict[str, Decimal],
                                     user, update_function, *,
-                                    base: str='USDT'):
+                                    base: str='USDT',
+                                    depth: int=1,
+                                    run_id: str=None):
+    """
+    :param run_id: id of rebalance, which is saved with statistics
+    """
     rets = market_order_rebalance(exchange, weights, update_function,
-                                  base=base)
+                                  base=base, depth=depth)
     if isinstance(rets, Exception):
         return rets
     if isinstance(rets, list) and rets and isinstance(rets[0], str):
         return rets
-    summaries = create_order_statistics_objects(rets, user)
-    Statistics.objects.bulk_create(summaries)
+    summaries = create_order_statistics_objects(rets, user, run_id)
+    with transaction.atomic():
+        Statistics.objects.bulk_create(summaries)
+        StatisticsSummary.add(summaries)
 
 
 def market_order_rebalance(exchange: Exchange,
                            weights: Dict[str, Decimal],
                            update_function,
-                           base: str='USDT'):
-    pre_rebalance_results = pre_rebalance(exchange, weights, base)
+                           base: str='USDT',
+                           depth: int=1):
+    """
+    :param depth: orderbook depth, with depth > 1 spread fees
+                  account for estimated order sizes
+    """
+    pre_rebalance_results = pre_rebalance(exchange, weights, base, depth)
 
     if isinstance(pre_rebalance_results, list):
         return pre_rebalance_results
@@ -48,37 +67,71 @@ def market_order_rebalance(exchange: Exchange,
 
     orders = [(*order[:2], order[2] * portfolio_value) for order in orders]
     orders = topological_sort(orders)
-    orders = [parse_order(order, products,
+    waves = [[parse_order(order, products,
                           price_estimates,
                           base)
-              for order in orders]
-    length = len(orders)
+              for order in wave]
+             for wave in dependency_waves(orders)]
+    exchange.open_ledger(resources)
+    try:
+        return place_market_orders(exchange, waves, price_estimates,
+                                   orderbooks, update_function)
+    finally:
+        exchange.close_ledger()
+
+
+def place_market_order(exchange: Exchange, order: Order,
+                       price_estimates: Dict[str, Decimal],
+                       orderbooks: Dict[str, OrderBook]):
+    for i in range(10):
+        ret_order = exchange.place_market_order(order, price_estimates)
+        if not isinstance(ret_order, Exception):
+            break
+    if ret_order is None or isinstance(ret_order, Exception):
+        return ret_order
+    ret_order['mid_market_price'] = orderbooks[
+        order.product].get_mid_market_price()
+    return ret_order
+
+
+def place_market_orders(exchange: Exchange, waves: List[List[Order]],
+                        price_estimates: Dict[str, Decimal],
+                        orderbooks: Dict[str, OrderBook],
+                        update_function,
+                        max_workers: int=MARKET_ORDER_WORKERS):
+    """
+    orders of a wave are placed concurrently,
+    next wave starts, when all orders of previous wave are done
+    :param waves: see rebalancer.utils.dependency_waves
+    """
+    length = len(waves)
     update_function(length * 10000)
     ret_orders = []
-    for order in orders:
-        for i in range(10):
-            ret_order = exchange.place_market_order(order, price_estimates)
-            if not isinstance(ret_order, Exception):
-                ret_orders.append(ret_order)
-                break
-        length -= 1
-        update_function(length * 10000)
-        if ret_order is None or isinstance(ret_order, Exception):
-            continue
-        ret_order['mid_market_price'] = orderbooks[
-            order.product].get_mid_market_price()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for wave in waves:
+            responses = executor.map(
+                lambda order: place_market_order(
+                    exchange, order, price_estimates, orderbooks),
+                wave)
+            ret_orders += [response for response in responses
+                           if not isinstance(response, Exception)]
+            length -= 1
+            update_function(length * 10000)
 
     return ret_orders
 
 
-def create_order_statistics_objects(order_responses, user) -> List[Statistics]:
+def create_order_statistics_objects(order_responses, user,
+                                    run_id: str=None) -> List[Statistics]:
     """
     :param order_responses: responses from market
+    :param run_id: id of rebalance
     :return: Statistics objects
     """
     statistics = []
     for order_response in order_responses:
-        if order_response is None:
+        if order_response is None or order_response['mean_price'] is None:
+            # nothing was executed
             continue
         _, base = order_response['product'].split('_')
         price_estimates = order_response['price_estimates']
@@ -95,6 +148,7 @@ def create_order_statistics_objects(order_responses, user) -> List[Statistics]:
                          order_response['executed_quantity'] + fee),
             pair=order_response['product'],
             fee=float(fee),
-            action=order_response['side'].lower())
+            action=order_response['side'].lower(),
+            run_id=run_id)
         statistics.append(statistic)
     return statistics
@@ -0,0 +1,137 @@
+import numpy as np
+from collections.abc import Mapping
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, List, Tuple
+from internals.orderbook import OrderBook
+
+
+@lru_cache(maxsize=16)
+def get_currency_index(products: Tuple[str, ...]):
+    """
+    currencies of products and conversion edges between them,
+    edge k < len(products) goes from base to commodity of product k,
+    edge len(products) + k goes back
+    :return: currencies, currency to index dict, sources, targets
+    """
+    currencies = []
+    index = {}
+    commodities = []
+    bases = []
+    for product in products:
+        commodity, base = product.split('_')
+        for currency in (commodity, base):
+            if currency not in index:
+                index[currency] = len(currencies)
+                currencies.append(currency)
+        commodities.append(index[commodity])
+        bases.append(index[base])
+    sources = np.array(bases + commodities, dtype=np.int64)
+    targets = np.array(commodities + bases, dtype=np.int64)
+    return currencies, index, sources, targets
+
+
+class PriceGraph:
+    """
+    log10 mid prices of products over currency index
+
+    price of a currency in base is found over hop-minimal conversion paths,
+    if a currency can be reached from several currencies of previous
+    layer, the lowest estimate is used. whole layer is computed
+    with one vectorized pass over edges
+    """
+
+    def __init__(self, orderbooks: List[OrderBook]):
+        self.orderbooks = orderbooks
+        self.products = tuple(orderbook.product for orderbook in orderbooks)
+        (self.currencies, self.index,
+         self.sources, self.targets) = get_currency_index(self.products)
+        with np.errstate(divide='ignore'):
+            log_prices = np.log10([
+                (float(orderbook.get_wall_ask()) +
+                 float(orderbook.get_wall_bid())) / 2
+                for orderbook in orderbooks])
+        self.deltas = np.concatenate([log_prices, -log_prices])
+
+    def estimates(self, base: str) -> 'PriceEstimates':
+        n = len(self.currencies)
+        values = np.full(n, np.nan)
+        parent_edges = np.full(n, -1, dtype=np.int64)
+        if base not in self.index:
+            return PriceEstimates(self, base, values, parent_edges)
+        layers = np.full(n, -1, dtype=np.int64)
+        values[self.index[base]] = 0.
+        layers[self.index[base]] = 0
+        layer = 0
+        while True:
+            edges = np.nonzero((layers[self.sources] == layer) &
+                               (layers[self.targets] == -1))[0]
+            if not len(edges):
+                break
+            candidates = values[self.sources[edges]] + self.deltas[edges]
+            targets = self.targets[edges]
+            # lowest candidate of each target comes first
+            order = np.lexsort((candidates, targets))
+            targets = targets[order]
+            first = np.ones(len(targets), dtype=bool)
+            first[1:] = targets[1:] != targets[:-1]
+            targets = targets[first]
+            values[targets] = candidates[order][first]
+            parent_edges[targets] = edges[order][first]
+            layer += 1
+            layers[targets] = layer
+        return PriceEstimates(self, base, values, parent_edges)
+
+
+class PriceEstimates(Mapping):
+    """
+    currency to price in base, read only dict
+
+    values are converted to Decimal on access: product of Decimal mid
+    prices along the chosen conversion path
+    """
+
+    def __init__(self, graph: PriceGraph, base: str,
+                 values: np.ndarray, parent_edges: np.ndarray):
+        self.graph = graph
+        self.base = base
+        self.values = values
+        self.parent_edges = parent_edges
+        self._prices = {}
+        if base in graph.index:
+            self._prices[base] = Decimal(1)
+
+    def log10(self, currency: str) -> float:
+        """
+        log10 of price, nan if currency can't be converted to base
+        """
+        if currency not in self.graph.index:
+            return np.nan
+        return self.values[self.graph.index[currency]]
+
+    def __getitem__(self, currency: str) -> Decimal:
+        if currency in self._prices:
+            return self._prices[currency]
+        if np.isnan(self.log10(currency)):
+            raise KeyError(currency)
+        edge = self.parent_edges[self.graph.index[currency]]
+        number_of_products = len(self.graph.products)
+        orderbook = self.graph.orderbooks[edge % number_of_products]
+        previous = self.graph.currencies[self.graph.sources[edge]]
+        if edge < number_of_products:
+            price = self[previous] * orderbook.get_mid_market_price()
+        else:
+            price = self[previous] / orderbook.get_mid_market_price()
+        self._prices[currency] = price
+        return price
+
+    def __iter__(self):
+        return (currency for currency, value
+                in zip(self.graph.currencies, self.values)
+                if not np.isnan(value))
+
+    def __len__(self):
+        return int(np.count_nonzero(~np.isnan(self.values)))
+
+    def to_dict(self) -> Dict[str, Decimal]:
+        return {currency: self[currency] for currency in self}
@@ -1,34 +1,39 @@
-from internals.orderbook import OrderBook
+from internals.orderbook import OrderBook, L2OrderBook
 from typing import List, Dict, Tuple, Set
 from decimal import Decimal
 from collections import defaultdict
 from internals.order import Order
 from internals.enums import OrderType, OrderAction
 from networkx import digraph
-from networkx import flow
-from networkx.exception import NetworkXUnfeasible
+from rebalancer.prices import PriceGraph
+from rebalancer.flow import Edge, FlowUnfeasible, MinCostFlowSolver, \
+    get_solver, to_digraph
 from exchange.exchange import Exchange
 
 
 def rebalance_orders(initial_weights: Dict[str, Decimal],
                      final_weights: Dict[str, Decimal],
                      fees: Dict[str, Decimal],
-                     precision: Decimal=Decimal('1e-8')) -> (
+                     precision: Decimal=Decimal('1e-8'),
+                     solver: MinCostFlowSolver=None) -> (
         List[Tuple[str, str, Decimal]]):
     """
     :param initial_weights: weights before rebalance
     :param final_weights: weights after rebalance
     :param fee: dict from product to fee
+    :param solver: min cost flow solver, see rebalancer.flow.get_solver
     :return: List of orders, each order is list of length 3,
                              currency from, currency to, quantity_in_base
                                                 (might be product, quantity)
     """
+    if solver is None:
+        solver = get_solver()
     parsed_fees = {tuple(k.split('_')): v for k, v in fees.items()}
-    digraph = create_flow_digraph(
+    demands, edges = create_flow_network(
         initial_weights, final_weights, parsed_fees, precision=precision)
     try:
-        orders_to_make = flow.min_cost_flow(digraph)
-    except NetworkXUnfeasible as error:
+        orders_to_make = solver.min_cost_flow(demands, edges)
+    except FlowUnfeasible as error:
         return error
     orders = []
     for currency_from, dct in orders_to_make.items():
@@ -42,10 +47,14 @@ def rebalance_orders(initial_weights: Dict[str, Decimal],
     return orders
 
 
-def create_flow_digraph(initial_weights: Dict[str, Decimal],
+def create_flow_network(initial_weights: Dict[str, Decimal],
                         final_weights: Dict[str, Decimal],
                         total_fees: Dict[Tuple[str, str], Decimal],
-                        precision: Decimal=Decimal('1e-8')) -> digraph.DiGraph:
+                        precision: Decimal=Decimal('1e-8')) -> (
+        Tuple[Dict[str, int], List[Edge]]):
+    """
+    :return: node demands and edges (from, to, capacity, weight)
+    """
     currencies = set(initial_weights.keys()) | set(final_weights.keys())
     start = 'start'
     end = 'end'
@@ -57,26 +66,33 @@ def create_flow_digraph(initial_weights: Dict[str, Decimal],
     demand_from = sum(w1.values())
     demand_to = sum(w2.values())
     demand = min(demand_to, demand_from)
-    graph = digraph.DiGraph()
 
-    graph.add_nodes_from(currencies, demand=0.)
-    graph.add_node(start, demand=-demand)
-    graph.add_node(end, demand=demand)
+    demands = {currency: 0. for currency in currencies}
+    demands[start] = -demand
+    demands[end] = demand
 
+    # same edge might be added twice, last one is used, as in networkx
+    edges = {}
     for currency, capacity in w1.items():
-        graph.add_edge(start, currency, capacity=capacity, weight=0)
+        edges[start, currency] = (capacity, 0)
 
     for currency, capacity in w2.items():
-        graph.add_edge(currency, end, capacity=capacity, weight=0)
+        edges[currency, end] = (capacity, 0)
 
     for (c1, c2), fee in total_fees.items():
-        graph.add_edge(c1, c2,
-                       capacity=float('inf'),
-                       weight=-int(float(fee.log10()) * inv_precision))
-        graph.add_edge(c2, c1,
-                       capacity=float('inf'),
-                       weight=-int(float(fee.log10()) * inv_precision))
-    return graph
+        weight = -int(float(fee.log10()) * inv_precision)
+        edges[c1, c2] = (float('inf'), weight)
+        edges[c2, c1] = (float('inf'), weight)
+    return demands, [(u, v, capacity, weight)
+                     for (u, v), (capacity, weight) in edges.items()]
+
+
+def create_flow_digraph(initial_weights: Dict[str, Decimal],
+                        final_weights: Dict[str, Decimal],
+                        total_fees: Dict[Tuple[str, str], Decimal],
+                        precision: Decimal=Decimal('1e-8')) -> digraph.DiGraph:
+    return to_digraph(*create_flow_network(
+        initial_weights, final_weights, total_fees, precision))
 
 
 def get_weights_from_resources(
@@ -108,20 +124,9 @@ def get_portfolio_value_from_resources(
 def get_price_estimates_from_orderbooks(
         orderbooks: List[OrderBook], base: str) -> Dict[str, Decimal]:
     """
-    get currency to price dictionary
+    get currency to price dictionary, see rebalancer.prices.PriceGraph
     """
-    currency_pair_prices = get_mid_prices_from_orderbooks(orderbooks)
-    graph = {}
-
-    for product, price in currency_pair_prices.items():
-        currency_from, currencies_to = product.split('_')
-        if currency_from not in graph:
-            graph[currency_from] = {}
-        graph[currency_from][currencies_to] = -price.log10()
-
-    dists = bfs(graph, base)
-    dists = {k: Decimal(10) ** v for k, v in dists.items()}
-    return dists
+    return PriceGraph(orderbooks).estimates(base)
 
 
 def get_mid_prices_from_orderbooks(orderbooks: List[OrderBook]) -> (
@@ -162,6 +167,31 @@ def topological_sort(orders: List[Tuple[str, str, Decimal]]) -> (
     return orders
 
 
+def dependency_waves(orders: List[Tuple[str, str, Decimal]]) -> (
+        List[List[Tuple[str, str, Decimal]]]):
+    """
+    split orders into waves, orders of a wave don't depend on each other
+    and all orders, which bring currency sold by an order,
+    are in earlier waves
+    """
+    incoming = defaultdict(list)
+    for order in orders:
+        incoming[order[1]].append(order)
+    wave_of = {}
+
+    def get_wave(order):
+        if order not in wave_of:
+            wave_of[order] = 1 + max([get_wave(previous)
+                                      for previous in incoming[order[0]]],
+                                     default=-1)
+        return wave_of[order]
+
+    waves = defaultdict(list)
+    for order in orders:
+        waves[get_wave(order)].append(order)
+    return [waves[i] for i in range(len(waves))]
+
+
 def dfs(graph: Dict[str, Set[str]], visited: Set[str], start: str)-> List[str]:
     visited.add(start)
     nexts = []
@@ -191,12 +221,41 @@ def bfs(graph: Dict[str, Dict[str, Decimal]], start: str)-> Dict[str, Decimal]:
     return {k: v[0] for k, v in dists.items()}
 
 
-def spread_to_fee(orderbook):
+def spread_to_fee(orderbook, quantity: Decimal=None):
+    """
+    half of round trip cost through orderbook,
+    if orderbook has levels and quantity is given, mean execution prices
+    of orders of this quantity are used instead of wall prices
+    """
+    if quantity is not None and isinstance(orderbook, L2OrderBook):
+        buy_price = orderbook.vwap(OrderAction.BUY, quantity)
+        sell_price = orderbook.vwap(OrderAction.SELL, quantity)
+        if buy_price is not None and sell_price is not None:
+            return 1 - Decimal(sell_price / buy_price).sqrt()
     wall_ask = orderbook.get_wall_ask()
     wall_bid = orderbook.get_wall_bid()
     return 1 - (wall_bid / wall_ask).sqrt()
 
 
+def get_order_size_estimates(products: List[str],
+                             initial_weights: Dict[str, Decimal],
+                             final_weights: Dict[str, Decimal],
+                             price_estimates: Dict[str, Decimal],
+                             portfolio_value: Decimal) -> Dict[str, Decimal]:
+    """
+    upper bound of quantity (in commodity), which can be traded in product
+    during rebalance
+    """
+    sizes = {}
+    for product in products:
+        commodity, base = product.split('_')
+        weight = max(abs(initial_weights.get(currency, Decimal(0)) -
+                         Decimal(final_weights.get(currency, Decimal(0))))
+                     for currency in (commodity, base))
+        sizes[product] = portfolio_value * weight / price_estimates[commodity]
+    return sizes
+
+
 def get_total_fee(*fees):
     p = 1
     for fee in fees:
@@ -227,17 +286,37 @@ def parse_order(order: Tuple[str, str, Decimal],
     return Order(product, _type, side, quantity, price)
 
 
+def resolve_products(exchange: Exchange, currencies: Set[str]) -> List[str]:
+    """
+    get products, which trade one of currencies for another,
+    only products listed on exchange are returned, each market once
+    """
+    listed = exchange.listed_products()
+    currencies = sorted(currencies)
+    if listed is None:
+        return ['_'.join([i, j])
+                for i in currencies
+                for j in currencies if i != j]
+    products = []
+    for k, i in enumerate(currencies):
+        for j in currencies[k + 1:]:
+            if '_'.join([i, j]) in listed:
+                products.append('_'.join([i, j]))
+            if '_'.join([j, i]) in listed:
+                products.append('_'.join([j, i]))
+    return products
+
+
 def pre_rebalance(exchange: Exchange,
                   weights: Dict[str, Decimal],
-                  base: str='USDT'):
+                  base: str='USDT',
+                  depth: int=1):
     resources = exchange.get_resources()
     currencies = (exchange.through_trade_currencies() |
                   set(list(resources.keys())) | set(list(weights.keys())))
-    all_possible_products = ['_'.join([i, j])
-                             for i in currencies
-                             for j in currencies]
+    possible_products = resolve_products(exchange, currencies)
 
-    orderbooks = exchange.get_orderbooks(all_possible_products)
+    orderbooks = exchange.get_orderbooks(possible_products, depth=depth)
     # getting all ordebrooks and filtering out orderbooks,
     # that use other currencies
     products = set(orderbook.product for orderbook in orderbooks)
@@ -258,7 +337,13 @@ def pre_rebalance(exchange: Exchange,
     orderbooks = {orderbook.product: orderbook
                   for orderbook in orderbooks}
 
-    spread_fees = {product: spread_to_fee(orderbook)
+    order_sizes = {}
+    if depth != 1:
+        order_sizes = get_order_size_estimates(
+            products, initial_weights, weights,
+            price_estimates, portfolio_value)
+    spread_fees = {product: spread_to_fee(orderbook,
+                                          order_sizes.get(product))
                    for product, orderbook in orderbooks.items()}
 
     return (products, resources, orderbooks, price_estimates,
@@ -1,13 +1,24 @@
 import init_django  # noqa
 import os
+import json
 import time
 import celery
+import redis
+from logger import logger
+from celery.exceptions import Ignore
+from celery.signals import task_postrun, worker_init, \
+    worker_process_init, worker_shutdown
 
-from rebalancer.limit_order_rebalancer import limit_order_rebalance
+from exchange import shared_books
+from exchange.async_exchange import get_async_exchange, SyncExchangeAdapter
+from rebalancer.limit_order_rebalancer import LimitOrderRebalanceState, \
+    prepare_limit_order_rebalance, limit_order_rebalance_step
 from rebalancer.market_order_rebalancer import market_order_rebalance_and_save
 from webserver.decorators import initialize_exchange
 from webserver.utils import get_portfolio
 from webserver.models import User
+from webserver.lease import RebalanceLease
+from webserver.progress import publish_progress, FINAL_STATES
 
 
 app = celery.Celery('rebalance')
@@ -20,49 +31,242 @@ app.conf.update(broker_url=os.environ['REDIS_URL'],
 
 
 REBALANCING_ALGORITHM = {
-    'MARKET': market_order_rebalance_and_save,
-    'LIMIT': limit_order_rebalance
+    'MARKET': market_order_rebalance_and_save
 }
 
+# run exchange calls through asyncio exchange, so independent requests
+# of rebalancers are sent concurrently
+USE_ASYNC_EXCHANGE = os.environ.get('ASYNC_EXCHANGE', '0') == '1'
+
+# limit rebalance state is kept in redis between steps
+LIMIT_REBALANCE_STATE_TTL = 24 * 3600
+LIMIT_REBALANCE_MAX_RETRIES = 10
+LIMIT_REBALANCE_TIME_DELTA = 30
+LIMIT_REBALANCE_POLL_INTERVAL = 1.
+
+redis_client = redis.StrictRedis.from_url(os.environ['REDIS_URL'])
+
+# one rebalance per user, lease is taken by view and released by task
+REBALANCE_LEASE = RebalanceLease(redis_client)
+
+
+def _limit_rebalance_key(task_id):
+    return 'limit_rebalance:{}'.format(task_id)
+
+
+def save_limit_rebalance_state(task_id, state: LimitOrderRebalanceState):
+    redis_client.set(_limit_rebalance_key(task_id),
+                     json.dumps(state.to_dict(), default=str),
+                     ex=LIMIT_REBALANCE_STATE_TTL)
+
+
+def load_limit_rebalance_state(task_id) -> LimitOrderRebalanceState:
+    state = redis_client.get(_limit_rebalance_key(task_id))
+    if state is None:
+        return None
+    return LimitOrderRebalanceState.from_dict(json.loads(state))
+
+
+def cancel_open_orders(exchange, state: LimitOrderRebalanceState):
+    for open_order in state.open_orders:
+        try:
+            exchange.cancel_limit_order(open_order['response'])
+        except Exception:
+            logger.exception('failed to cancel order {}'.format(
+                open_order['response']))
+
+
+def rebalance_result(exchange, params, api_key, orders, start_time):
+    if isinstance(orders, Exception):
+        return {'api_key': api_key,
+                'status': 'unknown error while rebalancing',
+                'error': True}
+    if isinstance(orders, list) and orders and isinstance(orders[0], str):
+        return {'api_key': api_key,
+                'status': 'error while rebalancing, '
+                'the following currencies does not exist: {}'.format(
+                    ', '.join(orders)),
+                'error': True}
+
+    portfolio = get_portfolio(exchange)
+    delta_t = (time.time() - start_time) * 1000
+
+    return {params['name']: portfolio,
+            'api_key': api_key,
+            'status': "processing complete in {0:.0f}ms".format(delta_t)}
+
+
+def with_exchange(rebalance):
+    """
+    run rebalance(exchange, params) through async exchange, if it's enabled
+    """
+    @initialize_exchange
+    def _rebalance(this, request, exchange, params):
+        if not USE_ASYNC_EXCHANGE:
+            return rebalance(exchange, params)
+        exchange = SyncExchangeAdapter(get_async_exchange(exchange))
+        try:
+            return rebalance(exchange, params)
+        finally:
+            exchange.close()
+    return _rebalance
+
 
 @app.task(bind=True)
 def rebalance_task(self, request, api_key, weights, start_time):
 
-    @initialize_exchange
-    def rebalance(this, request, exchange, params):
+    def update(time_estimate):
+        self.update_state(
+            None,
+            "STARTED",
+            {
+                "remaining_time_estimate": time_estimate,
+                "api_key": api_key
+            }
+        )
+        publish_progress(redis_client, self.request.id, "STARTED",
+                         remaining_time_estimate=time_estimate)
+        # market rebalance might run longer than lease ttl, it updates
+        # estimate per wave of orders
+        REBALANCE_LEASE.refresh(api_key, self.request.id)
+
+    def _rebalance(exchange, params):
 
         start_time = time.time()
 
-        def update(time_estimate):
-            nonlocal self, api_key
-            self.update_state(
-                None,
-                "STARTED",
-                {
-                    "remaining_time_estimate": time_estimate,
-                    "api_key": api_key
-                }
-            )
         update(12000)
+        algorithm = params.get('type', 'market').upper()
+        if algorithm == 'LIMIT':
+            return _start_limit_rebalance(exchange, params, start_time)
         user = User.objects.get(api_key=api_key)
-        orders = REBALANCING_ALGORITHM[params.get('type', 'market').upper()](
-            exchange, weights, user, update)
-        if isinstance(orders, Exception):
-            return {'api_key': api_key,
-                    'status': 'unknown error while rebalancing',
-                    'error': True}
-        if isinstance(orders, list) and orders and isinstance(orders[0], str):
-            return {'api_key': api_key,
-                    'status': 'error while rebalancing, '
-                    'the following currencies does not exist: {}'.format(
-                        ', '.join(orders)),
-                    'error': True}
-
-        portfolio = get_portfolio(exchange)
-        delta_t = (time.time() - start_time) * 1000
-
-        return {params['name']: portfolio,
-                'api_key': api_key,
-                'status': "processing complete in {0:.0f}ms".format(delta_t)}
-
-    return rebalance(self, request)
+        orders = REBALANCING_ALGORITHM[algorithm](
+            exchange, weights, user, update, run_id=self.request.id)
+        return rebalance_result(exchange, params, api_key, orders,
+                                start_time)
+
+    def _start_limit_rebalance(exchange, params, start_time):
+        prepared = prepare_limit_order_rebalance(exchange, weights)
+        if not isinstance(prepared, tuple):
+            return rebalance_result(exchange, params, api_key, prepared,
+                                    start_time)
+        state = LimitOrderRebalanceState(
+            *prepared, LIMIT_REBALANCE_MAX_RETRIES,
+            LIMIT_REBALANCE_TIME_DELTA, LIMIT_REBALANCE_POLL_INTERVAL)
+        # orders are placed and polled by steps, which are re-enqueued
+        # with countdown, so worker isn't blocked while orders are open.
+        # result of this task is stored by the last step
+        nonlocal handed_off
+        save_limit_rebalance_state(self.request.id, state)
+        limit_rebalance_step_task.apply_async(
+            (request, api_key, weights, start_time, self.request.id))
+        handed_off = True
+        raise Ignore()
+
+    # lease is released by the last step of limit rebalance
+    handed_off = False
+    try:
+        return with_exchange(_rebalance)(self, request)
+    finally:
+        if not handed_off:
+            REBALANCE_LEASE.release(api_key, self.request.id)
+
+
+@app.task(bind=True)
+def limit_rebalance_step_task(self, request, api_key, weights, start_time,
+                              root_id):
+    """
+    one step of limit rebalance started by rebalance_task `root_id`,
+    which holds the rebalance lease of the user until the last step
+    """
+
+    def update(time_estimate):
+        self.update_state(
+            root_id,
+            "STARTED",
+            {
+                "remaining_time_estimate": time_estimate,
+                "api_key": api_key
+            }
+        )
+        publish_progress(redis_client, root_id, "STARTED",
+                         remaining_time_estimate=time_estimate)
+
+    def _step(exchange, params):
+        nonlocal rescheduled
+        state = load_limit_rebalance_state(root_id)
+        if state is None:
+            result = {'api_key': api_key,
+                      'status': 'rebalance expired',
+                      'error': True}
+        elif not REBALANCE_LEASE.refresh(api_key, root_id):
+            # rebalance was reset by user
+            cancel_open_orders(exchange, state)
+            result = {'api_key': api_key,
+                      'status': 'rebalance was reset',
+                      'error': True}
+        else:
+            try:
+                delay = limit_order_rebalance_step(exchange, state, update)
+                if delay is not None:
+                    save_limit_rebalance_state(root_id, state)
+                    self.apply_async(self.request.args, countdown=delay)
+                    rescheduled = True
+                    return
+                result = rebalance_result(exchange, params, api_key,
+                                          state.rets, start_time)
+            except Exception:
+                # orders aren't left on exchange without rebalance
+                cancel_open_orders(exchange, state)
+                raise
+        self.backend.store_result(root_id, result, 'SUCCESS')
+        publish_progress(redis_client, root_id, 'SUCCESS')
+        return result
+
+    rescheduled = False
+    try:
+        return with_exchange(_step)(self, request)
+    except Exception:
+        logger.exception('limit rebalance {} failed'.format(root_id))
+        # root task would stay started, while clients wait for it.
+        # failure is stored as error result, like failures of market
+        # rebalance, so it's given to its user
+        self.backend.store_result(root_id, {
+            'api_key': api_key,
+            'status': 'unknown error while rebalancing',
+            'error': True}, 'SUCCESS')
+        publish_progress(redis_client, root_id, 'SUCCESS')
+        raise
+    finally:
+        if not rescheduled:
+            redis_client.delete(_limit_rebalance_key(root_id))
+            REBALANCE_LEASE.release(api_key, root_id)
+
+
+@task_postrun.connect(sender=rebalance_task)
+def publish_rebalance_finished(task_id=None, state=None, **kwargs):
+    # limit rebalance is handed off to steps with Ignore,
+    # its end is published by the last step
+    if state in FINAL_STATES:
+        publish_progress(redis_client, task_id, state)
+
+
+@worker_init.connect
+def start_shared_orderbooks(**kwargs):
+    # top of book table is updated once per host, children only read it
+    if not shared_books.SHARED_ORDERBOOKS_ENABLED:
+        return
+    try:
+        shared_books.start_updater()
+    except Exception as e:
+        logger.warning('shared orderbooks are disabled: {}'.format(e))
+
+
+@worker_process_init.connect
+def attach_shared_orderbooks(**kwargs):
+    if shared_books.SHARED_ORDERBOOKS_ENABLED:
+        shared_books.attach_reader()
+
+
+@worker_shutdown.connect
+def stop_shared_orderbooks(**kwargs):
+    shared_books.stop_updater()
@@ -0,0 +1,124 @@
+import time
+import asyncio
+import unittest
+from decimal import Decimal
+import requests
+from unittest.mock import patch
+from exchange.exchange import Exchange
+from exchange.coinbasepro import CoinbasePro
+from exchange.pool import ThreadLocalSession
+from internals.rate_limiter import TokenBucket
+from exchange.async_exchange import AsyncExchange, SyncExchangeAdapter, \
+    AsyncCoinbasePro, share_session
+from internals.order import Order
+from internals.orderbook import OrderBook
+from internals.enums import OrderType, OrderAction
+
+
+class SlowExchange(Exchange):
+    delay = 0.1
+
+    def __init__(self):
+        self.calls = []
+
+    def get_resources(self):
+        time.sleep(self.delay)
+        return {'BTC': Decimal('1')}
+
+    def get_orderbooks(self, products=None, depth=1):
+        time.sleep(self.delay)
+        return [OrderBook('ETH_BTC', Decimal('0.1'))]
+
+    def place_market_order(self, order, price_estimates):
+        time.sleep(self.delay)
+        self.calls.append(order.product)
+        return {'product': order.product}
+
+
+class AsyncExchangeTester(unittest.TestCase):
+    def test_concurrent_calls(self):
+        async_exchange = AsyncExchange(SlowExchange())
+        orders = [Order(product, OrderType.MARKET, OrderAction.BUY,
+                        Decimal('1'))
+                  for product in ['ETH_BTC', 'LTC_BTC', 'EOS_BTC']]
+
+        loop = asyncio.new_event_loop()
+        start = time.time()
+        resources, orderbooks = loop.run_until_complete(
+            async_exchange.get_resources_and_orderbooks())
+        responses = loop.run_until_complete(
+            async_exchange.place_market_orders(orders, {}))
+        elapsed = time.time() - start
+        loop.close()
+        async_exchange.close()
+
+        self.assertEqual(resources, {'BTC': Decimal('1')})
+        self.assertEqual(orderbooks[0].product, 'ETH_BTC')
+        self.assertEqual([response['product'] for response in responses],
+                         ['ETH_BTC', 'LTC_BTC', 'EOS_BTC'])
+        self.assertLess(elapsed, 0.35)
+
+    def test_sync_adapter(self):
+        exchange = SlowExchange()
+        adapter = SyncExchangeAdapter(AsyncExchange(exchange))
+        adapter.open_ledger()
+        self.assertIsNotNone(exchange.ledger)
+        self.assertEqual(adapter.get_resources(), {'BTC': Decimal('1')})
+        response = adapter.place_market_order(
+            Order('ETH_BTC', OrderType.MARKET, OrderAction.BUY,
+                  Decimal('1')), {})
+        self.assertEqual(response, {'product': 'ETH_BTC'})
+        self.assertEqual(exchange.calls, ['ETH_BTC'])
+        adapter.close_ledger()
+        adapter.close()
+
+
+class FakeClient:
+    def __init__(self):
+        self.session = requests.Session()
+
+
+class BooksClient(FakeClient):
+    def get_product_order_book(self, product_id, level=1):
+        time.sleep(0.1)
+        return {'bids': [['1', '1', 1]], 'asks': [['2', '1', 1]]}
+
+
+class FakeCoinbasePro(CoinbasePro):
+    def __init__(self):
+        self.client = BooksClient()
+
+
+class SessionTester(unittest.TestCase):
+    def test_share_session(self):
+        client = FakeClient()
+        session = client.session
+        share_session(client, 4)
+        self.assertIsInstance(client.session, ThreadLocalSession)
+        # sessions of threads aren't the original one
+        self.assertIsNot(client.session._session(), session)
+
+        # pooled session isn't changed
+        pooled = client.session
+        share_session(client, 8)
+        self.assertIs(client.session, pooled)
+
+
+class AsyncCoinbaseProTester(unittest.TestCase):
+    @patch('exchange.coinbasepro.PUBLIC_RATE_LIMITER',
+           TokenBucket(rate=1000, capacity=10))
+    def test_concurrent_orderbooks(self):
+        async_exchange = AsyncCoinbasePro(FakeCoinbasePro())
+        products = ['BTC_USD', 'ETH_USD', 'LTC_USD', 'ETH_BTC']
+        loop = asyncio.new_event_loop()
+        start = time.time()
+        orderbooks = loop.run_until_complete(
+            async_exchange.get_orderbooks(products))
+        elapsed = time.time() - start
+        loop.close()
+        async_exchange.close()
+
+        self.assertEqual([orderbook.product for orderbook in orderbooks],
+                         products)
+        self.assertEqual(orderbooks[0].get_wall_bid(), Decimal('1'))
+        self.assertLess(elapsed, 0.35)
@@ -123,6 +123,63 @@ class BinanceTester(unittest.TestCase):
         self.assertEqual(new_order._type, order._type)
         self.assertEqual(new_order._price, Decimal('150.01'))
 
+    def test_validate_order_with_ledger(self):
+        class FakeMarket(Binance):
+            def __init__(self, filters, resources):
+                self.resources = resources
+                self.filters = filters
+                self.resources_calls = 0
+
+            def get_resources(self):
+                self.resources_calls += 1
+                return self.resources
+
+        filters = {
+            'BTCUSDT': {
+                'min_order_size': Decimal('0.001'),
+                'max_order_size': Decimal('10000'),
+                'order_step': Decimal('1e-8'),
+                'min_notional': Decimal('10'),
+                'min_price': Decimal('1'),
+                'max_price': Decimal('1e6'),
+                'price_step': Decimal('0.01'),
+                'base': 'USDT',
+                'commodity': 'BTC'
+            }
+        }
+        fake_binance = FakeMarket(filters, {'BTC': Decimal('1'),
+                                            'USDT': Decimal('10000')})
+        price_estimates = {'BTC': Decimal('1e4'), 'USDT': Decimal(1)}
+        ledger = fake_binance.open_ledger()
+
+        for _ in range(3):
+            order = Order('BTC_USDT', OrderType.MARKET,
+                          OrderAction.SELL, Decimal('2'), None)
+            new_order = fake_binance._validate_order(order, price_estimates)
+            self.assertEqual(new_order._quantity, Decimal('1'))
+        self.assertEqual(fake_binance.resources_calls, 1)
+
+        ledger.apply_market_order_response({
+            'product': 'BTC_USDT', 'side': 'SELL',
+            'executed_quantity': Decimal('0.5'),
+            'mean_price': Decimal('1e4')})
+        order = Order('BTC_USDT', OrderType.MARKET,
+                      OrderAction.SELL, Decimal('2'), None)
+        new_order = fake_binance._validate_order(order, price_estimates)
+        self.assertEqual(new_order._quantity, Decimal('0.5'))
+        self.assertEqual(fake_binance.resources_calls, 1)
+
+        ledger.invalidate()
+        order = Order('BTC_USDT', OrderType.MARKET,
+                      OrderAction.SELL, Decimal('2'), None)
+        new_order = fake_binance._validate_order(order, price_estimates)
+        self.assertEqual(new_order._quantity, Decimal('1'))
+        self.assertEqual(fake_binance.resources_calls, 2)
+
+        fake_binance.close_ledger()
+        fake_binance._validate_order(order, price_estimates)
+        self.assertEqual(fake_binance.resources_calls, 3)
+
     def test_parse_params(self):
         correct_params = {
             'symbol': 'BTCUSDT',
@@ -140,8 +197,10 @@ class BinanceTester(unittest.TestCase):
         } for k, v in product_symbol.items()
             for _id in order_id
             for c_id in client_order_id]
+        fake_binance = FakeBinance(filters={
+            'BTCUSDT': {'base': 'USDT', 'commodity': 'BTC'}})
         for param in params:
-            self.assertDictEqual(Binance._parse_params(None, param),
+            self.assertDictEqual(fake_binance._parse_params(param),
                                  correct_params)
 
     def test_parse_market_order_response(self):
@@ -203,3 +262,57 @@ class BinanceTester(unittest.TestCase):
         }
 
         self.assertDictEqual(correct_parsed_response, ret)
+
+
+class RecordingGovernor:
+    def __init__(self):
+        self.calls = []
+
+    def acquire(self, weight=1):
+        self.calls.append(('acquire', weight))
+
+    def sync(self, used):
+        self.calls.append(('sync', used))
+
+    def block(self, seconds):
+        self.calls.append(('block', seconds))
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class FakeClient:
+    def get_order_book(self, **params):
+        return params
+
+    def get_account(self):
+        return {}
+
+
+class BinanceWeightTester(unittest.TestCase):
+    def test_request_acquires_weight(self):
+        governor = RecordingGovernor()
+        exchange = FakeBinance(client=FakeClient(), governor=governor)
+        exchange._request('get_order_book', 5, symbol='BTCUSDT', limit=1000)
+        exchange._request('get_account')
+        self.assertListEqual(governor.calls, [
+            ('acquire', 5), ('acquire', Binance.WEIGHTS['get_account'])])
+
+    def test_response_syncs_and_blocks(self):
+        governor = RecordingGovernor()
+        exchange = FakeBinance(governor=governor)
+        exchange._on_response(FakeResponse(
+            200, {'X-MBX-USED-WEIGHT-1M': '120'}))
+        exchange._on_response(FakeResponse(
+            429, {'X-MBX-USED-WEIGHT-1M': '1200', 'Retry-After': '30'}))
+        self.assertListEqual(governor.calls, [
+            ('sync', 120), ('sync', 1200), ('block', 30.)])
+
+
+class FakeBinance(Binance):
+    def __init__(self, **kwargs):
+        for k, v in kwargs.items():
+            setattr(self, k, v)
@@ -0,0 +1,93 @@
+import json
+import time
+import base64
+import socket
+import hashlib
+import unittest
+import threading
+from decimal import Decimal
+from exchange.binance_stream import BookTickerStream
+from internals.orderbook import OrderBook
+
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class LocalWebsocketServer:
+    """
+    websocket stand-in, sends given text messages to the first client
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(1)
+        self.url = 'ws://127.0.0.1:{}/ws/!bookTicker'.format(
+            self.socket.getsockname()[1])
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        connection, _ = self.socket.accept()
+        request = b''
+        while b'\r\n\r\n' not in request:
+            request += connection.recv(1024)
+        key = [line.split(b':', 1)[1].strip()
+               for line in request.split(b'\r\n')
+               if line.lower().startswith(b'sec-websocket-key')][0]
+        accept = base64.b64encode(hashlib.sha1(
+            key + WEBSOCKET_GUID.encode()).digest())
+        connection.sendall(b'HTTP/1.1 101 Switching Protocols\r\n'
+                           b'Upgrade: websocket\r\n'
+                           b'Connection: Upgrade\r\n'
+                           b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        for message in self.messages:
+            payload = json.dumps(message).encode()
+            assert len(payload) < 126
+            connection.sendall(bytes([0x81, len(payload)]) + payload)
+        self.closed.wait()
+        connection.close()
+        self.socket.close()
+
+
+class BookTickerStreamTester(unittest.TestCase):
+    def test_stream(self):
+        server = LocalWebsocketServer([
+            {'u': 1, 's': 'BTCUSDT', 'b': '9999', 'B': '1',
+             'a': '10001', 'A': '1'},
+            {'u': 2, 's': 'ETHBTC', 'b': '0.09', 'B': '1',
+             'a': '0.11', 'A': '1'},
+            {'u': 3, 's': 'BTCUSDT', 'b': '10000', 'B': '1',
+             'a': '10002', 'A': '1'},
+        ])
+        stream = BookTickerStream(url=server.url, max_staleness=60)
+        self.assertIsNone(stream.get_orderbooks(['BTC_USDT']))
+        stream.start()
+        for _ in range(200):
+            orderbooks = stream.get_orderbooks(['BTC_USDT', 'ETH_BTC'])
+            if (orderbooks is not None and
+                    orderbooks[0].get_wall_bid() == Decimal('10000')):
+                break
+            time.sleep(0.01)
+        server.closed.set()
+        stream.stop()
+
+        self.assertEqual([orderbook.product for orderbook in orderbooks],
+                         ['BTC_USDT', 'ETH_BTC'])
+        self.assertEqual(orderbooks[0].get_wall_ask(), Decimal('10002'))
+        self.assertEqual(orderbooks[1].get_mid_market_price(),
+                         Decimal('0.1'))
+        # not seen yet
+        self.assertIsNone(stream.get_orderbooks(['LTC_BTC']))
+        self.assertIsNone(stream.get_orderbooks())
+
+        stream.seed([OrderBook('LTC_BTC', Decimal('0.01')),
+                     OrderBook('BTC_USDT', Decimal('1'))])
+        self.assertEqual(len(stream.get_orderbooks()), 3)
+        self.assertEqual(stream.get_orderbooks(['BTC_USDT'])[0].get_wall_bid(),
+                         Decimal('10000'))
+
+        stream.max_staleness = 0
+        self.assertIsNone(stream.get_orderbooks(['BTC_USDT']))
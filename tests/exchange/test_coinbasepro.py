@@ -1,8 +1,12 @@
+import time
 import unittest
 from decimal import Decimal
+from unittest.mock import patch
+from cbpro import AuthenticatedClient
 from internals.order import Order
 from internals.enums import OrderType, OrderAction
 from exchange.coinbasepro import CoinbasePro
+from internals.rate_limiter import TokenBucket
 
 
 class CoinbaseProTester(unittest.TestCase):
@@ -138,6 +142,30 @@ class CoinbaseProTester(unittest.TestCase):
         order = exchange._validate_order(order)
         self.assertOrderEqual(order, correct_order)
 
+    @patch('exchange.coinbasepro.PUBLIC_RATE_LIMITER',
+           TokenBucket(rate=1000, capacity=1))
+    def test_get_orderbooks(self):
+        exchange = FakeExchange(client=FakeClient({
+            'BTC-USD': {'bids': [['9999', '1', 1]],
+                        'asks': [['10001', '1', 1]]},
+            'ETH-USD': {'bids': [['999', '1', 1]],
+                        'asks': [['1001', '1', 1]]},
+            'ETH-BTC': {'bids': [], 'asks': [['0.1', '1', 1]]},
+            'LTC-BTC': {'bids': [['0.009', '1', 1]],
+                        'asks': [['0.011', '1', 1]]}
+        }))
+        products = ['BTC_USD', 'ETH_USD', 'ETH_BTC', 'LTC_BTC']
+        orderbooks = exchange.get_orderbooks(products)
+
+        self.assertEqual([orderbook.product for orderbook in orderbooks],
+                         ['BTC_USD', 'ETH_USD', 'LTC_BTC'])
+        self.assertEqual(orderbooks[0].get_wall_bid(), Decimal('9999'))
+        self.assertEqual(orderbooks[0].get_wall_ask(), Decimal('10001'))
+        self.assertEqual(orderbooks[2].get_mid_market_price(),
+                         Decimal('0.01'))
+        # requests are made concurrently
+        self.assertGreater(exchange.client.max_concurrent_requests, 1)
+
     def assertOrderEqual(self, o1, o2):
         self.assertEqual(o1.product, o2.product)
         self.assertEqual(o1._type, o2._type)
@@ -154,6 +182,34 @@ class CoinbaseProTester(unittest.TestCase):
             self.assertEqual(o1._price, o2._price)
 
 
+class FillsClient:
+    def __init__(self, fills):
+        self.fills = fills
+
+    def get_fills(self, order_id):
+        return iter(self.fills)
+
+
+class ParseMarketOrderResponseTester(unittest.TestCase):
+    response = {'id': 'id', 'product_id': 'BTC-USD', 'side': 'buy'}
+
+    def test_parse(self):
+        exchange = FakeExchange(client=FillsClient([
+            {'size': '1', 'price': '100', 'fee': '0.3'},
+            {'size': '3', 'price': '200', 'fee': '1.8'}]))
+        ret = exchange.parse_market_order_response(self.response)
+        self.assertEqual(ret['executed_quantity'], Decimal('4'))
+        self.assertEqual(ret['mean_price'], Decimal('175'))
+        self.assertEqual(ret['commission_USD'], Decimal('2.1'))
+
+    def test_parse_without_fills(self):
+        exchange = FakeExchange(client=FillsClient([]))
+        ret = exchange.parse_market_order_response(self.response)
+        self.assertEqual(ret['executed_quantity'], Decimal('0'))
+        self.assertIsNone(ret['mean_price'])
+        self.assertEqual(ret['commission_USD'], Decimal('0'))
+
+
 class FakeExchange(CoinbasePro):
     def __init__(self, **kwargs):
         for k, v in kwargs.items():
@@ -164,3 +220,58 @@ class FakeExchange(CoinbasePro):
 
     def get_taker_fee(self, product):
         return Decimal('0.003')
+
+
+class FakeClient(AuthenticatedClient):
+    def __init__(self, orderbooks):
+        self.orderbooks = orderbooks
+        self.concurrent_requests = 0
+        self.max_concurrent_requests = 0
+
+    def get_product_order_book(self, product_id, level=1):
+        self.concurrent_requests += 1
+        self.max_concurrent_requests = max(self.max_concurrent_requests,
+                                           self.concurrent_requests)
+        time.sleep(0.05)
+        self.concurrent_requests -= 1
+        return self.orderbooks[product_id]
+
+
+class CountingBucket:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self, tokens=1):
+        self.acquired += tokens
+        return 0.
+
+
+class RecordingGovernor:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self, weight=1):
+        self.acquired += weight
+
+
+class PublicRateLimitTester(unittest.TestCase):
+    books = {'BTC-USD': {'bids': [['9999', '1', 1]],
+                         'asks': [['10001', '1', 1]]}}
+
+    def test_coalesced_requests_take_one_token(self):
+        bucket = CountingBucket()
+        exchange = FakeExchange(client=FakeClient(self.books))
+        with patch('exchange.coinbasepro.PUBLIC_RATE_LIMITER', bucket):
+            orderbooks = exchange.get_orderbooks(['BTC_USD'] * 4)
+        self.assertEqual(len(orderbooks), 4)
+        self.assertEqual(bucket.acquired, 1)
+
+    def test_governed_requests_dont_take_tokens(self):
+        bucket = CountingBucket()
+        governor = RecordingGovernor()
+        exchange = FakeExchange(client=FakeClient(self.books),
+                                public_governor=governor)
+        with patch('exchange.coinbasepro.PUBLIC_RATE_LIMITER', bucket):
+            exchange.get_orderbooks(['BTC_USD'])
+        self.assertEqual(governor.acquired, 1)
+        self.assertEqual(bucket.acquired, 0)
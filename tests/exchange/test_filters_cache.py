@@ -0,0 +1,70 @@
+import os
+import time
+import unittest
+import tempfile
+from decimal import Decimal
+from exchange.filters_cache import FiltersCache
+
+
+class FiltersCacheTester(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'filters.json')
+        self.fetches = 0
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def fetch(self):
+        self.fetches += 1
+        return {'BTCUSDT': {'min_order_size': Decimal('0.001'),
+                            'base': 'USDT',
+                            'commodity': 'BTC'}}
+
+    def test_memory_cache(self):
+        cache = FiltersCache('test', ttl=60, path=self.path)
+        filters1 = cache.get(self.fetch)
+        filters2 = cache.get(self.fetch)
+
+        self.assertIs(filters1, filters2)
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 1)
+
+    def test_file_cache(self):
+        FiltersCache('test', ttl=60, path=self.path).get(self.fetch)
+        cache = FiltersCache('test', ttl=60, path=self.path)
+        filters = cache.get(self.fetch)
+
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 0)
+        self.assertEqual(filters['BTCUSDT']['min_order_size'],
+                         Decimal('0.001'))
+        self.assertEqual(filters['BTCUSDT']['base'], 'USDT')
+
+    def test_ttl(self):
+        cache = FiltersCache('test', ttl=0, path=self.path)
+        cache.get(self.fetch)
+        cache.get(self.fetch)
+
+        self.assertEqual(self.fetches, 2)
+        self.assertEqual(cache.misses, 2)
+
+        cache.ttl = 60
+        cache.invalidate()
+        cache.get(self.fetch)
+        self.assertEqual(self.fetches, 3)
+
+    def test_background_refresh(self):
+        cache = FiltersCache('test', ttl=60, refresh_after=0, path=self.path)
+        cache.get(self.fetch)
+        cache.get(self.fetch)
+        for _ in range(100):
+            if self.fetches == 2 and not cache._refreshing:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(self.fetches, 2)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 1)
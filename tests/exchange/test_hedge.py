@@ -0,0 +1,100 @@
+import time
+import threading
+import unittest
+from exchange.hedge import Hedger
+
+
+class HedgerTester(unittest.TestCase):
+    def warm_up(self, hedger, endpoint, latency_count=3):
+        for _ in range(latency_count):
+            hedger.call(endpoint, lambda: None)
+
+    def test_delay(self):
+        hedger = Hedger(percentile=50, min_samples=3, workers=2)
+        self.assertIsNone(hedger.delay('tickers'))
+        hedger._latencies['tickers'].extend([0.3, 0.1, 0.2, 0.4])
+        self.assertEqual(hedger.delay('tickers'), 0.2)
+
+    def test_slow_request_is_hedged(self):
+        hedger = Hedger(percentile=50, budget=1., min_samples=3, workers=4)
+        self.warm_up(hedger, 'tickers')
+        release = threading.Event()
+        attempts = []
+
+        def fetch():
+            attempts.append(1)
+            if len(attempts) == 1:
+                # first attempt is stuck
+                release.wait(5)
+                return 'slow'
+            return 'fast'
+
+        self.assertEqual(hedger.call('tickers', fetch), 'fast')
+        release.set()
+        self.assertEqual(len(attempts), 2)
+        self.assertDictEqual(hedger.metrics()['tickers'],
+                             {'calls': 4, 'hedged': 1, 'hedge_won': 1})
+
+    def test_budget_limits_hedges(self):
+        hedger = Hedger(percentile=50, budget=0., min_samples=3, workers=4)
+        self.warm_up(hedger, 'tickers')
+        attempts = []
+
+        def fetch():
+            attempts.append(1)
+            time.sleep(0.1)
+            return 'slow'
+
+        self.assertEqual(hedger.call('tickers', fetch), 'slow')
+        self.assertEqual(len(attempts), 1)
+        self.assertEqual(hedger.metrics()['tickers']['hedged'], 0)
+
+    def test_failed_hedge_waits_for_primary(self):
+        hedger = Hedger(percentile=50, budget=1., min_samples=3, workers=4)
+        self.warm_up(hedger, 'account')
+        release = threading.Event()
+        attempts = []
+
+        def fetch():
+            attempts.append(1)
+            if len(attempts) == 1:
+                release.wait(0.2)
+                return 'primary'
+            raise ConnectionError
+
+        self.assertEqual(hedger.call('account', fetch), 'primary')
+        self.assertEqual(len(attempts), 2)
+
+    def test_unhedged_request_runs_inline(self):
+        hedger = Hedger(percentile=50, budget=0., min_samples=3, workers=2)
+        threads = []
+
+        def fetch():
+            threads.append(threading.current_thread())
+
+        # latencies aren't known yet, then there is no budget for hedge
+        for _ in range(4):
+            hedger.call('tickers', fetch)
+        self.assertEqual(threads, [threading.current_thread()] * 4)
+        self.assertEqual(len(hedger._latencies['tickers']), 4)
+
+    def test_busy_workers_dont_limit_concurrency(self):
+        hedger = Hedger(percentile=50, budget=1., min_samples=3, workers=1)
+        self.warm_up(hedger, 'tickers')
+        release = threading.Event()
+        started = threading.Event()
+
+        def stuck():
+            started.set()
+            release.wait(5)
+
+        caller = threading.Thread(target=hedger.call, args=('tickers', stuck))
+        caller.start()
+        started.wait(5)
+        try:
+            # only worker is busy, request runs in caller thread
+            self.assertIs(hedger.call('tickers', threading.current_thread),
+                          threading.current_thread())
+        finally:
+            release.set()
+            caller.join()
@@ -0,0 +1,96 @@
+import unittest
+from collections import Counter
+from decimal import Decimal
+from exchange.exchange import Exchange
+from exchange.memo import MemoizedExchange
+from internals.orderbook import OrderBook
+
+
+class CountingExchange(Exchange):
+    def __init__(self):
+        self.calls = Counter()
+
+    def get_resources(self):
+        self.calls['get_resources'] += 1
+        return {'BTC': Decimal('1')}
+
+    def get_orderbooks(self, products=None, depth=1):
+        self.calls['get_orderbooks'] += 1
+        orderbooks = [OrderBook('ETH_BTC', Decimal('0.1')),
+                      OrderBook('BTC_USDT', Decimal('10000'))]
+        if products is None:
+            return orderbooks
+        return [orderbook for orderbook in orderbooks
+                if orderbook.product in products]
+
+    def get_taker_fee(self, product):
+        self.calls['get_taker_fee'] += 1
+        return Decimal('0.001')
+
+    def place_market_order(self, order, price_estimates):
+        self.calls['place_market_order'] += 1
+        return {}
+
+    def get_order(self, params):
+        self.calls['get_order'] += 1
+        return {}
+
+
+class MemoizedExchangeTester(unittest.TestCase):
+    def test_memo(self):
+        exchange = CountingExchange()
+        memo = MemoizedExchange(exchange)
+
+        resources = memo.get_resources()
+        resources['BTC'] = Decimal('0')
+        self.assertEqual(memo.get_resources(), {'BTC': Decimal('1')})
+        self.assertEqual(exchange.calls['get_resources'], 1)
+
+        memo.get_taker_fee('ETH_BTC')
+        memo.get_taker_fee('ETH_BTC')
+        self.assertEqual(exchange.calls['get_taker_fee'], 1)
+
+        self.assertEqual(len(memo.get_orderbooks()), 2)
+        # served from snapshot of all books
+        orderbooks = memo.get_orderbooks(['BTC_USDT'])
+        self.assertEqual([orderbook.product for orderbook in orderbooks],
+                         ['BTC_USDT'])
+        self.assertEqual(exchange.calls['get_orderbooks'], 1)
+        memo.get_orderbooks(['LTC_BTC'])
+        memo.get_orderbooks(['LTC_BTC'])
+        self.assertEqual(exchange.calls['get_orderbooks'], 2)
+
+        # reads, which aren't memoized, go to exchange
+        memo.get_order({})
+        memo.get_order({})
+        self.assertEqual(exchange.calls['get_order'], 2)
+
+        # write clears memo
+        memo.place_market_order(None, {})
+        memo.get_resources()
+        memo.get_orderbooks(['BTC_USDT'])
+        self.assertEqual(exchange.calls['get_resources'], 2)
+        self.assertEqual(exchange.calls['get_orderbooks'], 3)
+
+        memo.max_age = 0
+        memo.get_resources()
+        self.assertEqual(exchange.calls['get_resources'], 3)
+
+        # ledger of wrapped exchange is used
+        memo.open_ledger()
+        self.assertIsNotNone(exchange.ledger)
+
+    def test_read_during_write_is_dropped(self):
+        exchange = CountingExchange()
+        memo = MemoizedExchange(exchange)
+
+        def place_market_order(order, price_estimates):
+            # read of another thread while order is in flight
+            memo.get_resources()
+            return {}
+
+        exchange.place_market_order = place_market_order
+        memo.place_market_order(None, {})
+        self.assertEqual(exchange.calls['get_resources'], 1)
+        memo.get_resources()
+        self.assertEqual(exchange.calls['get_resources'], 2)
@@ -0,0 +1,72 @@
+import threading
+import unittest
+import requests
+from exchange.exchange import Exchange
+from exchange.pool import ExchangePool, ThreadLocalSession
+
+
+class FakeClient:
+    def __init__(self):
+        self.session = requests.Session()
+        self.session.headers.update({'X-MBX-APIKEY': 'key'})
+
+
+class FakeExchange:
+    created = 0
+
+    def __init__(self, api_key, api_secret):
+        FakeExchange.created += 1
+        self.client = FakeClient()
+
+
+class LedgerExchange(Exchange):
+    def __init__(self, api_key, api_secret):
+        self.client = FakeClient()
+
+
+class ExchangePoolTester(unittest.TestCase):
+    def test_pool(self):
+        FakeExchange.created = 0
+        pool = ExchangePool(maxsize=2)
+        exchange = pool.get(FakeExchange, 'key', 'secret')
+        self.assertIs(pool.get(FakeExchange, 'key', 'secret').client,
+                      exchange.client)
+        self.assertIsInstance(exchange.client.session, ThreadLocalSession)
+        # raw credentials aren't used as keys
+        for key in pool.exchanges._entries:
+            self.assertNotIn('secret', key)
+
+        self.assertIsNot(pool.get(FakeExchange, 'key', 'other').client,
+                         exchange.client)
+        pool.get(FakeExchange, 'key2', 'secret')
+        self.assertEqual(len(pool.exchanges), 2)
+        pool.get(FakeExchange, 'key', 'secret')
+        self.assertEqual(FakeExchange.created, 4)
+
+        pool.discard(FakeExchange, 'key', 'secret')
+        pool.get(FakeExchange, 'key', 'secret')
+        self.assertEqual(FakeExchange.created, 5)
+
+    def test_ledger_is_per_operation(self):
+        pool = ExchangePool(maxsize=2)
+        first = pool.get(LedgerExchange, 'key', 'secret')
+        second = pool.get(LedgerExchange, 'key', 'secret')
+        ledger = first.open_ledger({'BTC': 1})
+        self.assertIsNone(second.ledger)
+        second.open_ledger({'ETH': 1})
+        second.close_ledger()
+        self.assertIs(first.ledger, ledger)
+
+    def test_thread_local_session(self):
+        session = ThreadLocalSession(FakeClient().session)
+        sessions = []
+        thread = threading.Thread(
+            target=lambda: sessions.append(session._session()))
+        thread.start()
+        thread.join()
+        sessions.append(session._session())
+        self.assertIsNot(sessions[0], sessions[1])
+        self.assertEqual(session.headers['X-MBX-APIKEY'], 'key')
+        # connection pools are shared
+        self.assertIs(sessions[0].get_adapter('https://api.binance.com'),
+                      sessions[1].get_adapter('https://api.binance.com'))
@@ -0,0 +1,130 @@
+import os
+import time
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+from exchange import shared_books
+from exchange.shared_books import SharedOrderBooks
+from internals.orderbook import OrderBook
+
+
+@unittest.skipUnless(shared_books.is_available(), 'needs python 3.8')
+class SharedOrderBooksTester(unittest.TestCase):
+    def test_shared_books(self):
+        name = 'test_orderbooks_{}'.format(os.getpid())
+        books = SharedOrderBooks.create(name, ['ETH_BTC', 'BTC_USDT',
+                                               'LTC_BTC'])
+        reader = SharedOrderBooks.attach(name)
+        try:
+            self.assertEqual(reader.products,
+                             ['BTC_USDT', 'ETH_BTC', 'LTC_BTC'])
+            self.assertIsNone(reader.get_orderbooks())
+
+            books.write([OrderBook('BTC_USDT', {'bid': Decimal('9999.01'),
+                                                'ask': Decimal('10001')}),
+                         OrderBook('ETH_BTC', Decimal('0.03125')),
+                         OrderBook('EOS_BTC', Decimal('0.001'))])
+            orderbooks = reader.get_orderbooks(['ETH_BTC', 'BTC_USDT'])
+            self.assertEqual([orderbook.product for orderbook in orderbooks],
+                             ['ETH_BTC', 'BTC_USDT'])
+            self.assertEqual(orderbooks[1].get_wall_bid(), Decimal('9999.01'))
+            self.assertEqual(orderbooks[1].get_wall_ask(), Decimal('10001.0'))
+            self.assertEqual(len(reader.get_orderbooks()), 2)
+            # never written or unknown products
+            self.assertIsNone(reader.get_orderbooks(['LTC_BTC']))
+            self.assertIsNone(reader.get_orderbooks(['EOS_BTC']))
+
+            books.write([OrderBook('ETH_BTC', Decimal('0.03'))],
+                        timestamp=time.time() - 10)
+            self.assertIsNone(reader.get_orderbooks(['ETH_BTC']))
+            self.assertIsNotNone(reader.get_orderbooks(['BTC_USDT']))
+        finally:
+            reader.close()
+            books.close()
+
+    def test_existing_table_is_kept(self):
+        name = 'test_orderbooks_{}'.format(os.getpid())
+        books = SharedOrderBooks.create(name, ['BTC_USDT'])
+        try:
+            books.write([OrderBook('BTC_USDT', Decimal('10000'))])
+            with self.assertRaises(FileExistsError):
+                SharedOrderBooks.create(name, ['BTC_USDT'])
+            reader = SharedOrderBooks.attach(name)
+            self.assertEqual(len(reader.get_orderbooks()), 1)
+            reader.close()
+        finally:
+            books.close()
+
+
+class UpdaterBinance:
+    # constructions in this process, updater appends to its copy
+    created = []
+    failing = False
+
+    def __init__(self):
+        UpdaterBinance.created.append(self)
+        if self.failing:
+            raise ConnectionError('binance is down')
+
+    def listed_products(self):
+        return ['BTC_USDT', 'ETH_BTC']
+
+    def get_orderbooks(self):
+        return [OrderBook('BTC_USDT', Decimal('10000'))]
+
+
+@unittest.skipUnless(shared_books.is_available(), 'needs python 3.8')
+class UpdaterTester(unittest.TestCase):
+    def setUp(self):
+        UpdaterBinance.created = []
+        UpdaterBinance.failing = False
+        patcher = patch('exchange.binance.Binance', UpdaterBinance)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, shared_books, 'READER', None)
+        self.addCleanup(shared_books.stop_updater)
+
+    def test_updater(self):
+        shared_books.start_updater('test_orderbooks', interval=0.01)
+        # client is built by updater, parent stays without its threads
+        self.assertEqual(UpdaterBinance.created, [])
+        shared_books.attach_reader()
+        reader = shared_books.READER
+        self.assertEqual(reader.products, ['BTC_USDT', 'ETH_BTC'])
+        deadline = time.time() + 5
+        while (reader.get_orderbooks(['BTC_USDT']) is None and
+               time.time() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(reader.get_orderbooks(['BTC_USDT'])[0].get_wall_ask(),
+                         Decimal('10000'))
+        reader.close()
+
+    def test_failed_product_list(self):
+        UpdaterBinance.failing = True
+        with self.assertRaises(ConnectionError):
+            shared_books.start_updater('test_orderbooks', interval=0.01)
+        self.assertIsNone(shared_books._UPDATER)
+        self.assertIsNone(shared_books._NAME)
+
+
+class DisabledSharedOrderBooksTester(unittest.TestCase):
+    """
+    python older than 3.8 doesn't have shared memory
+    """
+
+    def setUp(self):
+        patcher = patch.object(shared_books, 'shared_memory', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_updater_isnt_started(self):
+        self.assertFalse(shared_books.is_available())
+        with self.assertRaises(RuntimeError):
+            shared_books.start_updater()
+        self.assertIsNone(shared_books._UPDATER)
+        # nothing to stop
+        shared_books.stop_updater()
+
+    def test_reader_isnt_attached(self):
+        shared_books.attach_reader('test_orderbooks')
+        self.assertIsNone(shared_books.READER)
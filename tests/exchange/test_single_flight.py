@@ -0,0 +1,56 @@
+import time
+import threading
+import unittest
+from exchange.single_flight import SingleFlight
+
+
+class SingleFlightTester(unittest.TestCase):
+    def test_concurrent_calls_are_coalesced(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        fetches = []
+
+        def fetch():
+            fetches.append(1)
+            started.set()
+            release.wait(5)
+            return ['book']
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(flight.do(('tickers',), fetch)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(
+            target=lambda: results.append(flight.do(('tickers',), fetch)))
+            for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        # followers are waiting, when metrics count them
+        while flight.metrics()['tickers']['calls'] < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(len(fetches), 1)
+        self.assertEqual(results, [['book']] * 4)
+        self.assertDictEqual(flight.metrics(),
+                             {'tickers': {'calls': 4, 'deduplicated': 3}})
+
+        # finished call isn't cached
+        flight.do(('tickers',), fetch)
+        self.assertEqual(len(fetches), 2)
+
+    def test_error_is_raised_and_not_kept(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError('down')
+
+        with self.assertRaises(ValueError):
+            flight.do(('products',), fail)
+        self.assertEqual(flight.do(('products',), lambda: 1), 1)
+        flight.reset_metrics()
+        self.assertDictEqual(flight.metrics(), {})
@@ -0,0 +1,40 @@
+import time
+import unittest
+from decimal import Decimal
+from exchange.snapshot import MarketSnapshot
+from internals.orderbook import OrderBook
+
+
+class DictClient:
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def get(self, key):
+        return self.values.get(key)
+
+
+class MarketSnapshotTester(unittest.TestCase):
+    def test_snapshot(self):
+        snapshot = MarketSnapshot(DictClient(), max_age=5)
+        self.assertIsNone(snapshot.get_orderbooks('binance'))
+
+        snapshot.write('binance', [
+            OrderBook('BTC_USDT', {'bid': Decimal('9999'),
+                                   'ask': Decimal('10001')}),
+            OrderBook('ETH_BTC', Decimal('0.1'))])
+        orderbooks = snapshot.get_orderbooks('Binance', ['BTC_USDT'])
+        self.assertEqual(len(orderbooks), 1)
+        self.assertEqual(orderbooks[0].get_wall_bid(), Decimal('9999'))
+        self.assertEqual(orderbooks[0].get_mid_market_price(),
+                         Decimal('10000'))
+        self.assertEqual(len(snapshot.get_orderbooks('binance')), 2)
+        # missing products are fetched directly
+        self.assertIsNone(snapshot.get_orderbooks('binance', ['LTC_BTC']))
+        self.assertIsNone(snapshot.get_orderbooks('coinbasepro'))
+
+        snapshot.write('binance', [OrderBook('ETH_BTC', Decimal('0.1'))],
+                       timestamp=time.time() - 10)
+        self.assertIsNone(snapshot.get_orderbooks('binance'))
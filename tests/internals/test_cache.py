@@ -0,0 +1,32 @@
+import time
+import unittest
+from internals.cache import LRUCache
+
+
+class LRUCacheTester(unittest.TestCase):
+    def test_lru(self):
+        evicted = []
+        cache = LRUCache(2, on_evict=lambda key, value: evicted.append(key))
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        # 'b' is least recently used
+        self.assertEqual(evicted, ['b'])
+        self.assertNotIn('b', cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.pop('a'), 1)
+        self.assertIsNone(cache.get('a'))
+
+    def test_idle_timeout(self):
+        cache = LRUCache(10, idle_timeout=0.05)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        time.sleep(0.03)
+        cache.get('a')
+        time.sleep(0.03)
+        cache.evict_idle()
+        self.assertIn('a', cache)
+        self.assertEqual(len(cache), 1)
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('a'))
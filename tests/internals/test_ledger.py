@@ -0,0 +1,60 @@
+import unittest
+from decimal import Decimal
+from internals.ledger import BalanceLedger
+from internals.order import Order
+from internals.enums import OrderType, OrderAction
+
+
+class BalanceLedgerTester(unittest.TestCase):
+    def test_apply_market_order_response(self):
+        ledger = BalanceLedger({'BTC': Decimal('1'), 'USDT': Decimal('100')})
+        ledger.apply_market_order_response({
+            'product': 'BTC_USDT',
+            'side': 'SELL',
+            'executed_quantity': Decimal('0.5'),
+            'mean_price': Decimal('10000'),
+            'commission_USDT': Decimal('5'),
+            'commission_BNB': Decimal('0.1')
+        })
+        balances = ledger.get_balances()
+        self.assertEqual(balances['BTC'], Decimal('0.5'))
+        self.assertEqual(balances['USDT'], Decimal('5095'))
+        self.assertEqual(balances['BNB'], Decimal('-0.1'))
+        self.assertFalse(ledger.drifted)
+
+        ledger.apply_market_order_response({
+            'product': 'ETH_BTC',
+            'side': 'buy',
+            'executed_quantity': Decimal('2'),
+            'mean_price': Decimal('0.1'),
+        })
+        balances = ledger.get_balances()
+        self.assertEqual(balances['ETH'], Decimal('2'))
+        self.assertEqual(balances['BTC'], Decimal('0.3'))
+
+        # unfilled order
+        ledger.apply_market_order_response({
+            'product': 'ETH_BTC',
+            'side': 'buy',
+            'executed_quantity': Decimal('0'),
+            'mean_price': None,
+        })
+        self.assertEqual(ledger.get_balances()['BTC'], Decimal('0.3'))
+        self.assertFalse(ledger.drifted)
+
+        ledger.apply_market_order_response({'product': 'ETH_BTC'})
+        self.assertTrue(ledger.drifted)
+
+        ledger.reset({'BTC': Decimal('1')})
+        self.assertFalse(ledger.drifted)
+        self.assertEqual(ledger.get_balances()['ETH'], Decimal('0'))
+
+    def test_reserve(self):
+        ledger = BalanceLedger({'BTC': Decimal('1'), 'USDT': Decimal('100')})
+        ledger.reserve(Order('BTC_USDT', OrderType.LIMIT, OrderAction.SELL,
+                             Decimal('0.25'), Decimal('10000')))
+        ledger.reserve(Order('BTC_USDT', OrderType.LIMIT, OrderAction.BUY,
+                             Decimal('0.001'), Decimal('10000')))
+        balances = ledger.get_balances()
+        self.assertEqual(balances['BTC'], Decimal('0.75'))
+        self.assertEqual(balances['USDT'], Decimal('90'))
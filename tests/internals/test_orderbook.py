@@ -1,5 +1,7 @@
 import unittest
-from internals.orderbook import OrderBook
+from decimal import Decimal
+from internals.orderbook import OrderBook, L2OrderBook
+from internals.enums import OrderAction
 
 
 class OrderBookTester(unittest.TestCase):
@@ -27,3 +29,36 @@ class OrderBookTester(unittest.TestCase):
         self.assertEqual(orderbook.get_wall_ask(), 10)
         self.assertEqual(orderbook.get_wall_bid(), 10)
         self.assertEqual(orderbook.get_mid_market_price(), 10)
+
+    def test_l2_order_book(self):
+        orderbook = L2OrderBook(
+            'BTC_USDT',
+            bids=[['99', '1'], ['98', '2'], ['97', '3']],
+            asks=[['101', '1', 5], ['102', '2', 1], ['103', '3', 2]])
+
+        self.assertEqual(orderbook.get_wall_bid(), Decimal('99'))
+        self.assertEqual(orderbook.get_wall_ask(), Decimal('101'))
+        self.assertEqual(orderbook.get_mid_market_price(), Decimal('100'))
+
+        prices, quantities, notionals = orderbook.cumulative_depth(
+            OrderAction.BUY)
+        self.assertEqual(list(prices), [101, 102, 103])
+        self.assertEqual(list(quantities), [1, 3, 6])
+        self.assertEqual(list(notionals), [101, 305, 614])
+
+        self.assertAlmostEqual(orderbook.vwap(OrderAction.BUY, 0.5), 101)
+        self.assertAlmostEqual(orderbook.vwap(OrderAction.BUY, 2),
+                               (101 + 102) / 2)
+        self.assertAlmostEqual(orderbook.vwap(OrderAction.SELL, 3),
+                               (99 + 98 * 2) / 3)
+        self.assertAlmostEqual(orderbook.vwap(OrderAction.SELL, 4),
+                               (99 + 98 * 2 + 97) / 4)
+        self.assertIsNone(orderbook.vwap(OrderAction.SELL, 7))
+
+        self.assertAlmostEqual(orderbook.slippage(OrderAction.BUY, 101),
+                               0.01)
+        self.assertAlmostEqual(orderbook.slippage(OrderAction.BUY, 305),
+                               305 / 3 / 100 - 1)
+        self.assertAlmostEqual(orderbook.slippage(OrderAction.SELL, 0),
+                               0.01)
+        self.assertIsNone(orderbook.slippage(OrderAction.BUY, 1000))
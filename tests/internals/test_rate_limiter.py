@@ -0,0 +1,136 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from internals.rate_limiter import TokenBucket, WeightGovernor
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def lua_redis():
+    """
+    :return: redis client, which runs lua scripts, None if it's missing
+    """
+    if fakeredis is None:
+        return None
+    client = fakeredis.FakeStrictRedis()
+    try:
+        client.eval('return 1', 0)
+    except Exception:  # fakeredis without lupa
+        return None
+    return client
+
+
+class TokenBucketTester(unittest.TestCase):
+    def test_burst(self):
+        bucket = TokenBucket(rate=10, capacity=5)
+        waits = [bucket.acquire() for _ in range(5)]
+        self.assertEqual(waits, [0.] * 5)
+
+    def test_rate(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            list(executor.map(lambda _: bucket.acquire(), range(11)))
+        elapsed = time.monotonic() - start
+        # first token is available immediately, others come each 20ms
+        self.assertGreaterEqual(elapsed, 0.19)
+        self.assertLess(elapsed, 0.5)
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FailingRedis:
+    def register_script(self, script):
+        def run(keys, args):
+            raise ConnectionError('redis is down')
+        return run
+
+    def set(self, *args, **kwargs):
+        raise ConnectionError('redis is down')
+
+
+@unittest.skipIf(lua_redis() is None, 'needs fakeredis[lua]')
+class WeightGovernorTester(unittest.TestCase):
+    def setUp(self):
+        # 10s into window of 60s
+        self.clock = FakeClock(6010.)
+        patcher = patch('internals.rate_limiter.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = lua_redis()
+        self.governor = WeightGovernor(self.client, 'binance', limit=10)
+
+    def used(self, window=100):
+        return int(self.client.get('weight:binance:{}'.format(window)))
+
+    def test_weight_accumulates_within_window(self):
+        self.assertEqual(self.governor.acquire(4), 0.)
+        self.clock.now += 5
+        self.assertEqual(self.governor.acquire(6), 0.)
+        self.assertEqual(self.used(), 10)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertGreater(self.client.pttl('weight:binance:100'), 0)
+
+    def test_window_rollover(self):
+        self.governor.acquire(8)
+        self.clock.now += 10
+        # full window waits for the next one
+        self.assertEqual(self.governor.acquire(5), 40.)
+        self.assertEqual(self.clock.now, 6060.)
+        self.assertEqual(self.used(), 8)
+        self.assertEqual(self.used(101), 5)
+
+    def test_heavy_request_in_empty_window(self):
+        # request heavier than limit isn't held back forever
+        self.assertEqual(self.governor.acquire(20), 0.)
+
+    def test_sync_from_used_weight(self):
+        self.governor.acquire(2)
+        self.governor.sync(9)
+        self.assertEqual(self.used(), 9)
+        # smaller weight reported by server doesn't lower the count
+        self.governor.sync(3)
+        self.assertEqual(self.used(), 9)
+        self.assertEqual(self.governor.acquire(2), 50.)
+
+
+
+@unittest.skipIf(lua_redis() is None, 'needs fakeredis[lua]')
+class WeightGovernorBlockTester(unittest.TestCase):
+    # block expires in redis time, so clock isn't faked
+    def test_block(self):
+        client = lua_redis()
+        governor = WeightGovernor(client, 'binance', limit=10, window=3600)
+        governor.block(0.2)
+        self.assertTrue(client.exists('weight:binance:blocked'))
+        waited = governor.acquire(1)
+        self.assertGreater(waited, 0.1)
+        self.assertLess(waited, 0.5)
+        # block expires on its own
+        self.assertEqual(governor.acquire(1), 0.)
+
+
+class WeightGovernorFailureTester(unittest.TestCase):
+    def test_redis_failure_doesnt_hold_back(self):
+        clock = FakeClock(6010.)
+        governor = WeightGovernor(FailingRedis(), 'binance', limit=10)
+        with patch('internals.rate_limiter.time', clock):
+            self.assertEqual(governor.acquire(100), 0.)
+            governor.sync(5)
+            governor.block(30)
+        self.assertEqual(clock.sleeps, [])
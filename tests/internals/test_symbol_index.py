@@ -0,0 +1,29 @@
+import unittest
+from internals.symbol_index import SymbolIndex, get_symbol_index
+
+
+class SymbolIndexTester(unittest.TestCase):
+    def test_symbol_index(self):
+        filters = {
+            'BTCUSDT': {'commodity': 'BTC', 'base': 'USDT'},
+            'ETHBTC': {'commodity': 'ETH', 'base': 'BTC'},
+            'BTCTRY': {'commodity': 'BTC', 'base': 'TRY'},
+            'USDCUSDT': {'commodity': 'USDC', 'base': 'USDT'},
+        }
+        index = SymbolIndex.from_filters(filters)
+
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.to_product('BTCUSDT'), 'BTC_USDT')
+        self.assertEqual(index.to_product('BTCTRY'), 'BTC_TRY')
+        self.assertEqual(index.to_product('USDCUSDT'), 'USDC_USDT')
+        self.assertIsNone(index.to_product('LTCBTC'))
+        self.assertEqual(index.to_symbol('ETH_BTC'), 'ETHBTC')
+        self.assertIsNone(index.to_symbol('BTC_ETH'))
+        self.assertEqual(set(index.products()),
+                         {'BTC_USDT', 'ETH_BTC', 'BTC_TRY', 'USDC_USDT'})
+
+    def test_get_symbol_index(self):
+        filters = {'BTCUSDT': {'commodity': 'BTC', 'base': 'USDT'}}
+        index = get_symbol_index(filters)
+        self.assertIs(get_symbol_index(filters), index)
+        self.assertIsNot(get_symbol_index(dict(filters)), index)
@@ -0,0 +1,73 @@
+import random
+import unittest
+from decimal import Decimal
+from rebalancer.flow import get_solver, FlowUnfeasible
+from rebalancer.utils import rebalance_orders, create_flow_network
+
+
+def flow_cost(flow_dict, edges):
+    return sum(flow_dict[u][v] * weight for u, v, _, weight in edges)
+
+
+class FlowTester(unittest.TestCase):
+    def test_rebalance_orders(self):
+        initial_weights = {'BTC': Decimal('0.2'),
+                           'ETH': Decimal('0.3'),
+                           'USDT': Decimal('0.5')}
+        final_weights = {'BTC': Decimal('0.5'),
+                         'ETH': Decimal('0.2'),
+                         'USDT': Decimal('0.3')}
+        for fees in ({'BTC_USDT': 1 - Decimal('0.002'),
+                      'BTC_ETH': 1 - Decimal('0.0018'),
+                      'ETH_USDT': 1 - Decimal('0.0019')},
+                     {'BTC_USDT': 1 - Decimal('0.002'),
+                      'BTC_ETH': 1 - Decimal('0.0008'),
+                      'ETH_USDT': 1 - Decimal('0.0009')},
+                     {'BTC_USDT': 1 - Decimal('0.001'),
+                      'BTC_ETH': 1 - Decimal('0.001'),
+                      'ETH_USDT': 1 - Decimal('0.001')}):
+            self.assertEqual(
+                rebalance_orders(initial_weights, final_weights, fees,
+                                 solver=get_solver('simplex')),
+                rebalance_orders(initial_weights, final_weights, fees,
+                                 solver=get_solver('networkx')))
+
+    def test_min_cost_flow(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            currencies = ['C{}'.format(i) for i in range(rng.randint(2, 30))]
+
+            def weights():
+                values = [Decimal(rng.randint(0, 100)) for _ in currencies]
+                total = sum(values) or 1
+                return {currency: value / total
+                        for currency, value in zip(currencies, values)}
+            fees = {}
+            for currency in currencies[1:]:
+                for hub in currencies[:3]:
+                    if hub != currency and (hub, currency) not in fees:
+                        fees[currency, hub] = 1 - Decimal(
+                            rng.randint(1, 20)) / 10000
+            demands, edges = create_flow_network(weights(), weights(), fees)
+            expected = get_solver('networkx').min_cost_flow(demands, edges)
+            result = get_solver('simplex').min_cost_flow(demands, edges)
+            self.assertEqual(flow_cost(result, edges),
+                             flow_cost(expected, edges))
+            for u, v, _, _ in edges:
+                self.assertGreaterEqual(result[u][v], 0)
+
+    def test_unfeasible(self):
+        # ADA can't be bought
+        demands, edges = create_flow_network(
+            {'BTC': Decimal('1')}, {'ADA': Decimal('1')},
+            {('BTC', 'USDT'): 1 - Decimal('0.001')})
+        for name in ('simplex', 'networkx'):
+            with self.assertRaises(FlowUnfeasible):
+                get_solver(name).min_cost_flow(demands, edges)
+
+    def test_unbounded(self):
+        # negative cycle with infinite capacity
+        edges = [('A', 'B', float('inf'), -1), ('B', 'A', float('inf'), -1)]
+        for name in ('simplex', 'networkx'):
+            with self.assertRaises(FlowUnfeasible):
+                get_solver(name).min_cost_flow({'A': 0, 'B': 0}, edges)
@@ -1,3 +1,4 @@
+import time
 import unittest
 from unittest.mock import patch
 from collections import defaultdict
@@ -10,6 +11,8 @@ from internals.orderbook import OrderBook
 from rebalancer.limit_order_rebalancer import limit_order_rebalance
 from rebalancer.limit_order_rebalancer import limit_order_rebalance_with_orders
 from rebalancer.limit_order_rebalancer import place_limit_or_market_order
+from rebalancer.limit_order_rebalancer import LimitOrderRebalanceState
+from rebalancer.limit_order_rebalancer import limit_order_rebalance_step
 
 
 class LimitOrderRebalancerTester(unittest.TestCase):
@@ -365,6 +368,120 @@ class LimitOrderRebalancerTester(unittest.TestCase):
             self.assertEqual(order._quantity, correct_order._quantity)
             self.assertEqual(order._price, correct_order._price)
 
+    def test_limit_order_rebalance_polling(self):
+        resources = {
+            'BTC': Decimal('1'),
+            'ETH': Decimal('10'),
+            'LTC': Decimal('100'),
+            'USDT': Decimal('10000')
+        }
+        products = {'BTC_USDT', 'ETH_BTC', 'LTC_USDT', 'LTC_ETH'}
+        orderbooks = [OrderBook('BTC_USDT', Decimal('10000')),
+                      OrderBook('ETH_BTC', Decimal('0.1')),
+                      OrderBook('LTC_USDT', Decimal('100')),
+                      OrderBook('LTC_ETH', Decimal('0.1'))]
+
+        def make_orders():
+            return [Order('BTC_USDT', OrderType.LIMIT, OrderAction.SELL,
+                          Decimal('1'), Decimal()),
+                    Order('LTC_USDT', OrderType.LIMIT, OrderAction.BUY,
+                          Decimal('200'), Decimal()),
+                    Order('LTC_ETH', OrderType.LIMIT, OrderAction.BUY,
+                          Decimal('100'), Decimal())]
+
+        # number of status checks, after which order of product is filled
+        exchange = PollingFakeExchange(
+            orderbooks=orderbooks,
+            polls_to_fill={'BTC_USDT': 1, 'LTC_USDT': 1, 'LTC_ETH': 3})
+        start = time.time()
+        rets = limit_order_rebalance_with_orders(
+            lambda *args: None, exchange, resources, products,
+            make_orders(), 0, 10, 'USDT', poll_interval=0.01)
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual([ret['product'] for ret in rets],
+                         ['BTC_USDT', 'LTC_USDT', 'LTC_ETH'])
+        for ret in rets:
+            self.assertEqual(ret['executed_quantity'], ret['orig_quantity'])
+        # LTC_USDT is placed, as soon as BTC_USDT is filled
+        self.assertEqual([order.product for order in exchange.placed],
+                         ['BTC_USDT', 'LTC_ETH', 'LTC_USDT'])
+        self.assertEqual(exchange.canceled, [])
+
+        # LTC_ETH is never filled, so it's canceled after time_delta
+        exchange = PollingFakeExchange(
+            orderbooks=orderbooks,
+            polls_to_fill={'BTC_USDT': 1, 'LTC_USDT': 1})
+        rets = limit_order_rebalance_with_orders(
+            lambda *args: None, exchange, resources, products,
+            make_orders(), 0, 0.1, 'USDT', poll_interval=0.01)
+        self.assertEqual(exchange.canceled, ['LTC_ETH'])
+        self.assertEqual(len(rets), 3)
+        self.assertEqual(rets[-1]['product'], 'LTC_ETH')
+        self.assertEqual(rets[-1]['executed_quantity'], Decimal('0'))
+
+    def test_limit_order_rebalance_step(self):
+        resources = {
+            'BTC': Decimal('1'),
+            'ETH': Decimal('10'),
+            'LTC': Decimal('100'),
+            'USDT': Decimal('10000')
+        }
+        products = ['BTC_USDT', 'ETH_BTC', 'LTC_USDT', 'LTC_ETH']
+        orderbooks = [OrderBook('BTC_USDT', Decimal('10000')),
+                      OrderBook('ETH_BTC', Decimal('0.1')),
+                      OrderBook('LTC_USDT', Decimal('100')),
+                      OrderBook('LTC_ETH', Decimal('0.1'))]
+        orders = [Order('BTC_USDT', OrderType.LIMIT, OrderAction.SELL,
+                        Decimal('1'), Decimal()),
+                  Order('LTC_USDT', OrderType.LIMIT, OrderAction.BUY,
+                        Decimal('200'), Decimal()),
+                  Order('LTC_ETH', OrderType.LIMIT, OrderAction.BUY,
+                        Decimal('100'), Decimal())]
+        exchange = PollingFakeExchange(
+            orderbooks=orderbooks,
+            polls_to_fill={'BTC_USDT': 1, 'LTC_USDT': 1, 'LTC_ETH': 2})
+        state = LimitOrderRebalanceState(resources, products, orders,
+                                         0, 10, 0.5)
+        delays = []
+        while True:
+            # state is persisted and restored between steps
+            state = LimitOrderRebalanceState.from_dict(state.to_dict())
+            delay = limit_order_rebalance_step(exchange, state)
+            if delay is None:
+                break
+            delays.append(delay)
+        # steps don't sleep, they return time to wait
+        self.assertEqual(delays, [0.5, 0.5])
+        self.assertEqual([order.product for order in exchange.placed],
+                         ['BTC_USDT', 'LTC_ETH', 'LTC_USDT'])
+        self.assertEqual([ret['product'] for ret in state.rets],
+                         ['BTC_USDT', 'LTC_ETH', 'LTC_USDT'])
+        self.assertEqual(state.orders, [])
+        self.assertEqual(exchange.canceled, [])
+
+    def test_limit_order_rebalance_chained(self):
+        # USDT -> BTC -> ETH, ETH order can be made only with filled BTC
+        client = FillingClient({'USDT': Decimal('10000')}, {
+            'BTCUSDT': Decimal('10000'), 'ETHBTC': Decimal('0.1')})
+        exchange = FillingBinance(client)
+        orderbooks = [OrderBook('BTC_USDT', Decimal('10000')),
+                      OrderBook('ETH_BTC', Decimal('0.1'))]
+        exchange.get_orderbooks = lambda products, depth=1: orderbooks
+        orders = [Order('BTC_USDT', OrderType.LIMIT, OrderAction.BUY,
+                        Decimal('0.5'), Decimal()),
+                  Order('ETH_BTC', OrderType.LIMIT, OrderAction.BUY,
+                        Decimal('4'), Decimal())]
+        rets = limit_order_rebalance_with_orders(
+            lambda *args: None, exchange, exchange.get_resources(),
+            ['BTC_USDT', 'ETH_BTC'], orders, 3, 10, 'USDT',
+            poll_interval=0.01)
+        self.assertEqual([order['symbol'] for order in client.placed],
+                         ['BTCUSDT', 'ETHBTC'])
+        self.assertEqual([ret['symbol'] for ret in rets],
+                         ['BTCUSDT', 'ETHBTC'])
+        self.assertEqual(client.balances['ETH'], Decimal('4'))
+        self.assertEqual(client.balances['BTC'], Decimal('0.1'))
+
     def test_place_limit_or_market_order(self):
         exchange = FakeExchange2()
         base = 'BTC'
@@ -454,9 +571,12 @@ class FakeExchange(Binance):
     def through_trade_currencies(self):
         return self._through_trade_currencies
 
-    def get_orderbooks(self, products):
+    def get_orderbooks(self, products, depth=1):
         return self.orderbooks
 
+    def listed_products(self):
+        return {orderbook.product for orderbook in self.orderbooks}
+
     def get_maker_fee(self, product):
         return self.fees[product]
 
@@ -472,3 +592,88 @@ class FakeExchange2(object):
     def place_limit_order(self, order):
         self.orders.append([order])
         return 'limit'
+
+
+class PollingFakeExchange(Binance):
+    def __init__(self, orderbooks, polls_to_fill):
+        self.orderbooks = orderbooks
+        self.polls_to_fill = polls_to_fill
+        self.placed = []
+        self.canceled = []
+        self.polls = defaultdict(int)
+
+    def get_orderbooks(self, products, depth=1):
+        return self.orderbooks
+
+    def place_limit_order(self, order):
+        self.placed.append(copy(order))
+        return {'order_id': len(self.placed) - 1}
+
+    def cancel_limit_order(self, order_response):
+        self.canceled.append(self.placed[order_response['order_id']].product)
+
+    def get_order(self, order_response):
+        order = self.placed[order_response['order_id']]
+        self.polls[order_response['order_id']] += 1
+        filled = (self.polls[order_response['order_id']] >=
+                  self.polls_to_fill.get(order.product, float('inf')))
+        return {'product': order.product,
+                'orig_quantity': order._quantity,
+                'executed_quantity': order._quantity if filled else Decimal(0)}
+
+
+def filters(commodity, base):
+    return {'min_order_size': Decimal('0.001'),
+            'max_order_size': Decimal('10000'),
+            'order_step': Decimal('0.001'),
+            'min_notional': Decimal('0.001'),
+            'min_price': Decimal('1e-8'),
+            'max_price': Decimal('100000'),
+            'price_step': Decimal('1e-8'),
+            'base': base,
+            'commodity': commodity}
+
+
+class FillingClient:
+    """
+    binance client, which fills limit orders on first status check
+    """
+    ORDER_TYPE_LIMIT_MAKER = 'LIMIT_MAKER'
+
+    def __init__(self, balances, prices):
+        self.balances = defaultdict(Decimal, balances)
+        self.prices = prices
+        self.placed = []
+
+    def get_account(self):
+        return {'balances': [{'asset': asset, 'free': str(amount)}
+                             for asset, amount in self.balances.items()]}
+
+    def create_order(self, **params):
+        self.placed.append(dict(params, executedQty='0'))
+        return {'symbol': params['symbol'], 'orderId': len(self.placed),
+                'clientOrderId': str(len(self.placed))}
+
+    def get_order(self, symbol, orderId):
+        order = self.placed[orderId - 1]
+        if order['executedQty'] == '0':
+            commodity, base = symbol[:3], symbol[3:]
+            quantity = Decimal(order['quantity'])
+            value = quantity * Decimal(order['price'])
+            if order['side'] == 'BUY':
+                self.balances[commodity] += quantity
+                self.balances[base] -= value
+            else:
+                self.balances[commodity] -= quantity
+                self.balances[base] += value
+            order['executedQty'] = order['quantity']
+        return {'symbol': symbol, 'orderId': orderId,
+                'origQty': str(order['quantity']),
+                'executedQty': str(order['executedQty'])}
+
+
+class FillingBinance(Binance):
+    def __init__(self, client):
+        self.client = client
+        self.filters = {'BTCUSDT': filters('BTC', 'USDT'),
+                        'ETHBTC': filters('ETH', 'BTC')}
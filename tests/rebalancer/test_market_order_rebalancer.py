@@ -1,4 +1,5 @@
 import init_django  # noqa
+import time
 import uuid
 import pytz
 from datetime import datetime
@@ -7,12 +8,14 @@ from unittest.mock import patch
 from decimal import Decimal
 
 from internals.orderbook import OrderBook
+from internals.order import Order
 from exchange.binance import Binance
 from internals.enums import OrderType, OrderAction
-from webserver.models import User, Statistics
+from webserver.models import User, Statistics, StatisticsSummary
 from rebalancer.market_order_rebalancer import market_order_rebalance
 from rebalancer.market_order_rebalancer import create_order_statistics_objects
 from rebalancer.market_order_rebalancer import market_order_rebalance_and_save
+from rebalancer.market_order_rebalancer import place_market_orders
 
 
 class MarketOrderRebalancerTester(unittest.TestCase):
@@ -206,8 +209,10 @@ class MarketOrderRebalancerTester(unittest.TestCase):
                 'mid_market_price': Decimal('10000')
             }
         ]
-        statistics = create_order_statistics_objects(responses, user)
+        statistics = create_order_statistics_objects(responses, user, 'run')
         for statistic in statistics:
+            self.assertEqual(statistic.run_id, 'run')
+            self.assertIsNotNone(statistic.created_at)
             self.assertEqual(statistic.user, user)
             self.assertEqual(statistic.mid_market_price, 10000)
             self.assertEqual(statistic.average_exec_price, 9000)
@@ -245,8 +250,36 @@ class MarketOrderRebalancerTester(unittest.TestCase):
         self.assertEqual(statistics.pair, 'BTC_USDT')
         self.assertEqual(statistics.fee, 200)
         self.assertEqual(statistics.action, 'sell')
+        summary = StatisticsSummary.objects.get(user=user)
+        self.assertEqual(summary.pair, 'BTC_USDT')
+        self.assertEqual(summary.count, 1)
+        self.assertAlmostEqual(summary.slippage_sum, 0.1)
+        self.assertAlmostEqual(summary.slippage_sum_sq, 0.01)
         user.delete()
 
+    def test_place_market_orders(self):
+        class SlowExchange:
+            def place_market_order(self, order, price_estimates):
+                time.sleep(0.1)
+                return {'product': order.product}
+
+        orderbooks = {product: OrderBook(product, Decimal('1'))
+                      for product in ('BTC_USDT', 'ETH_USDT', 'ETH_BTC')}
+        waves = [[Order(product, OrderType.MARKET, OrderAction.SELL,
+                        Decimal('1'))
+                  for product in ('BTC_USDT', 'ETH_USDT')],
+                 [Order('ETH_BTC', OrderType.MARKET, OrderAction.BUY,
+                        Decimal('1'))]]
+        estimates = []
+        start = time.time()
+        responses = place_market_orders(SlowExchange(), waves, {},
+                                        orderbooks, estimates.append)
+        self.assertLess(time.time() - start, 0.3)
+        self.assertEqual([response['product'] for response in responses],
+                         ['BTC_USDT', 'ETH_USDT', 'ETH_BTC'])
+        self.assertEqual(responses[0]['mid_market_price'], Decimal('1'))
+        self.assertEqual(estimates, [20000, 10000, 0])
+
 
 def parse_order(order):
     product = order.product
@@ -269,7 +302,7 @@ class FakeExchange(Binance):
     def through_trade_currencies(self):
         return self._through_trade_currencies
 
-    def get_orderbooks(self, products):
+    def get_orderbooks(self, products, depth=1):
         return self.orderbooks
 
     def get_taker_fee(self, product):
@@ -0,0 +1,31 @@
+import unittest
+import numpy as np
+from decimal import Decimal
+from internals.orderbook import OrderBook
+from rebalancer.prices import PriceGraph
+
+
+class PriceGraphTester(unittest.TestCase):
+    def test_estimates(self):
+        orderbooks = [OrderBook('BTC_USDT', [Decimal('9999'),
+                                             Decimal('10001')]),
+                      OrderBook('ETH_BTC', Decimal('0.1')),
+                      OrderBook('USDT_EUR', Decimal('0.8'))]
+        graph = PriceGraph(orderbooks)
+
+        estimates = graph.estimates('USDT')
+        self.assertEqual(len(estimates), 4)
+        self.assertEqual(set(estimates), {'USDT', 'BTC', 'ETH', 'EUR'})
+        self.assertEqual(estimates['BTC'], Decimal('10000'))
+        self.assertEqual(estimates['ETH'], Decimal('1000'))
+        self.assertEqual(estimates['EUR'], 1 / Decimal('0.8'))
+        self.assertAlmostEqual(estimates.log10('ETH'), 3)
+        self.assertIsNone(estimates.get('LTC'))
+
+        estimates = graph.estimates('ETH')
+        self.assertEqual(estimates['USDT'], Decimal('0.001'))
+        self.assertEqual(estimates.to_dict()['ETH'], Decimal('1'))
+
+        estimates = graph.estimates('LTC')
+        self.assertEqual(len(estimates), 0)
+        self.assertTrue(np.isnan(estimates.log10('BTC')))
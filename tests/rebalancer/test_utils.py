@@ -6,7 +6,9 @@ from rebalancer.utils import get_price_estimates_from_orderbooks
 from rebalancer.utils import spread_to_fee, get_total_fee
 from rebalancer.utils import rebalance_orders
 from rebalancer.utils import get_portfolio_value_from_resources
-from internals.orderbook import OrderBook
+from rebalancer.utils import resolve_products, dependency_waves
+from exchange.exchange import Exchange
+from internals.orderbook import OrderBook, L2OrderBook
 from internals.order import Order
 from internals.enums import OrderType, OrderAction
 from decimal import Decimal
@@ -178,6 +180,22 @@ class UtilsTester(unittest.TestCase):
         self.assertLess(sorted_products.index('USDT_ETH'),
                         sorted_products.index('ETH_EOS'))
 
+    def test_dependency_waves(self):
+        # same graph as in test_topological_sort
+        orders = [('BTC', 'USDT', Decimal(1)),
+                  ('USDT', 'ETH', Decimal(2)),
+                  ('BTC', 'ADA', Decimal(3)),
+                  ('ADA', 'ETH', Decimal(4)),
+                  ('ETH', 'EOS', Decimal(5)),
+                  ('USDT', 'LTC', Decimal(6)),
+                  ('BNB', 'USDT', Decimal(7))]
+        waves = [sorted('_'.join(order[:2]) for order in wave)
+                 for wave in dependency_waves(topological_sort(orders))]
+        self.assertEqual(waves, [['BNB_USDT', 'BTC_ADA', 'BTC_USDT'],
+                                 ['ADA_ETH', 'USDT_ETH', 'USDT_LTC'],
+                                 ['ETH_EOS']])
+        self.assertEqual(dependency_waves([]), [])
+
     def test_dfs(self):
         graph = defaultdict(set, {
             'start': {'A', 'D'},
@@ -278,15 +296,33 @@ class UtilsTester(unittest.TestCase):
         price_estimates = get_price_estimates_from_orderbooks(
             orderbooks, 'USDT')
 
+        # currencies are priced over paths with fewest conversions,
+        # ETH and LTC trade against USDT directly
+        correct_price_estimates = {
+            'USDT': Decimal('1'),
+            'BNB': Decimal('10'),
+            'BTC': Decimal('10000'),
+            'ETH': Decimal('1000'),
+            'LTC': Decimal('100'),
+            'EOS': Decimal('100')
+        }
+        self.assertDictAlmostEqual(correct_price_estimates, price_estimates)
+
+        # several paths of the same length, the lowest estimate is used
+        price_estimates = get_price_estimates_from_orderbooks(
+            [orderbook_BTC_USDT, orderbook_BNB_USDT, orderbook_ETH_BTC,
+             OrderBook('ETH_BNB', Decimal('100')),
+             orderbook_EOS_ETH], 'USDT')
         correct_price_estimates = {
             'USDT': Decimal('1'),
             'BNB': Decimal('10'),
             'BTC': Decimal('10000'),
             'ETH': Decimal('10000') / Decimal('11'),
-            'LTC': Decimal('1000') / Decimal('11'),
             'EOS': Decimal('1000') / Decimal('11')
         }
         self.assertDictAlmostEqual(correct_price_estimates, price_estimates)
+        self.assertEqual(price_estimates['BTC'], Decimal('10000'))
+        self.assertNotIn('LTC', price_estimates)
 
     def test_spread_to_fee(self):
         fee = Decimal('0.001')
@@ -295,6 +331,20 @@ class UtilsTester(unittest.TestCase):
             [Decimal('1000') * (1 - fee), Decimal('1000') / (1 - fee)])
         self.assertEqual(spread_to_fee(orderbook), fee)
 
+    def test_spread_to_fee_of_l2_orderbook(self):
+        orderbook = L2OrderBook('BTC_USDT',
+                                bids=[['99', '1'], ['97', '1']],
+                                asks=[['101', '1'], ['103', '1']])
+        self.assertEqual(spread_to_fee(orderbook),
+                         1 - (Decimal('99') / Decimal('101')).sqrt())
+        self.assertAlmostEqual(spread_to_fee(orderbook, Decimal('1')),
+                               1 - (Decimal('99') / Decimal('101')).sqrt())
+        self.assertAlmostEqual(spread_to_fee(orderbook, Decimal('2')),
+                               1 - (Decimal('98') / Decimal('102')).sqrt())
+        # not enough depth, wall prices are used
+        self.assertEqual(spread_to_fee(orderbook, Decimal('3')),
+                         1 - (Decimal('99') / Decimal('101')).sqrt())
+
     def test_get_total_fee(self):
         fee = Decimal('0.001')
         spread_fee = Decimal('0.0015')
@@ -384,6 +434,26 @@ class UtilsTester(unittest.TestCase):
             parse_order(pre_order, products, price_estimates, 'USDT',
                         OrderType.MARKET, Decimal('1000'))
 
+    def test_resolve_products(self):
+        class FakeExchange(Exchange):
+            def __init__(self, listed_products):
+                self._listed_products = listed_products
+
+            def listed_products(self):
+                return self._listed_products
+
+        exchange = FakeExchange({'BTC_USDT', 'ETH_BTC', 'ETH_USDT',
+                                 'LTC_BTC', 'EOS_ETH'})
+        products = resolve_products(exchange, {'BTC', 'ETH', 'USDT', 'ADA'})
+        self.assertEqual(sorted(products),
+                         sorted(['BTC_USDT', 'ETH_BTC', 'ETH_USDT']))
+
+        exchange = FakeExchange(None)
+        products = resolve_products(exchange, {'BTC', 'ETH', 'USDT'})
+        self.assertEqual(sorted(products),
+                         sorted(['BTC_ETH', 'BTC_USDT', 'ETH_BTC',
+                                 'ETH_USDT', 'USDT_BTC', 'USDT_ETH']))
+
     def assertDictAlmostEqual(self, d1, d2, *args, **kwargs):
         self.assertEqual(set(d1.keys()), set(d2.keys()))
         for i in d1:
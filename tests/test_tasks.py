@@ -0,0 +1,180 @@
+import json
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+from celery.exceptions import Ignore
+
+import tasks
+from internals.order import Order
+from internals.enums import OrderAction, OrderType
+from rebalancer.limit_order_rebalancer import LimitOrderRebalanceState
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.published = []
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+
+class FakeLease:
+    def __init__(self, held=True):
+        self.held = held
+        self.released = []
+        self.refreshed = []
+
+    def refresh(self, api_key, task_id):
+        self.refreshed.append(task_id)
+        return self.held
+
+    def release(self, api_key, task_id):
+        self.released.append(task_id)
+        return True
+
+
+class FakeBackend:
+    def __init__(self):
+        self.results = {}
+
+    def store_result(self, task_id, result, state, *args, **kwargs):
+        self.results[task_id] = (state, result)
+
+
+class FakeExchange:
+    def __init__(self):
+        self.canceled = []
+
+    def cancel_limit_order(self, response):
+        self.canceled.append(response['order_id'])
+
+
+ROOT_ID = 'root'
+ARGS = ({'binance': {}}, 'api_key', {'BTC': '1'}, 0., ROOT_ID)
+
+
+def make_state():
+    order = Order('BTC_USDT', OrderType.LIMIT, OrderAction.SELL,
+                  Decimal('1'), Decimal('10000'))
+    state = LimitOrderRebalanceState({'BTC': Decimal('1')}, ['BTC_USDT'],
+                                     [order], 10, 30)
+    state.open_orders.append({'order': order, 'response': {'order_id': 7},
+                              'deadline': 0})
+    return state
+
+
+class LimitRebalanceTasksTester(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.lease = FakeLease()
+        self.backend = FakeBackend()
+        self.exchange = FakeExchange()
+
+        self.params = {'name': 'binance', 'type': 'limit'}
+
+        def with_exchange(rebalance):
+            return lambda this, request: rebalance(self.exchange,
+                                                   self.params)
+
+        for patcher in [
+                patch('tasks.redis_client', self.redis),
+                patch('tasks.REBALANCE_LEASE', self.lease),
+                patch('tasks.with_exchange', with_exchange)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for task in (tasks.rebalance_task, tasks.limit_rebalance_step_task):
+            self.addCleanup(setattr, task, 'backend', task.backend)
+            task.backend = self.backend
+
+    def run_step(self, step):
+        tasks.save_limit_rebalance_state(ROOT_ID, make_state())
+        with patch('tasks.limit_order_rebalance_step', step), \
+                patch('tasks.rebalance_result',
+                      lambda *args: {'api_key': 'api_key', 'status': 'ok'}), \
+                patch.object(tasks.limit_rebalance_step_task,
+                             'apply_async') as apply_async:
+            tasks.limit_rebalance_step_task(*ARGS)
+        return apply_async
+
+    def test_handoff(self):
+        state = make_state()
+        prepared = (state.resources, state.products, state.orders)
+        with patch('tasks.prepare_limit_order_rebalance',
+                   lambda *args: prepared), \
+                patch.object(tasks.limit_rebalance_step_task,
+                             'apply_async') as apply_async:
+            with self.assertRaises(Ignore):
+                tasks.rebalance_task({'binance': {}}, 'api_key',
+                                     {'BTC': '1'}, 0.)
+        task_id = apply_async.call_args[0][0][-1]
+        self.assertIsNotNone(tasks.load_limit_rebalance_state(task_id))
+        # lease is kept for steps
+        self.assertEqual(self.lease.released, [])
+
+    def test_market_rebalance_refreshes_lease(self):
+        def rebalance(exchange, weights, user, update, run_id):
+            for _ in range(3):
+                update(1000)
+            return []
+
+        self.params['type'] = 'market'
+        with patch.dict(tasks.REBALANCING_ALGORITHM, MARKET=rebalance), \
+                patch('tasks.User'), \
+                patch('tasks.rebalance_result', lambda *args: {}), \
+                patch.object(tasks.rebalance_task.request, 'id', ROOT_ID):
+            tasks.rebalance_task({'binance': {}}, 'api_key', {'BTC': '1'},
+                                 0.)
+        # first update is before algorithm is chosen
+        self.assertEqual(self.lease.refreshed, [ROOT_ID] * 4)
+        self.assertEqual(self.lease.released, [ROOT_ID])
+
+    def test_reschedule(self):
+        apply_async = self.run_step(lambda *args: 2.)
+        self.assertEqual(apply_async.call_args[1], {'countdown': 2.})
+        self.assertIsNotNone(tasks.load_limit_rebalance_state(ROOT_ID))
+        self.assertEqual(self.lease.released, [])
+        self.assertNotIn(ROOT_ID, self.backend.results)
+
+    def test_finish(self):
+        apply_async = self.run_step(lambda *args: None)
+        apply_async.assert_not_called()
+        self.assertEqual(self.backend.results[ROOT_ID],
+                         ('SUCCESS', {'api_key': 'api_key', 'status': 'ok'}))
+        self.assertIsNone(tasks.load_limit_rebalance_state(ROOT_ID))
+        self.assertEqual(self.lease.released, [ROOT_ID])
+
+    def test_reset_by_lease(self):
+        self.lease.held = False
+        self.run_step(lambda *args: self.fail('step after reset'))
+        self.assertEqual(self.exchange.canceled, [7])
+        state, result = self.backend.results[ROOT_ID]
+        self.assertEqual(result['status'], 'rebalance was reset')
+        self.assertIsNone(tasks.load_limit_rebalance_state(ROOT_ID))
+
+    def test_exception(self):
+        def step(*args):
+            raise ValueError('exchange is down')
+
+        with self.assertRaises(ValueError):
+            self.run_step(step)
+        self.assertEqual(self.exchange.canceled, [7])
+        state, result = self.backend.results[ROOT_ID]
+        # failure is plain result of its user, which json backend keeps
+        self.assertEqual(state, 'SUCCESS')
+        self.assertEqual(json.loads(json.dumps(result)), {
+            'api_key': 'api_key',
+            'status': 'unknown error while rebalancing',
+            'error': True})
+        self.assertIn('"SUCCESS"', self.redis.published[-1][1])
+        self.assertIsNone(tasks.load_limit_rebalance_state(ROOT_ID))
+        self.assertEqual(self.lease.released, [ROOT_ID])
@@ -0,0 +1,73 @@
+import init_django  # noqa
+import unittest
+from collections import Counter
+from django.core.cache import cache
+
+from webserver.auth_cache import ApiKeyCache
+from webserver.models import User
+
+
+class ApiKeyCacheTester(unittest.TestCase):
+    def test_get_user(self):
+        fetches = Counter()
+        users = {'key': User(pk=1, api_key='key')}
+
+        def fetch(api_key):
+            fetches[api_key] += 1
+            if api_key not in users:
+                raise User.DoesNotExist
+            return users[api_key]
+
+        api_key_cache = ApiKeyCache(maxsize=10, ttl=60, fetch=fetch)
+        self.assertEqual(api_key_cache.get_user('key').pk, 1)
+        self.assertEqual(api_key_cache.get_user('key').pk, 1)
+        self.assertEqual(fetches['key'], 1)
+        # api keys aren't used as keys
+        for key in api_key_cache.users._entries:
+            self.assertNotIn('key', key[len('api_key_user:'):])
+
+        # unknown keys aren't cached
+        for _ in range(2):
+            with self.assertRaises(User.DoesNotExist):
+                api_key_cache.get_user('other')
+        self.assertEqual(fetches['other'], 2)
+
+        api_key_cache.invalidate('key')
+        api_key_cache.get_user('key')
+        self.assertEqual(fetches['key'], 2)
+
+        api_key_cache.ttl = 0
+        api_key_cache.invalidate('key')
+        api_key_cache.get_user('key')
+        api_key_cache.get_user('key')
+        self.assertEqual(fetches['key'], 4)
+
+    def test_invalidation_reaches_other_processes(self):
+        cache.clear()
+        users = {'key': User(pk=1, api_key='key')}
+        fetches = Counter()
+
+        def fetch(api_key):
+            fetches[api_key] += 1
+            if api_key not in users:
+                raise User.DoesNotExist
+            return users[api_key]
+
+        # caches of two processes, which share django cache
+        first = ApiKeyCache(maxsize=10, ttl=60, shared=True, fetch=fetch)
+        second = ApiKeyCache(maxsize=10, ttl=60, shared=True, fetch=fetch)
+        self.assertEqual(first.get_user('key').pk, 1)
+        self.assertEqual(second.get_user('key').pk, 1)
+        self.assertEqual(second.get_user('key').pk, 1)
+        self.assertEqual(fetches['key'], 1)
+
+        # user is deleted in first process
+        del users['key']
+        first.invalidate('key')
+        with self.assertRaises(User.DoesNotExist):
+            second.get_user('key')
+
+        # api key is given to other user
+        users['key'] = User(pk=2, api_key='key')
+        self.assertEqual(second.get_user('key').pk, 2)
+        self.assertEqual(first.get_user('key').pk, 2)
@@ -0,0 +1,72 @@
+import unittest
+from webserver.lease import RebalanceLease
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def lua_redis():
+    """
+    :return: redis client, which runs lua scripts, None if it's missing
+    """
+    if fakeredis is None:
+        return None
+    client = fakeredis.FakeStrictRedis()
+    try:
+        client.eval('return 1', 0)
+    except Exception:  # fakeredis without lupa
+        return None
+    return client
+
+
+@unittest.skipIf(lua_redis() is None, 'needs fakeredis[lua]')
+class RebalanceLeaseTester(unittest.TestCase):
+    def setUp(self):
+        self.client = lua_redis()
+        self.lease = RebalanceLease(self.client, ttl=100)
+
+    def test_acquire_contention(self):
+        self.assertTrue(self.lease.acquire('user', 'first', 1.))
+        self.assertFalse(self.lease.acquire('user', 'second', 2.))
+        self.assertEqual(self.lease.get('user')['task_id'], 'first')
+        # leases of users are independent
+        self.assertTrue(self.lease.acquire('other', 'second', 2.))
+        self.assertEqual(self.client.ttl('rebalance_lease:user'), 100)
+
+    def test_release_and_refresh(self):
+        self.lease.acquire('user', 'first', 1.)
+        self.assertFalse(self.lease.release('user', 'second'))
+        self.assertFalse(self.lease.refresh('user', 'second'))
+        self.client.expire('rebalance_lease:user', 10)
+        self.assertTrue(self.lease.refresh('user', 'first'))
+        self.assertEqual(self.client.ttl('rebalance_lease:user'), 100)
+        self.assertEqual(self.lease.get('user')['start_time'], 1.)
+        self.assertTrue(self.lease.release('user', 'first'))
+        self.assertIsNone(self.lease.get('user'))
+        self.assertFalse(self.lease.refresh('user', 'first'))
+
+    def test_replace_wrong_holder(self):
+        self.lease.acquire('user', 'first', 1.)
+        self.assertFalse(self.lease.replace('user', 'second', 'third', 3.))
+        self.assertEqual(self.lease.get('user')['task_id'], 'first')
+        self.assertTrue(self.lease.replace('user', 'first', 'third', 3.))
+        self.assertEqual(self.lease.get('user')['task_id'], 'third')
+
+    def test_take(self):
+        self.assertEqual(self.lease.take('user', 'first', 0.), (True, None))
+        # rebalance in progress
+        self.assertEqual(self.lease.take('user', 'second', 0.),
+                         (False, None))
+        # force reset of rebalance, which runs shortly, isn't allowed
+        self.lease.release('user', 'first')
+        self.lease.take('user', 'first', 1e12)
+        self.assertEqual(self.lease.take('user', 'second', 0., True),
+                         (False, None))
+        # old rebalance is replaced
+        self.lease.release('user', 'first')
+        self.lease.take('user', 'first', 0.)
+        self.assertEqual(self.lease.take('user', 'second', 0., True),
+                         (True, 'first'))
+        self.assertEqual(self.lease.get('user')['task_id'], 'second')
@@ -1,10 +1,20 @@
 import init_django  # noqa
+import csv
+import json
+import uuid
 import unittest
+from datetime import datetime
 from decimal import Decimal
+from unittest.mock import patch
+import pytz
+from rest_framework.test import APIRequestFactory
 
 from exchange import Exchange
 from internals.orderbook import OrderBook
-from webserver.views import get_portfolio
+from webserver.models import User, Statistics
+from webserver.progress import events_token
+from webserver.views import get_portfolio, StatisticsExportView, \
+    ProcessingView, ProcessingEventsView, QUEUED_RETRY_AFTER
 
 
 class DummyExchange(Exchange):
@@ -41,3 +51,207 @@ class ViewsTester(unittest.TestCase):
                     "portion": Decimal("0.3333")
                 }]
         })
+
+
+class StatisticsExportViewTester(unittest.TestCase):
+    def setUp(self):
+        self.api_key = uuid.uuid4().hex
+        self.user = User.objects.create(
+            api_key=self.api_key, date_created=datetime.now(tz=pytz.utc))
+        for day, pair in [(1, 'BTC_USDT'), (2, 'ETH_BTC'), (3, 'BTC_USDT')]:
+            Statistics.objects.create(
+                user=self.user, mid_market_price=100,
+                average_exec_price=101, volume=10, pair=pair, fee=0.1,
+                action='buy', run_id='run',
+                created_at=datetime(2019, 1, day, 12, tzinfo=pytz.utc))
+
+    def tearDown(self):
+        self.user.delete()
+
+    def export(self, **data):
+        request = APIRequestFactory().post(
+            '/api/market_order_statistics/export/',
+            dict(data, api_key=self.api_key), format='json')
+        return StatisticsExportView.as_view()(request)
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(self.content(response).splitlines()))
+        self.assertEqual(rows[0], ['created_at', 'run_id', 'pair', 'action',
+                                   'volume', 'fee', 'mid_market_price',
+                                   'average_exec_price'])
+        self.assertEqual([row[2] for row in rows[1:]],
+                         ['BTC_USDT', 'ETH_BTC', 'BTC_USDT'])
+
+    def test_ndjson_with_bounds(self):
+        response = self.export(format='ndjson', since='2019-01-02',
+                               until='2019-01-03', pair='BTC_USDT')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line)
+                for line in self.content(response).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['pair'], 'BTC_USDT')
+        self.assertTrue(rows[0]['created_at'].startswith('2019-01-03'))
+
+        # until includes whole day
+        response = self.export(format='ndjson', until='2019-01-01')
+        self.assertEqual(len(self.content(response).splitlines()), 1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.export(format='xml').status_code, 400)
+        self.assertEqual(self.export(since='yesterday').status_code, 400)
+
+
+class FakeResult:
+    def __init__(self, status, result):
+        self.id = 'process'
+        self.status = self.state = status
+        self.result = result
+
+
+class FakeSubscription:
+    def __init__(self, events):
+        self.events = list(events)
+
+    def get(self, timeout):
+        return self.events.pop(0) if self.events else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeLease:
+    def __init__(self, lease):
+        self.lease = lease
+
+    def get(self, api_key):
+        return self.lease
+
+
+class FakeApiKeyCache:
+    def __init__(self, user):
+        self.user = user
+
+    def get_user(self, api_key):
+        if api_key != self.user.api_key:
+            raise User.DoesNotExist
+        return self.user
+
+
+def started():
+    return FakeResult('STARTED', {'api_key': 'key',
+                                  'remaining_time_estimate': 5000})
+
+
+def pending():
+    return FakeResult('PENDING', None)
+
+
+def finished():
+    return FakeResult('SUCCESS', {'api_key': 'key', 'status': 'done',
+                                  'error': True})
+
+
+class ProcessingViewsTester(unittest.TestCase):
+    def setUp(self):
+        self.user = User(pk=1, api_key='key')
+        patcher = patch('webserver.decorators.API_KEY_CACHE',
+                        FakeApiKeyCache(self.user))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def poll(self, results, events, **data):
+        request = APIRequestFactory().post(
+            '/api/portfolio_process/process', dict(data, api_key='key'),
+            format='json')
+        with patch('webserver.views.AsyncResult', side_effect=results), \
+                patch('webserver.views.ProgressSubscription',
+                      lambda *args: FakeSubscription(events)):
+            return ProcessingView.as_view()(request, process_id='process')
+
+    def test_long_poll(self):
+        response = self.poll(
+            [started(), started(), finished()],
+            [{'state': 'STARTED', 'remaining_time_estimate': 1},
+             {'state': 'SUCCESS'}], wait=10)
+        self.assertEqual(response.data, {'status': 'done'})
+
+        # wait passes
+        response = self.poll([started()] * 3, [], wait=0.01)
+        self.assertEqual(response.data['status'], 'processing in progress')
+        self.assertIn('token=',
+                      response.data['portfolio_processing_events'])
+
+    def test_queued(self):
+        lease = FakeLease({'task_id': 'process'})
+        with patch('tasks.REBALANCE_LEASE', lease):
+            response = self.poll([pending(), pending(), finished()],
+                                 [{'state': 'SUCCESS'}], wait=10)
+            self.assertEqual(response.data, {'status': 'done'})
+
+            response = self.poll([pending()] * 3, [], wait=0.01)
+            self.assertEqual(response.data['status'],
+                             'processing in progress')
+            self.assertEqual(response.data['retry_after'],
+                             QUEUED_RETRY_AFTER)
+
+            response, content = self.stream(
+                {'token': events_token('process', self.user)},
+                [pending(), pending(), finished()],
+                [{'state': 'STARTED', 'remaining_time_estimate': 1000},
+                 {'state': 'SUCCESS'}])
+            self.assertTrue(content.endswith(
+                'event: result\ndata: {"status": "done"}\n\n'))
+
+            # unknown task
+            lease.lease = {'task_id': 'other'}
+            response = self.poll([pending()], [], wait=10)
+            self.assertEqual(response.status_code, 404)
+
+    def test_invalid_wait(self):
+        for wait in ['soon', 'nan', -1, None]:
+            response = self.poll([started()], [], wait=wait)
+            self.assertEqual(response.status_code, 400)
+
+    def stream(self, query, results, events):
+        request = APIRequestFactory().get(
+            '/api/portfolio_process/process/events', query)
+        with patch('webserver.views.AsyncResult', side_effect=results), \
+                patch('webserver.views.ProgressSubscription',
+                      lambda *args: FakeSubscription(events)), \
+                patch('webserver.views.User') as user_model:
+            user_model.DoesNotExist = User.DoesNotExist
+            user_model.objects.get.return_value = self.user
+            response = ProcessingEventsView.as_view()(
+                request, process_id='process')
+            if response.status_code != 200:
+                return response, None
+            return response, b''.join(response.streaming_content).decode()
+
+    def test_events(self):
+        response, content = self.stream(
+            {'token': events_token('process', self.user)},
+            [started(), started(), finished()],
+            [{'state': 'STARTED', 'remaining_time_estimate': 1000},
+             {'state': 'SUCCESS'}])
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(content,
+                         'event: progress\ndata: {"retry_after": 1000}\n\n'
+                         'event: result\ndata: {"status": "done"}\n\n')
+
+    def test_events_authorization(self):
+        # api key isn't accepted in url
+        response, _ = self.stream({'api_key': 'key'}, [started()], [])
+        self.assertEqual(response.status_code, 403)
+        response, _ = self.stream(
+            {'token': events_token('other', self.user)}, [started()], [])
+        self.assertEqual(response.status_code, 403)
+        response, _ = self.stream({'token': 'forged'}, [started()], [])
+        self.assertEqual(response.status_code, 403)
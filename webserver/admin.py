@@ -1,6 +1,7 @@
 from django.contrib import admin
-from webserver.models import User, Statistics
+from webserver.models import User, Statistics, StatisticsSummary
 
 
 admin.site.register(User)
 admin.site.register(Statistics)
+admin.site.register(StatisticsSummary)
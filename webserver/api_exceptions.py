@@ -39,3 +39,21 @@ class RebalanceInProgress(APIException):
     status_code = 400
     default_code = "Bad_Request"
     default_detail = "Another rebalance task from this api key is in progress."
+
+
+class InvalidDate(APIException):
+    status_code = 400
+    default_code = "Bad_Request"
+    default_detail = '"since" and "until" must be dates in YYYY-MM-DD format'
+
+
+class InvalidExportFormat(APIException):
+    status_code = 400
+    default_code = "Bad_Request"
+    default_detail = '"format" must be "csv" or "ndjson"'
+
+
+class InvalidWait(APIException):
+    status_code = 400
+    default_code = "Bad_Request"
+    default_detail = '"wait" must be a non-negative number of seconds'
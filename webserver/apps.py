@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class WebServerConfig(AppConfig):
     name = 'webserver'
+
+    def ready(self):
+        # cached api keys are invalidated on user changes
+        from webserver import signals  # noqa
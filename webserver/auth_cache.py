@@ -0,0 +1,89 @@
+import os
+import time
+import hashlib
+from django.core.cache import cache
+
+from internals.cache import LRUCache
+from webserver.models import User
+
+
+API_KEY_CACHE_SIZE = int(os.environ.get('API_KEY_CACHE_SIZE', 1024))
+API_KEY_CACHE_TTL = float(os.environ.get('API_KEY_CACHE_TTL', 30))
+# also keep users in django cache, so processes share lookups
+API_KEY_CACHE_SHARED = os.environ.get('API_KEY_CACHE_SHARED', '0') == '1'
+
+
+def _fetch_user(api_key):
+    return User.objects.get(api_key=api_key)
+
+
+class ApiKeyCache:
+    """
+    api key -> user cache in front of database
+
+    users are kept in process LRU for `ttl` seconds and, if `shared`,
+    in django cache. keys are hashes of api keys, so api keys aren't
+    stored in caches.
+
+    if `shared`, `invalidate` bumps version of key in django cache, which
+    local entries are checked against, so invalidation reaches other
+    processes, when django cache is shared by them (not LocMem).
+    otherwise local caches of other processes keep users for up to `ttl`
+    seconds (API_KEY_CACHE_TTL) after invalidation
+    """
+
+    def __init__(self, maxsize: int=API_KEY_CACHE_SIZE,
+                 ttl: float=API_KEY_CACHE_TTL,
+                 shared: bool=API_KEY_CACHE_SHARED, fetch=_fetch_user):
+        """
+        :param fetch: function api key -> user, raises User.DoesNotExist
+        """
+        self.users = LRUCache(maxsize)
+        self.ttl = ttl
+        self.shared = shared
+        self.fetch = fetch
+
+    @staticmethod
+    def _key(api_key):
+        return 'api_key_user:' + hashlib.sha256(api_key.encode()).hexdigest()
+
+    def _version(self, key):
+        if not self.shared:
+            return 0
+        return cache.get(key + ':version', 0)
+
+    def get_user(self, api_key) -> User:
+        key = self._key(api_key)
+        version = self._version(key)
+        entry = self.users.get(key)
+        if entry is not None:
+            user, expires, user_version = entry
+            if time.time() < expires and user_version == version:
+                return user
+        # user of older version, which is stored late, isn't read
+        shared_key = '{}:{}'.format(key, version)
+        user = cache.get(shared_key) if self.shared else None
+        if user is None:
+            user = self.fetch(api_key)
+            if self.shared:
+                cache.set(shared_key, user, self.ttl)
+        self.users.set(key, (user, time.time() + self.ttl, version))
+        return user
+
+    def invalidate(self, api_key):
+        key = self._key(api_key)
+        self.users.pop(key)
+        if not self.shared:
+            return
+        try:
+            cache.incr(key + ':version')
+        except ValueError:
+            # version isn't in cache yet
+            if not cache.add(key + ':version', 1, None):
+                cache.incr(key + ':version')
+
+    def clear(self):
+        self.users.clear()
+
+
+API_KEY_CACHE = ApiKeyCache()
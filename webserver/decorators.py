@@ -4,6 +4,9 @@ from django.utils.decorators import method_decorator
 from rest_framework.exceptions import PermissionDenied
 
 from exchange import get_exchange_by_name
+from exchange.memo import MemoizedExchange
+from exchange.pool import EXCHANGE_POOL
+from webserver.auth_cache import API_KEY_CACHE
 from webserver.models import User
 from webserver.api_exceptions import MustProvideSingleExchange
 from webserver.api_exceptions import ExchangeNotSupported
@@ -39,16 +42,21 @@ def initialize_exchange(view_func):
             passphrase = None
             if 'passphrase' in info:
                 passphrase = info['passphrase']
-            exchange = exchange_class(api_key, api_secret, passphrase)
+            credentials = (api_key, api_secret, passphrase)
         else:
-            exchange = exchange_class(api_key, api_secret)
+            credentials = (api_key, api_secret)
+        # authenticated exchanges are reused between requests
+        exchange = EXCHANGE_POOL.get(exchange_class, *credentials)
         # NOTE, that `api_key` and `api_secret` are part of the info object and
         # if info object is logged user sensitive information will be stored
         # in the log, so take care when logging the info object.
 
+        # resources fetched here to check credentials are reused by view
+        exchange = MemoizedExchange(exchange)
         try:
             exchange.get_resources()
         except binance.exceptions.BinanceAPIException as e:
+            EXCHANGE_POOL.discard(exchange_class, *credentials)
             # TODO: move get_resources else
             raise BinanceException(e)
         info['name'] = exchange_name
@@ -65,7 +73,7 @@ def with_valid_api_key(view_func):
             raise PermissionDenied("Not authorized")
         api_key = request.data.pop('api_key')
         try:
-            request.user = User.objects.get(api_key=api_key)
+            request.user = API_KEY_CACHE.get_user(api_key)
         except User.DoesNotExist:
             raise PermissionDenied("Not authorized")
         return view_func(request, *args, **kwargs)
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+
+
+REBALANCE_LEASE_TTL = int(os.environ.get('REBALANCE_LEASE_TTL', 3600))
+
+# scripts change lease, only if it's held by task ARGV[1]
+_RELEASE_SCRIPT = """
+local lease = redis.call('get', KEYS[1])
+if lease and cjson.decode(lease)['task_id'] == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_REFRESH_SCRIPT = """
+local lease = redis.call('get', KEYS[1])
+if not lease then
+    return 0
+end
+local value = cjson.decode(lease)
+if value['task_id'] == ARGV[1] then
+    value['expires'] = tonumber(ARGV[3])
+    redis.call('set', KEYS[1], cjson.encode(value), 'EX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+_REPLACE_SCRIPT = """
+local lease = redis.call('get', KEYS[1])
+if lease and cjson.decode(lease)['task_id'] == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class RebalanceLease:
+    """
+    per user lease on rebalancing, which is kept in redis
+
+    lease is {'task_id', 'start_time', 'expires'} and is taken, when
+    rebalance is enqueued, and released by the task, when it's finished.
+    lease expires after `ttl` seconds, so crashed tasks don't block user
+    """
+
+    def __init__(self, client, ttl: int=REBALANCE_LEASE_TTL):
+        self.client = client
+        self.ttl = ttl
+        self._release = client.register_script(_RELEASE_SCRIPT)
+        self._refresh = client.register_script(_REFRESH_SCRIPT)
+        self._replace = client.register_script(_REPLACE_SCRIPT)
+
+    @staticmethod
+    def _key(api_key):
+        return 'rebalance_lease:{}'.format(api_key)
+
+    def _value(self, task_id, start_time):
+        return json.dumps({'task_id': task_id,
+                           'start_time': start_time,
+                           'expires': time.time() + self.ttl})
+
+    def acquire(self, api_key, task_id, start_time) -> bool:
+        return bool(self.client.set(self._key(api_key),
+                                    self._value(task_id, start_time),
+                                    nx=True, ex=self.ttl))
+
+    def take(self, api_key, task_id, start_time, force_reset: bool=False,
+             reset_after: float=60):
+        """
+        acquire lease, with `force_reset` lease of task running more than
+        `reset_after` seconds is replaced
+        :return: (taken, replaced task id), replaced task should be revoked
+        """
+        while not self.acquire(api_key, task_id, start_time):
+            current = self.get(api_key)
+            if current is None:
+                # released meanwhile
+                continue
+            if (not force_reset or
+                    time.time() - current['start_time'] < reset_after):
+                return False, None
+            if self.replace(api_key, current['task_id'], task_id,
+                            start_time):
+                return True, current['task_id']
+        return True, None
+
+    def get(self, api_key):
+        """
+        :return: lease dict or None, if user doesn't rebalance
+        """
+        lease = self.client.get(self._key(api_key))
+        if lease is None:
+            return None
+        return json.loads(lease)
+
+    def replace(self, api_key, old_task_id, task_id, start_time) -> bool:
+        """
+        take lease of `old_task_id`, for example on force reset
+        """
+        return bool(self._replace(keys=[self._key(api_key)],
+                                  args=[old_task_id,
+                                        self._value(task_id, start_time),
+                                        self.ttl]))
+
+    def refresh(self, api_key, task_id) -> bool:
+        """
+        prolong lease of running task
+        :return: False if lease isn't held by task anymore
+        """
+        return bool(self._refresh(keys=[self._key(api_key)],
+                                  args=[task_id, self.ttl,
+                                        time.time() + self.ttl]))
+
+    def release(self, api_key, task_id) -> bool:
+        return bool(self._release(keys=[self._key(api_key)],
+                                  args=[task_id]))
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+from django.db.models import F, Sum, Count
+from django.db.models.functions import Abs
+import django.db.models.deletion
+
+
+def backfill_summaries(apps, schema_editor):
+    Statistics = apps.get_model('webserver', 'Statistics')
+    StatisticsSummary = apps.get_model('webserver', 'StatisticsSummary')
+    # time of existing statistics is unknown, so they are summarized
+    # without day
+    slippage = (Abs(F('average_exec_price') - F('mid_market_price')) /
+                F('mid_market_price'))
+    sums = Statistics.objects.values('user_id', 'pair').annotate(
+        count=Count('id'),
+        slippage_sum=Sum(slippage),
+        slippage_sum_sq=Sum(slippage * slippage))
+    StatisticsSummary.objects.bulk_create([
+        StatisticsSummary(user_id=s['user_id'], pair=s['pair'], day=None,
+                          count=s['count'], slippage_sum=s['slippage_sum'],
+                          slippage_sum_sq=s['slippage_sum_sq'])
+        for s in sums])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webserver', '0002_auto_20180903_0830'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticsSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pair', models.CharField(max_length=10)),
+                ('day', models.DateField(null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('slippage_sum', models.FloatField(default=0)),
+                ('slippage_sum_sq', models.FloatField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='webserver.User')),
+            ],
+            options={
+                'unique_together': {('user', 'pair', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_summaries,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webserver', '0003_statisticssummary'),
+    ]
+
+    operations = [
+        # existing rows are left without time, default is set afterwards
+        migrations.AddField(
+            model_name='statistics',
+            name='created_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='statistics',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True),
+        ),
+        migrations.AddField(
+            model_name='statistics',
+            name='run_id',
+            field=models.CharField(db_index=True, max_length=36, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='statistics',
+            index=models.Index(fields=['user', 'created_at'], name='statistics_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statistics',
+            index=models.Index(fields=['user', 'pair'], name='statistics_user_pair_idx'),
+        ),
+    ]
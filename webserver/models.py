@@ -1,4 +1,7 @@
+from collections import defaultdict
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
 
 class User(models.Model):
@@ -15,3 +18,59 @@ class Statistics(models.Model):
     fee = models.FloatField()
     action = models.CharField(max_length=4, choices=[("buy", "buy"),
                                                      ("sell", "sell")])
+    # None for statistics saved before these fields were added
+    created_at = models.DateTimeField(default=timezone.now, null=True)
+    # id of rebalance task, which placed the order
+    run_id = models.CharField(max_length=36, null=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'created_at'],
+                                name='statistics_user_created_idx'),
+                   models.Index(fields=['user', 'pair'],
+                                name='statistics_user_pair_idx')]
+
+    @property
+    def slippage(self):
+        """
+        relative difference of execution and mid market prices
+        """
+        return (abs(self.average_exec_price - self.mid_market_price) /
+                self.mid_market_price)
+
+
+class StatisticsSummary(models.Model):
+    """
+    running sums of slippage of Statistics per user, pair and day,
+    day is None for statistics saved before summaries were kept
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    pair = models.CharField(max_length=10)
+    day = models.DateField(null=True)
+    count = models.IntegerField(default=0)
+    slippage_sum = models.FloatField(default=0)
+    slippage_sum_sq = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'pair', 'day')
+
+    @classmethod
+    def add(cls, statistics):
+        """
+        add saved statistics to summaries of days, when they were created,
+        should run in the transaction, in which statistics are saved
+        """
+        sums = defaultdict(lambda: [0, 0., 0.])
+        for statistic in statistics:
+            slippage = statistic.slippage
+            day = (statistic.created_at or timezone.now()).date()
+            s = sums[(statistic.user_id, statistic.pair, day)]
+            s[0] += 1
+            s[1] += slippage
+            s[2] += slippage ** 2
+        for (user_id, pair, day), (count, total, total_sq) in sums.items():
+            summary, _ = cls.objects.select_for_update().get_or_create(
+                user_id=user_id, pair=pair, day=day)
+            cls.objects.filter(pk=summary.pk).update(
+                count=F('count') + count,
+                slippage_sum=F('slippage_sum') + total,
+                slippage_sum_sq=F('slippage_sum_sq') + total_sq)
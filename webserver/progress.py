@@ -0,0 +1,78 @@
+import json
+import time
+from django.core import signing
+
+
+# final events are published after result of task is stored
+FINAL_STATES = ('SUCCESS', 'FAILURE', 'REVOKED')
+# event streams are opened with token in url instead of api key
+EVENTS_TOKEN_MAX_AGE = 600
+_EVENTS_TOKEN_SALT = 'rebalance_progress_events'
+
+
+def _channel(task_id):
+    return 'rebalance_progress:{}'.format(task_id)
+
+
+def publish_progress(client, task_id, state, **info):
+    """
+    publish progress event of rebalance task to redis
+    """
+    event = dict(info, state=state)
+    client.publish(_channel(task_id), json.dumps(event))
+
+
+class ProgressSubscription:
+    """
+    subscription to progress events of task, it should be opened before
+    task state is checked, so events published meanwhile aren't lost
+    """
+
+    def __init__(self, client, task_id):
+        self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(_channel(task_id))
+
+    def get(self, timeout: float):
+        """
+        :return: next event or None if there wasn't any for `timeout` seconds
+        """
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            message = self.pubsub.get_message(timeout=remaining)
+            if message is not None and message['type'] == 'message':
+                return json.loads(message['data'])
+
+    def close(self):
+        self.pubsub.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def events_token(task_id, user) -> str:
+    """
+    short lived token, which lets its holder read events of task `task_id`
+    """
+    return signing.dumps({'task_id': task_id, 'user': user.pk},
+                         salt=_EVENTS_TOKEN_SALT)
+
+
+def events_token_user_id(token, task_id):
+    """
+    :return: id of user, to whom token was given, None if token is invalid,
+             expired or isn't for task `task_id`
+    """
+    try:
+        value = signing.loads(token, salt=_EVENTS_TOKEN_SALT,
+                              max_age=EVENTS_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    if value.get('task_id') != task_id:
+        return None
+    return value.get('user')
@@ -0,0 +1,22 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from webserver.auth_cache import API_KEY_CACHE
+from webserver.models import User
+
+
+@receiver(pre_save, sender=User)
+def invalidate_previous_api_key(sender, instance, **kwargs):
+    # api key might be changed, for example in admin
+    if instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list(
+        'api_key', flat=True).first()
+    if previous is not None and previous != instance.api_key:
+        API_KEY_CACHE.invalidate(previous)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_api_key(sender, instance, **kwargs):
+    API_KEY_CACHE.invalidate(instance.api_key)
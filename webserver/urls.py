@@ -18,12 +18,16 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path
 from webserver.views import HealthCkeckView, PortfolioView, ProcessingView, \
-    StatisticsView
+    StatisticsView, StatisticsExportView, ProcessingEventsView
 
 urlpatterns = [
     path('healthcheck/', HealthCkeckView.as_view()),
     path('api/portfolio/', PortfolioView.as_view()),
     path('api/portfolio_process/<str:process_id>', ProcessingView.as_view()),
+    path('api/portfolio_process/<str:process_id>/events',
+         ProcessingEventsView.as_view()),
     path('api/market_order_statistics/', StatisticsView.as_view()),
+    path('api/market_order_statistics/export/',
+         StatisticsExportView.as_view()),
     path('admin/', admin.site.urls),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
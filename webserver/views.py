@@ -1,19 +1,29 @@
 import tasks
 import time
-import numpy as np
+import csv
+import json
+import math
+import itertools
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from celery.task.control import revoke
 from celery.result import AsyncResult
+from celery.utils import uuid
 from rest_framework.views import APIView
 from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, PermissionDenied
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date
 from webserver.api_exceptions import WeightsSumGreaterThanOne,\
-    RebalanceInProgress
+    RebalanceInProgress, InvalidDate, InvalidExportFormat, InvalidWait
 from webserver.decorators import with_valid_api_key, \
     initialize_exchange
-from webserver.models import Statistics
-from webserver.utils import get_portfolio, user_has_unfinished_tasks
+from webserver.models import User, Statistics, StatisticsSummary
+from webserver.progress import ProgressSubscription, FINAL_STATES, \
+    events_token, events_token_user_id
+from webserver.utils import get_portfolio
 
 
 class HealthCkeckView(APIView):
@@ -34,19 +44,6 @@ class PortfolioView(APIView):
     @with_valid_api_key
     @initialize_exchange
     def put(self, request, exchange, params, force_reset=False):
-        i = tasks.app.control.inspect()
-        api_key = request.user.api_key
-        job_args = (user_has_unfinished_tasks(i.active(), api_key) or
-                    user_has_unfinished_tasks(i.reserved(), api_key))
-        if job_args is not None:
-            job, args = job_args
-            result = AsyncResult(job['id'], app=tasks.app)
-            # time of request is sent to rebalance task, so we can check
-            # if 60 seconds passed using 3-rd: start_time argument of job
-            if not force_reset or (time.time() - args[3]) < 60:
-                raise RebalanceInProgress
-            else:
-                revoke(job['id'], terminate=True)
         allocations = params['allocations']
         total_weight = sum(Decimal(allocation['portion'])
                            for allocation in allocations)
@@ -70,65 +67,310 @@ class PortfolioView(APIView):
         weights = {
             allocation['coin']: Decimal(allocation['portion']).to_eng_string()
             for allocation in allocations}
-        result = tasks.rebalance_task.delay(request.data,
-                                            request.user.api_key,
-                                            weights,
-                                            time.time())
+        api_key = request.user.api_key
+        task_id = uuid()
+        start_time = time.time()
+        lease = tasks.REBALANCE_LEASE
+        # force reset is allowed if rebalance runs more than 60 seconds
+        taken, replaced = lease.take(api_key, task_id, start_time,
+                                     force_reset, reset_after=60)
+        if not taken:
+            raise RebalanceInProgress
+        if replaced is not None:
+            tasks.app.control.revoke(replaced, terminate=True)
+        try:
+            result = tasks.rebalance_task.apply_async(
+                (request.data, api_key, weights, start_time),
+                task_id=task_id)
+        except Exception:
+            lease.release(api_key, task_id)
+            raise
         return Response({
             "status": "target allocations queued for processing",
             "portfolio_processing_request":
                 "/api/portfolio_process/{}".format(result.id),
-            "retry_after": 35000
+            "portfolio_processing_events": events_url(result.id,
+                                                      request.user),
+            "retry_after": QUEUED_RETRY_AFTER
         })
 
 
+# queued task is polled like started one, see get_rebalance_result
+IN_PROGRESS_STATES = ("PENDING", "STARTED")
+QUEUED_RETRY_AFTER = 35000
+# waiting requests hold a thread of web worker, see Procfile
+LONG_POLL_MAX_WAIT = 30
+PROGRESS_EVENTS_TIMEOUT = 120
+PROGRESS_EVENTS_HEARTBEAT = 15
+
+
+def events_url(process_id, user):
+    return "/api/portfolio_process/{}/events?token={}".format(
+        process_id, events_token(process_id, user))
+
+
+def parse_wait(data):
+    """
+    :return: seconds to wait for result, at most LONG_POLL_MAX_WAIT
+    """
+    try:
+        wait = float(data.get('wait', 0))
+    except (TypeError, ValueError):
+        raise InvalidWait
+    if not math.isfinite(wait) or wait < 0:
+        raise InvalidWait
+    return min(wait, LONG_POLL_MAX_WAIT)
+
+
+def is_queued(process_id, user):
+    """
+    task, which isn't picked by worker yet, is PENDING like unknown one,
+    but it holds rebalance lease of its user
+    """
+    lease = tasks.REBALANCE_LEASE.get(user.api_key)
+    return lease is not None and lease['task_id'] == process_id
+
+
+def get_rebalance_result(process_id, user):
+    result = AsyncResult(process_id, app=tasks.app)
+    if result.state == "PENDING" and is_queued(process_id, user):
+        return result
+    # result of failed task is exception, which doesn't tell whose it is
+    if (result.state in ["PENDING", "REVOKED", "FAILURE"] or
+            result.result["api_key"] != user.api_key):
+        raise NotFound("not found or expired")
+    return result
+
+
+def processing_response(result):
+    if result.status in IN_PROGRESS_STATES:
+        if result.status == "PENDING":
+            retry_after = QUEUED_RETRY_AFTER
+        else:
+            retry_after = result.result['remaining_time_estimate']
+        return {
+            "status": "processing in progress",
+            "portfolio_processing_request":
+                "/api/portfolio_process/{}".format(result.id),
+            "retry_after": retry_after
+        }
+    response = result.result
+    response.pop('api_key')
+    if 'error' in response:
+        return {'status': response['status']}
+    for market in response:
+        if market != 'status':
+            break
+    response[market]['value'] = float(response[market]['value'])
+    response[market]['allocations'] = [
+        {
+            'coin': d['coin'],
+            'amount': float(d['amount']),
+            'portion': float(d['portion'])
+        }
+        for d in response[market]['allocations']
+    ]
+    return response
+
+
 class ProcessingView(APIView):
+    """
+    state of rebalance, with `wait` seconds request is held until
+    rebalance is finished or `wait` passes
+    """
     parser_classes = (JSONParser,)
 
     @with_valid_api_key
     def post(self, request, process_id):
+        result = get_rebalance_result(process_id, request.user)
+        wait = parse_wait(request.data)
+        if result.status in IN_PROGRESS_STATES and wait > 0:
+            deadline = time.time() + wait
+            with ProgressSubscription(tasks.redis_client,
+                                      process_id) as subscription:
+                # task might finish before subscription
+                result = AsyncResult(process_id, app=tasks.app)
+                while (result.status in IN_PROGRESS_STATES and
+                       time.time() < deadline):
+                    event = subscription.get(deadline - time.time())
+                    if event is None or event['state'] in FINAL_STATES:
+                        result = AsyncResult(process_id, app=tasks.app)
+                        break
+        response = processing_response(result)
+        if result.status in IN_PROGRESS_STATES:
+            # token of events stream is renewed by polling
+            response["portfolio_processing_events"] = events_url(
+                process_id, request.user)
+        return Response(response)
+
+
+def server_sent_event(event, data):
+    return 'event: {}\ndata: {}\n\n'.format(
+        event, json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def progress_events(process_id):
+    """
+    `progress` events with remaining time estimate, then `result` event
+    with response of ProcessingView
+    """
+    with ProgressSubscription(tasks.redis_client,
+                              process_id) as subscription:
+        deadline = time.time() + PROGRESS_EVENTS_TIMEOUT
         result = AsyncResult(process_id, app=tasks.app)
-        if (result.state in ["PENDING", "REVOKED"] or
-                result.result["api_key"] != request.user.api_key):
-            raise NotFound("not found or expired")
-        if result.status == "STARTED":
-            return Response({
-                "status": "processing in progress",
-                "portfolio_processing_request":
-                    "/api/portfolio_process/{}".format(result.id),
-                "retry_after": result.result['remaining_time_estimate']
-            })
-        response = result.result
-        response.pop('api_key')
-        if 'error' in response:
-            return Response({'status': response['status']})
-        for market in response:
-            if market != 'status':
-                break
-        response[market]['value'] = float(response[market]['value'])
-        response[market]['allocations'] = [
-            {
-                'coin': d['coin'],
-                'amount': float(d['amount']),
-                'portion': float(d['portion'])
-            }
-            for d in response[market]['allocations']
-        ]
+        while (result.status in IN_PROGRESS_STATES and
+               time.time() < deadline):
+            event = subscription.get(min(PROGRESS_EVENTS_HEARTBEAT,
+                                         deadline - time.time()))
+            if event is None:
+                # keeps connection open through proxies
+                yield ': heartbeat\n\n'
+            elif event['state'] in FINAL_STATES:
+                result = AsyncResult(process_id, app=tasks.app)
+            else:
+                yield server_sent_event('progress', {
+                    'retry_after': event['remaining_time_estimate']})
+    yield server_sent_event('result', processing_response(result))
 
-        return Response(response)
+
+class ProcessingEventsView(APIView):
+    """
+    server sent events stream of rebalance progress, stream ends with
+    result or after PROGRESS_EVENTS_TIMEOUT, then client should reconnect.
+    EventSource can't send body, so stream is opened with short lived
+    token of the process from portfolio_processing_events url instead of
+    api key, which mustn't be in urls
+    """
+
+    def get(self, request, process_id):
+        user_id = events_token_user_id(request.query_params.get('token', ''),
+                                       process_id)
+        if user_id is None:
+            raise PermissionDenied("Not authorized")
+        try:
+            user = User.objects.get(pk=user_id)
+        except User.DoesNotExist:
+            raise PermissionDenied("Not authorized")
+        get_rebalance_result(process_id, user)
+        response = StreamingHttpResponse(progress_events(process_id),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+def parse_day(data, key):
+    """
+    :return: date from `key` of request data, None if it's not given
+    """
+    if key not in data:
+        return None
+    try:
+        day = parse_date(data[key])
+    except (TypeError, ValueError):
+        raise InvalidDate
+    if day is None:
+        raise InvalidDate
+    return day
+
+
+def slippage_moments(count, total, total_sq):
+    """
+    mean and std of slippage from running sums
+    """
+    if not count:
+        return {'mean': 0., 'std': 0.}
+    mean = total / count
+    return {'mean': mean,
+            'std': math.sqrt(max(total_sq / count - mean ** 2, 0.))}
 
 
 class StatisticsView(APIView):
+    """
+    mean and std of market orders slippage, optionally only of `pair`,
+    between `since` and `until` days, `by_pair` adds breakdown by pairs
+    """
     parser_classes = (JSONParser,)
 
     @with_valid_api_key
     def post(self, request):
-        stats = np.array(Statistics.objects.filter(
-            user=request.user).values_list('average_exec_price',
-                                           'mid_market_price'))
-        if len(stats) < 1:
-            obj = np.zeros(1)
-        else:
-            obj = np.abs(stats[:, 0] - stats[:, 1]) / stats[:, 1]
-        response = {'mean': np.mean(obj), 'std': np.std(obj)}
+        summaries = StatisticsSummary.objects.filter(user=request.user)
+        if 'pair' in request.data:
+            summaries = summaries.filter(pair=request.data['pair'])
+        since = parse_day(request.data, 'since')
+        if since is not None:
+            summaries = summaries.filter(day__gte=since)
+        until = parse_day(request.data, 'until')
+        if until is not None:
+            summaries = summaries.filter(day__lte=until)
+
+        sums = ('count', 'slippage_sum', 'slippage_sum_sq')
+        total = summaries.aggregate(*(Sum(field) for field in sums))
+        response = slippage_moments(
+            *(total[field + '__sum'] for field in sums))
+        if request.data.get('by_pair'):
+            response['pairs'] = {
+                pair_sums['pair']: slippage_moments(
+                    *(pair_sums[field + '__sum'] for field in sums))
+                for pair_sums in summaries.values('pair').annotate(
+                    *(Sum(field) for field in sums))}
         return Response(response)
+
+
+class Echo:
+    """
+    file-like object, which returns written value, for csv writer
+    """
+
+    def write(self, value):
+        return value
+
+
+EXPORT_FIELDS = ('created_at', 'run_id', 'pair', 'action', 'volume', 'fee',
+                 'mid_market_price', 'average_exec_price')
+EXPORT_CHUNK_SIZE = 2000
+
+
+class StatisticsExportView(APIView):
+    """
+    streams execution history of user as csv or ndjson (`format`),
+    optionally only of `pair` between `since` and `until` days
+    """
+    parser_classes = (JSONParser,)
+
+    @with_valid_api_key
+    def post(self, request):
+        export_format = request.data.get('format', 'csv')
+        if export_format not in ('csv', 'ndjson'):
+            raise InvalidExportFormat
+        statistics = Statistics.objects.filter(user=request.user)
+        if 'pair' in request.data:
+            statistics = statistics.filter(pair=request.data['pair'])
+        # bounds on created_at, so (user, created_at) index is used
+        since = parse_day(request.data, 'since')
+        if since is not None:
+            statistics = statistics.filter(created_at__gte=datetime.combine(
+                since, datetime.min.time(), tzinfo=timezone.utc))
+        until = parse_day(request.data, 'until')
+        if until is not None:
+            statistics = statistics.filter(created_at__lt=datetime.combine(
+                until + timedelta(days=1), datetime.min.time(),
+                tzinfo=timezone.utc))
+        rows = statistics.order_by('created_at', 'id').values_list(
+            *EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        if export_format == 'csv':
+            writer = csv.writer(Echo())
+            lines = itertools.chain(
+                [writer.writerow(EXPORT_FIELDS)],
+                (writer.writerow(row) for row in rows))
+            content_type = 'text/csv'
+        else:
+            lines = (json.dumps(dict(zip(EXPORT_FIELDS, row)),
+                                cls=DjangoJSONEncoder) + '\n'
+                     for row in rows)
+            content_type = 'application/x-ndjson'
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response['Content-Disposition'] = (
+            'attachment; filename="statistics.{}"'.format(export_format))
+        return response